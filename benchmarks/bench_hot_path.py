@@ -0,0 +1,244 @@
+"""
+Benchmarks every step a Tilt broadcast goes through on its way to the providers, and the providers
+themselves against local stand-ins (an HTTP server for webhooks, an in-process IoT Hub session for MQTT).
+Results are printed as a table and can be saved as JSON to compare across commits.
+
+    python -m benchmarks.bench_hot_path --output before.json
+    python -m benchmarks.bench_hot_path --compare before.json
+
+Run from a folder without a pitch.json so the default configuration is used.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pitch.configuration import PitchConfig
+from pitch.dispatcher import Dispatcher, OVERFLOW_BLOCK
+from pitch.ibeacon import APPLE_COMPANY_ID, IBeaconParser, encode_ibeacon
+from pitch.models import SignalStats, TiltStatus
+from pitch.providers import AzureIoTHubCloudProvider, PrometheusCloudProvider, SqliteCloudProvider, WebhookCloudProvider
+from pitch.rate_limiter import DeviceRateLimiter, RateLimitedException
+from pitch.runtime import AsyncRuntime
+from pitch.simulator import SimulatedAdvertisement, TILT_COLORS
+from pitch.storage import sqlite_schema
+from .harness import latency_result, load_report, measure, print_table, report
+
+READINGS = 20000
+DISPATCHED_READINGS = 2000
+SQLITE_BATCH_SIZE = 20
+PURPLE_UUID = "a495bb40-c5b1-4b44-b512-1370f02d74de"
+SIGNAL = SignalStats(rssi=-70, rssi_mean=-71.5, rssi_variance=4.2, packets_per_minute=30.0)
+
+
+def _readings(config: PitchConfig, count: int, rng: random.Random):
+    return [TiltStatus(TILT_COLORS[i % len(TILT_COLORS)], 68 + rng.random(), 1.050 - rng.random() / 100, config, SIGNAL)
+            for i in range(count)]
+
+
+def bench_ibeacon_parse(count: int, rng: random.Random):
+    parser = IBeaconParser({PURPLE_UUID: "purple"})
+    # Half Tilts, half the other advertisements a scanner hears (other iBeacons, other manufacturers)
+    other_beacon = {APPLE_COMPANY_ID: encode_ibeacon("e2c56db5-dffb-48d2-b060-d0f5a71096e0", 1, 2)}
+    other_device = {0x0075: bytes(rng.getrandbits(8) for _ in range(20))}
+
+    def make_inputs(n):
+        return [{APPLE_COMPANY_ID: encode_ibeacon(PURPLE_UUID, 68, 1000 + i % 100)} if i % 2 else
+                (other_beacon if i % 4 else other_device) for i in range(n)]
+    return measure("ibeacon_parse", parser.parse, make_inputs, count)
+
+
+def bench_detection_callback(count: int, rng: random.Random):
+    # Everything from the scanner callback up to the scan queue: parsing, signal tracking, dedup, TiltStatus,
+    # analytics and smoothing.  Imported here, pitch.pitch loads its configuration on import
+    from pitch import pitch as pitch_module
+    # Nothing to merge or forward with a single local receiver
+    pitch_module.reading_merger.window_seconds = 0
+    pitch_module.reading_forwarder = None
+
+    def make_inputs(n):
+        # Gravity keeps changing so readings aren't dropped as repeats
+        return [SimulatedAdvertisement({APPLE_COMPANY_ID: encode_ibeacon(PURPLE_UUID, 68, 1000 + i % 60)},
+                                       rssi=rng.randint(-90, -60)) for i in range(n)]
+
+    def operation(advertisement):
+        pitch_module._bleak_detection_callback('bench', None, advertisement)
+    return measure("detection_callback", operation, make_inputs, count)
+
+
+def bench_tilt_status(count: int, rng: random.Random):
+    config = PitchConfig({'purple_original_gravity': 1.060})
+
+    def make_inputs(n):
+        return [(68 + rng.random(), 1.050 - rng.random() / 100) for _ in range(n)]
+
+    def operation(values):
+        TiltStatus("purple", values[0], values[1], config, SIGNAL)
+    return measure("tilt_status", operation, make_inputs, count)
+
+
+def bench_json(count: int, rng: random.Random):
+    config = PitchConfig({'purple_original_gravity': 1.060})
+    # Fresh readings, the first json() call on a reading is the one that does the work
+    return measure("json", TiltStatus.json, lambda n: _readings(config, n, rng), count)
+
+
+def bench_rate_limiter(count: int, rng: random.Random):
+    limiter = DeviceRateLimiter(rate=1, period=1)
+
+    def operation(color):
+        try:
+            limiter.approve(color)
+        except RateLimitedException:
+            pass
+    return measure("rate_limiter", operation, lambda n: [TILT_COLORS[i % len(TILT_COLORS)] for i in range(n)], count)
+
+
+def bench_prometheus(count: int, rng: random.Random):
+    config = PitchConfig({})
+    # Not started, only the metric updates are measured
+    provider = PrometheusCloudProvider(config)
+    return measure("prometheus_update", provider.update, lambda n: _readings(config, n, rng), count)
+
+
+def bench_sqlite(count: int, rng: random.Random, directory: str):
+    config = PitchConfig({'sqlite_db_path': os.path.join(directory, 'bench.db')})
+    provider = SqliteCloudProvider(config)
+    # Same connection settings as SqliteWriter
+    conn = sqlite3.connect(config.sqlite_db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with conn:
+        sqlite_schema.migrate(conn)
+
+    def make_inputs(n):
+        rows = [(int(time.time()) + i, s.color, s.name, s.name, s.temp_fahrenheit, s.temp_celsius, s.gravity,
+                 s.alcohol_by_volume, s.apparent_attenuation, None, None, None)
+                for i, s in enumerate(_readings(config, n * SQLITE_BATCH_SIZE, rng))]
+        return [rows[i:i + SQLITE_BATCH_SIZE] for i in range(0, len(rows), SQLITE_BATCH_SIZE)]
+
+    def operation(rows):
+        with conn:
+            provider._write_rows(conn, rows)
+    try:
+        return measure("sqlite_insert", operation, make_inputs, max(1, count // SQLITE_BATCH_SIZE),
+                       per_call=SQLITE_BATCH_SIZE)
+    finally:
+        conn.close()
+
+
+class StandInWebhook(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like a real endpoint
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        self.server.received[body['gravity']] = time.perf_counter_ns()
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInIoTHubSession:
+    """
+    In-process MQTT session, records when each message arrives.
+    """
+    def __init__(self, received: dict):
+        self.received = received
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def send_message(self, message):
+        self.received[json.loads(message)['gravity']] = time.perf_counter_ns()
+
+
+def bench_dispatch(count: int, rng: random.Random):
+    """
+    Readings from Dispatcher.submit until a webhook (worker thread, HTTP) and IoT Hub (event loop, MQTT)
+    stand-in received them.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInWebhook)
+    server.received = dict()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    mqtt_received = dict()
+    config = PitchConfig({
+        'provider_overflow_policy': OVERFLOW_BLOCK,
+        'outbox_enabled': False,
+        'webhook_limit_rate': 1000000,
+        'azure_iot_hub_connectionstring': 'HostName=localhost;DeviceId=bench;SharedAccessKey=abc',
+        'azure_iot_hub_limit_rate': 1000000,
+        'azure_iot_hub_limit_period': 1,
+        'azure_iot_hub_buffer_size': count,
+        # Every reading sent on its own, so each can be timed
+        'azure_iot_hub_aggregate': False,
+    })
+    providers = [WebhookCloudProvider("http://127.0.0.1:{}/".format(server.server_port), config),
+                 AzureIoTHubCloudProvider(config, session_factory=lambda _: StandInIoTHubSession(mqtt_received))]
+    runtime = AsyncRuntime()
+    runtime.start()
+    dispatcher = Dispatcher(providers, config, console_log=False, runtime=runtime)
+    for provider in providers:
+        provider.start()
+    dispatcher.start()
+    # Unique gravity per reading, so each can be matched with when it arrived
+    readings = [TiltStatus("purple", 68, 1.0 + i / 1000000, config, SIGNAL) for i in range(count)]
+    submitted = dict()
+    try:
+        start = time.perf_counter_ns()
+        for tilt_status in readings:
+            submitted[tilt_status.gravity] = time.perf_counter_ns()
+            dispatcher.submit(tilt_status)
+        deadline = time.time() + 60
+        while (len(server.received) < count or len(mqtt_received) < count) and time.time() < deadline:
+            time.sleep(0.01)
+        results = list()
+        for name, received in (("dispatch_webhook", server.received), ("dispatch_mqtt", mqtt_received)):
+            latencies = [received[gravity] - submitted[gravity] for gravity in received]
+            results.append(latency_result(name, latencies, max(received.values()) - start))
+        return results
+    finally:
+        dispatcher.stop()
+        runtime.stop()
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks the beacon to provider hot path')
+    parser.add_argument('--output', help='Saves the results as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare throughput with')
+    parser.add_argument('--quick', action='store_true', help='A tenth of the readings, for a quick check')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    scale = 10 if args.quick else 1
+    rng = random.Random(args.seed)
+    results = list()
+    with tempfile.TemporaryDirectory() as directory:
+        results.append(bench_ibeacon_parse(READINGS // scale, rng))
+        results.append(bench_detection_callback(READINGS // scale, rng))
+        results.append(bench_tilt_status(READINGS // scale, rng))
+        results.append(bench_json(READINGS // scale, rng))
+        results.append(bench_rate_limiter(READINGS // scale, rng))
+        results.append(bench_prometheus(READINGS // scale, rng))
+        results.append(bench_sqlite(READINGS // scale, rng, directory))
+        results.extend(bench_dispatch(DISPATCHED_READINGS // scale, rng))
+
+    print_table(results, load_report(args.compare) if args.compare else None)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report(results), file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Compares TiltStatus JSON encoding with jsonpickle against the fixed schema encoder.
+
+    python -m benchmarks.bench_json
+"""
+import timeit
+import jsonpickle
+from pitch.configuration import PitchConfig
+from pitch.models import TiltStatus
+
+READINGS = 20000
+
+
+def main():
+    config = PitchConfig({'purple_original_gravity': 1.060, 'purple_name': 'Pumpkin Ale'})
+    statuses = [TiltStatus('purple', 68, 1.050 - i / 1000000, config) for i in range(READINGS)]
+    assert jsonpickle.encode(statuses[0], unpicklable=False) == statuses[0].json()
+
+    before = timeit.timeit(lambda: [jsonpickle.encode(s, unpicklable=False) for s in statuses], number=1)
+    fresh = [TiltStatus('purple', 68, 1.050, config) for _ in range(READINGS)]
+    after = timeit.timeit(lambda: [s.json() for s in fresh], number=1)
+    # Every other provider serializing the same reading hits the cache
+    cached = timeit.timeit(lambda: [s.json() for s in fresh], number=1)
+
+    print("jsonpickle:      {:8.2f} us/reading".format(before / READINGS * 1e6))
+    print("fixed schema:    {:8.2f} us/reading".format(after / READINGS * 1e6))
+    print("cached:          {:8.2f} us/reading".format(cached / READINGS * 1e6))
+    print("speedup:         {:8.1f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
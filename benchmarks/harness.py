@@ -0,0 +1,126 @@
+"""
+Timing and allocation measurement shared by the benchmarks.
+"""
+import gc
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Iterable, List, NamedTuple, Optional, Sequence
+
+# Operations traced for allocations, tracemalloc is too slow to run over the whole benchmark
+ALLOCATION_SAMPLE = 1000
+WARMUP = 100
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    operations: int
+    # Operations per second
+    throughput: float
+    p50_us: float
+    p99_us: float
+    # Peak bytes allocated while handling one operation, None when it isn't measurable (e.g. across threads)
+    alloc_bytes: Optional[float]
+
+
+def percentile(values: Sequence[float], fraction: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(name: str, operation: Callable, make_inputs: Callable[[int], List], count: int,
+            per_call: int = 1) -> BenchmarkResult:
+    """
+    Times operation over count fresh inputs, one call at a time, then traces allocations over a smaller sample.
+    per_call is the number of operations one call handles (e.g. rows in a batch), results are per operation.
+    """
+    for item in make_inputs(WARMUP):
+        operation(item)
+    inputs = make_inputs(count)
+    timings = list()
+    perf_counter_ns = time.perf_counter_ns
+    gc.collect()
+    start = perf_counter_ns()
+    for item in inputs:
+        before = perf_counter_ns()
+        operation(item)
+        timings.append(perf_counter_ns() - before)
+    total = perf_counter_ns() - start
+
+    alloc_bytes = 0
+    sample = make_inputs(min(count, ALLOCATION_SAMPLE))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for item in sample:
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            operation(item)
+            alloc_bytes += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(name=name,
+                           operations=count * per_call,
+                           throughput=count * per_call / (total / 1e9),
+                           p50_us=percentile(timings, 0.50) / per_call / 1000,
+                           p99_us=percentile(timings, 0.99) / per_call / 1000,
+                           alloc_bytes=alloc_bytes / len(sample) / per_call)
+
+
+def latency_result(name: str, latencies_ns: Sequence[int], total_ns: int) -> BenchmarkResult:
+    """
+    Result for operations timed elsewhere, e.g. a reading from submit until a provider stand-in received it.
+    """
+    return BenchmarkResult(name=name,
+                           operations=len(latencies_ns),
+                           throughput=len(latencies_ns) / (total_ns / 1e9),
+                           p50_us=percentile(latencies_ns, 0.50) / 1000,
+                           p99_us=percentile(latencies_ns, 0.99) / 1000,
+                           alloc_bytes=None)
+
+
+def _get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results: Iterable[BenchmarkResult]):
+    """
+    Machine readable results, with enough about the run to compare it with another.
+    """
+    return {
+        'commit': _get_commit(),
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': [result._asdict() for result in results],
+    }
+
+
+def print_table(results: Iterable[BenchmarkResult], baseline: dict = None):
+    """
+    Human readable results, with the change in throughput from a baseline report if one is given.
+    """
+    previous = {result['name']: result for result in baseline['results']} if baseline else {}
+    print("{:<24} {:>12} {:>10} {:>10} {:>12} {:>9}".format("Benchmark", "ops/s", "p50 us", "p99 us", "alloc B/op",
+                                                          "vs base"))
+    for result in results:
+        alloc = "{:.0f}".format(result.alloc_bytes) if result.alloc_bytes is not None else "-"
+        change = "-"
+        if result.name in previous:
+            change = "{:+.1f}%".format((result.throughput / previous[result.name]['throughput'] - 1) * 100)
+        print("{:<24} {:>12.0f} {:>10.2f} {:>10.2f} {:>12} {:>9}".format(result.name, result.throughput, result.p50_us,
+                                                                      result.p99_us, alloc, change))
+
+
+def load_report(path: str):
+    with open(path, 'r') as file:
+        return json.load(file)
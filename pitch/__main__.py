@@ -1,7 +1,9 @@
 from pitch.helpers.power_guard import allow_sleep, prevent_sleep
 from . import pitch_main
 from .providers import CalibrationCloudProvider
+from .storage import read_log
 import argparse
+import json
 
 
 def _get_args(argv=None):
@@ -16,12 +18,22 @@ def _get_args(argv=None):
                         type=int, help='Measured temperature in degrees F, for used with calibrate flag')
     parser.add_argument('--actual-gravity', dest='actual_gravity', action='store', default=0,
                         type=float, help='Measured gravity, for used with calibrate flag')
+    parser.add_argument('--replay', dest='replay', action='store', default=None,
+                        help='Sends the readings in a log file (log_file_path) or SQLite database (sqlite_db_path) to the providers')
+    parser.add_argument('--replay-speed', dest='replay_speed', action='store', default=0, type=float,
+                        help='Speed for the replay flag, 1 is real time, 60 is an hour a minute, 0 (default) is as fast as possible')
+    parser.add_argument('--read-log', dest='read_log', action='store', default=None,
+                        help='Prints every reading in a log file (log_file_path) and its segments as JSON lines, oldest first')
 
     return parser.parse_args(argv)
 
 
 def main(argv=None):
     args = _get_args(argv)
+    if args.read_log:
+        for record in read_log(args.read_log):
+            print(json.dumps(record._replace(timestamp=record.timestamp.isoformat())._asdict()))
+        return
     try:
         prevent_sleep()
         if args.calibrate:
@@ -32,6 +44,15 @@ def main(argv=None):
                        simulate_beacons=args.simulate_beacons,
                        console_log=False)
             print("Finished")
+        elif args.replay:
+            # Run with default providers until the recorded readings run out, too many to log each one to console
+            pitch_main(providers=None,
+                       timeout_seconds=0,
+                       simulate_beacons=False,
+                       tui_enabled=args.tui_enabled,
+                       console_log=False,
+                       replay_path=args.replay,
+                       replay_speed=args.replay_speed)
         else:
             # Run with default providers, forever, possibly simulating beacons
             pitch_main(providers=None,
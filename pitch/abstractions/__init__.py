@@ -1 +1,2 @@
-from .cloud_provider import CloudProviderBase
\ No newline at end of file
+from .cloud_provider import CloudProviderBase
+from .http_cloud_provider import HttpCloudProviderBase
@@ -1,7 +0,0 @@
-﻿from dataclasses import dataclass
-
-@dataclass
-class BeaconPacket:
-    uuid: str
-    major: int
-    minor: int
\ No newline at end of file
@@ -2,6 +2,8 @@ from ..models import TiltStatus
 
 
 class CloudProviderBase:
+    # Prefix for per-provider config options, e.g. brewfather_queue_size
+    config_key = None
 
     def start(self):
         pass
@@ -9,5 +11,20 @@ class CloudProviderBase:
     def update(self, tilt_status: TiltStatus):
         pass
 
+    async def update_async(self, tilt_status: TiltStatus):
+        """
+        Override to run this provider on the shared event loop instead of a worker thread.
+        """
+        self.update(tilt_status)
+
+    def stop(self):
+        """
+        Called once on shutdown after the last update, e.g. to flush buffered data.
+        """
+        pass
+
+    def supports_async(self):
+        return type(self).update_async is not CloudProviderBase.update_async
+
     def enabled(self):
         return False
@@ -0,0 +1,35 @@
+from ..models import TiltStatus
+from ..configuration import PitchConfig
+from ..rate_limiter import DeviceRateLimiter
+from ..http_client import get_http_client
+from ..outbox import Outbox
+from .cloud_provider import CloudProviderBase
+
+
+class HttpCloudProviderBase(CloudProviderBase):
+    """
+    Base for providers posting readings to an HTTP endpoint.  Posts go through an outbox that stores them while
+    the endpoint can't be reached and sends them once it's back, within the provider's rate limit.  By default
+    that's one post per color every 15 minutes, and as the services only show the latest reading, only the
+    newest waiting post per color is kept (coalesce).
+    """
+    def __init__(self, config: PitchConfig, outbox_name: str = None, rate: int = 1, period: int = (60 * 15),
+                 coalesce: bool = True):
+        self.rate_limiter = DeviceRateLimiter(rate=rate, period=period)
+        self.http = get_http_client(config)
+        self.outbox = Outbox(config, outbox_name or self.config_key, self.http, self.rate_limiter, coalesce)
+
+    def start(self):
+        self.outbox.start()
+
+    def stop(self):
+        self.outbox.stop()
+
+    def post(self, tilt_status: TiltStatus, url: str, headers: dict, data):
+        """
+        Posts within the rate limit (raises RateLimitedException otherwise), raising for error responses.
+        """
+        response = self.outbox.post(tilt_status.color, url, headers=headers, data=data)
+        # None when the post was stored for later
+        if response is not None:
+            response.raise_for_status()
@@ -0,0 +1,68 @@
+from typing import Dict
+from .configuration import PitchConfig
+from .models import ReadingAggregate, TiltStatus
+
+
+class ReadingWindow:
+    """
+    Running count/min/max/sum of gravity and temperature for one Tilt, constant memory.
+    """
+    __slots__ = ('count', 'first_timestamp', 'gravity_min', 'gravity_max', 'gravity_sum',
+                 'temp_min', 'temp_max', 'temp_sum')
+
+    def __init__(self, tilt_status: TiltStatus):
+        self.count = 1
+        self.first_timestamp = tilt_status.timestamp
+        self.gravity_min = self.gravity_max = self.gravity_sum = tilt_status.gravity
+        self.temp_min = self.temp_max = self.temp_sum = tilt_status.temp_fahrenheit
+
+    def add(self, tilt_status: TiltStatus):
+        self.count += 1
+        gravity = tilt_status.gravity
+        temp = tilt_status.temp_fahrenheit
+        self.gravity_sum += gravity
+        self.temp_sum += temp
+        if gravity < self.gravity_min:
+            self.gravity_min = gravity
+        elif gravity > self.gravity_max:
+            self.gravity_max = gravity
+        if temp < self.temp_min:
+            self.temp_min = temp
+        elif temp > self.temp_max:
+            self.temp_max = temp
+
+    def get(self):
+        return ReadingAggregate(count=self.count,
+                                first_timestamp=self.first_timestamp,
+                                gravity_min=self.gravity_min,
+                                gravity_max=self.gravity_max,
+                                gravity_mean=self.gravity_sum / self.count,
+                                temp_fahrenheit_min=self.temp_min,
+                                temp_fahrenheit_max=self.temp_max,
+                                temp_fahrenheit_mean=self.temp_sum / self.count)
+
+
+class Aggregator:
+    """
+    Collects readings per Tilt color for one provider until the provider accepts one.  Each reading handed
+    to the provider is the latest reading with the window's mean gravity and temperature, and the full
+    summary as .aggregate.  The window starts over once the provider sends it (i.e. isn't rate limited).
+    """
+    def __init__(self, config: PitchConfig):
+        self.config = config
+        self._windows: Dict[str, ReadingWindow] = dict()
+
+    def add(self, tilt_status: TiltStatus) -> TiltStatus:
+        window = self._windows.get(tilt_status.color)
+        if window is None:
+            window = self._windows[tilt_status.color] = ReadingWindow(tilt_status)
+        else:
+            window.add(tilt_status)
+        aggregate = window.get()
+        return tilt_status.with_values(temp_fahrenheit=round(aggregate.temp_fahrenheit_mean, 2),
+                                       gravity=round(aggregate.gravity_mean, 4),
+                                       config=self.config,
+                                       aggregate=aggregate)
+
+    def reset(self, color: str):
+        self._windows.pop(color, None)
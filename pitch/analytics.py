@@ -0,0 +1,127 @@
+import datetime
+from collections import deque
+from typing import Dict, Optional
+from .configuration import PitchConfig
+from .models import FermentationStats, TiltStatus
+
+STATE_FERMENTING = "fermenting"
+STATE_STALLED = "stalled"
+STATE_FINISHED = "finished"
+STATE_STABLE = "stable"
+fermentation_states = [STATE_FERMENTING, STATE_STALLED, STATE_FINISHED, STATE_STABLE]
+
+# Within this much of the final gravity counts as there
+FINISHED_TOLERANCE = 0.002
+# Further out than this isn't a useful ETA
+MAX_ETA_DAYS = 60
+SECONDS_PER_DAY = 86400
+
+
+class GravityTrend:
+    """
+    Least squares line through one Tilt's gravity over a rolling window.  Readings are averaged into one sample
+    every sample_seconds, and the regression sums are updated as samples come and go, so the cost per reading
+    doesn't grow with the length of the fermentation.
+    """
+    def __init__(self, window_seconds: float, sample_seconds: float):
+        self.window_seconds = window_seconds
+        self.sample_seconds = sample_seconds
+        # (days since origin, gravity)
+        self._samples = deque()
+        self._origin: Optional[float] = None
+        self._sum_x = self._sum_y = self._sum_xx = self._sum_xy = 0.0
+        # Readings waiting to be averaged into the next sample
+        self._pending_start: Optional[float] = None
+        self._pending_sum = 0.0
+        self._pending_count = 0
+
+    def add(self, timestamp: float, gravity: float):
+        """
+        Returns True when a new sample was taken (and the line may have changed).
+        """
+        if self._pending_start is None:
+            self._pending_start = timestamp
+        self._pending_sum += gravity
+        self._pending_count += 1
+        if timestamp - self._pending_start < self.sample_seconds:
+            return False
+        self._add_sample(timestamp, self._pending_sum / self._pending_count)
+        self._pending_start = None
+        self._pending_sum = 0.0
+        self._pending_count = 0
+        return True
+
+    def _add_sample(self, timestamp: float, gravity: float):
+        if self._origin is None:
+            # Days are counted from here, keeps the sums small
+            self._origin = timestamp
+        x = (timestamp - self._origin) / SECONDS_PER_DAY
+        self._samples.append((x, gravity))
+        self._sum_x += x
+        self._sum_y += gravity
+        self._sum_xx += x * x
+        self._sum_xy += x * gravity
+        oldest_allowed = x - self.window_seconds / SECONDS_PER_DAY
+        while self._samples[0][0] < oldest_allowed:
+            old_x, old_y = self._samples.popleft()
+            self._sum_x -= old_x
+            self._sum_y -= old_y
+            self._sum_xx -= old_x * old_x
+            self._sum_xy -= old_x * old_y
+
+    def covered_seconds(self):
+        if len(self._samples) < 2:
+            return 0
+        return (self._samples[-1][0] - self._samples[0][0]) * SECONDS_PER_DAY
+
+    def line(self):
+        """
+        Returns (slope in gravity per day, fitted gravity at the latest sample), None without enough samples.
+        """
+        n = len(self._samples)
+        denominator = n * self._sum_xx - self._sum_x * self._sum_x
+        if n < 2 or denominator <= 0:
+            return None
+        slope = (n * self._sum_xy - self._sum_x * self._sum_y) / denominator
+        intercept = (self._sum_y - slope * self._sum_x) / n
+        return slope, intercept + slope * self._samples[-1][0]
+
+
+class FermentationAnalytics:
+    """
+    Gravity velocity, ETA to final gravity and stall/finish detection per Tilt color.
+    """
+    def __init__(self, config: PitchConfig):
+        self.config = config
+        self._trends: Dict[str, GravityTrend] = dict()
+        self._stats: Dict[str, FermentationStats] = dict()
+
+    def apply(self, tilt_status: TiltStatus) -> TiltStatus:
+        trend = self._trends.get(tilt_status.color)
+        if trend is None:
+            trend = self._trends[tilt_status.color] = GravityTrend(self.config.analytics_window_hours * 3600,
+                                                                   self.config.analytics_sample_seconds)
+        if trend.add(tilt_status.timestamp.timestamp(), tilt_status.gravity):
+            self._stats[tilt_status.color] = self._get_stats(tilt_status, trend)
+        stats = self._stats.get(tilt_status.color)
+        return tilt_status.with_fermentation(stats) if stats is not None else tilt_status
+
+    def _get_stats(self, tilt_status: TiltStatus, trend: GravityTrend) -> Optional[FermentationStats]:
+        line = trend.line()
+        if line is None or trend.covered_seconds() < self.config.analytics_min_hours * 3600:
+            return None
+        slope, gravity = line
+        velocity = slope * 1000
+        final_gravity = self.config.get_color_profile(tilt_status.color).final_gravity
+        eta = None
+        if final_gravity is not None and gravity <= final_gravity + FINISHED_TOLERANCE:
+            state = STATE_FINISHED
+        elif abs(velocity) < self.config.analytics_stall_points_per_day:
+            state = STATE_STALLED if final_gravity is not None else STATE_STABLE
+        else:
+            state = STATE_FERMENTING
+            if final_gravity is not None and slope < 0:
+                days = (gravity - final_gravity) / -slope
+                if days <= MAX_ETA_DAYS:
+                    eta = (tilt_status.timestamp + datetime.timedelta(days=days)).replace(microsecond=0)
+        return FermentationStats(gravity_velocity=round(velocity, 2), eta=eta, state=state)
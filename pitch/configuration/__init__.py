@@ -1 +1,2 @@
-from .pitch_config import PitchConfig
\ No newline at end of file
+from .pitch_config import PitchConfig
+from .color_profile import ColorProfile
@@ -0,0 +1,13 @@
+from typing import NamedTuple, Optional
+
+
+class ColorProfile(NamedTuple):
+    """
+    Name and calibration for one Tilt color, resolved from config once instead of on every reading.
+    """
+    color: str
+    name: str
+    original_gravity: Optional[float]
+    final_gravity: Optional[float]
+    temp_offset: float
+    gravity_offset: float
@@ -1,18 +1,80 @@
 import json
 import os
+from .color_profile import ColorProfile
 
 
 class PitchConfig:
 
     def __init__(self, data: dict):
+        # Per color profiles, built on first use and cleared whenever config changes
+        self._color_profiles = dict()
         # Queue
         self.queue_size = 3
         self.queue_empty_sleep_seconds = 1
+        # Bluetooth adapters and remote receivers
+        self.bluetooth_adapters = list()
+        self.receiver_name = None
+        self.receiver_listen_port = None
+        self.receiver_forward_to = None
+        self.receiver_merge_window_seconds = 1
+        # Simulator (--simulate-beacons)
+        self.simulate_colors = ["simulated"]
+        self.simulate_rate_hz = 2
+        self.simulate_tilt_pro = False
+        self.simulate_time_scale = 1
+        self.simulate_original_gravity = 1.055
+        self.simulate_final_gravity = 1.010
+        self.simulate_fermentation_days = 7
+        self.simulate_temp_fahrenheit = 68
+        self.simulate_jitter = 0.1
+        self.simulate_packet_loss = 0
+        self.simulate_duplicate_chance = 0
+        self.simulate_duplicate_burst = 3
+        self.simulate_seed = None
+        # Repeated broadcasts
+        self.beacon_heartbeat_seconds = 10
+        # Signal quality
+        self.signal_window_size = 60
+        # Provider inboxes
+        self.provider_queue_size = 10
+        self.provider_overflow_policy = "drop_oldest"
+        # Smoothing
+        self.filter_type = "none"
+        self.filter_window = 10
+        self.filter_alpha = 0.2
+        self.filter_kalman_process_noise = 0.01
+        self.filter_kalman_measurement_noise = 1
+        self.provider_values = "raw"
+        # Fermentation analytics
+        self.analytics_window_hours = 24
+        self.analytics_sample_seconds = 300
+        self.analytics_min_hours = 4
+        self.analytics_stall_points_per_day = 1
+        # TUI (--ui) chart history, per Tilt
+        self.tui_history_points = 200
+        self.tui_history_levels = 10
+        self.tui_refresh_seconds = 5
+        # Aggregation, rate limited providers send the average since their last update instead of one sample
+        self.provider_aggregate = False
         # Broadcast Data ranges
         self.temp_range_min = 0
         self.temp_range_max = 212
         self.gravity_range_min = 0.7
         self.gravity_range_max = 1.4
+        # HTTP (webhooks and cloud services)
+        self.http_connect_timeout_seconds = 5
+        self.http_read_timeout_seconds = 15
+        self.http_retries = 2
+        self.http_retry_backoff_seconds = 1
+        self.http_pool_hosts = 10
+        self.http_pool_size = 4
+        # Outbox, posts waiting for an HTTP endpoint to come back
+        self.outbox_enabled = True
+        self.outbox_db_path = 'pitch_outbox.db'
+        self.outbox_max_rows = 10000
+        self.outbox_replay_concurrency = 2
+        self.outbox_retry_min_seconds = 5
+        self.outbox_retry_max_seconds = 300
         # Webhook
         self.webhook_urls = list()
         self.webhook_limit_rate = 1
@@ -20,33 +82,79 @@ class PitchConfig:
         # File Path
         self.log_file_path = 'pitch_log.json'
         self.log_file_max_mb = 10
+        self.log_file_format = "json"
+        self.log_file_compression = "gzip"
+        self.log_file_max_segments = 0
+        self.log_file_flush_seconds = 5
         # Prometheus
         self.prometheus_enabled = True
         self.prometheus_port = 8000
         # Brewfather
         self.brewfather_custom_stream_url = None
         self.brewfather_custom_stream_temp_unit = "F"
+        self.brewfather_values = "smoothed"
+        self.brewfather_aggregate = True
         # Taplist.io
         self.taplistio_url = None
         # Brewersfriend
         self.brewersfriend_api_key = None
         self.brewersfriend_temp_unit = "F"
+        self.brewersfriend_aggregate = True
         # Grainfather
         self.grainfather_custom_stream_urls = None
         self.grainfather_temp_unit = "F"
+        self.grainfather_values = "smoothed"
+        self.grainfather_aggregate = True
+        # SQLite
+        self.sqlite_db_path = 'pitch.db'
+        self.sqlite_batch_size = 20
+        self.sqlite_flush_seconds = 60
+        self.sqlite_retention_days = 0
+        self.sqlite_aggregate = True
+        # History API (serves the SQLite history)
+        self.history_api_enabled = False
+        self.history_api_port = 8001
         # Azure IoT Hub
         self.azure_iot_hub_connectionstring = None
         self.azure_iot_hub_limit_rate = 8000 # free tier 8000msg per day
         self.azure_iot_hub_limit_period = 86400 # free tier 8000msg per day
+        self.azure_iot_hub_batch_size = 1
+        self.azure_iot_hub_batch_linger_seconds = 1
+        self.azure_iot_hub_buffer_size = 1000
+        self.azure_iot_hub_reconnect_min_seconds = 1
+        self.azure_iot_hub_reconnect_max_seconds = 300
+        self.azure_iot_hub_stop_timeout_seconds = 5
+        self.azure_iot_hub_aggregate = True
         # Load user inputs from config file
         self.update(data)
 
     def update(self, data: dict):
         self.__dict__.update(data)
+        self._color_profiles.clear()
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if not name.startswith('_'):
+            self._color_profiles.clear()
+
+    def get_color_profile(self, color: str):
+        profile = self._color_profiles.get(color)
+        if profile is None:
+            profile = ColorProfile(color=color,
+                                   name=self.get_brew_name(color),
+                                   original_gravity=self.get_original_gravity(color),
+                                   final_gravity=self.get_final_gravity(color),
+                                   temp_offset=self.get_temp_offset(color),
+                                   gravity_offset=self.get_gravity_offset(color))
+            self._color_profiles[color] = profile
+        return profile
 
     def get_original_gravity(self, color: str):
         return self.__dict__.get(color + '_original_gravity')
 
+    def get_final_gravity(self, color: str):
+        return self.__dict__.get(color + '_final_gravity')
+
     def get_gravity_offset(self, color: str):
         return self.__dict__.get(color + '_gravity_offset', 0)
 
@@ -56,6 +164,24 @@ class PitchConfig:
     def get_brew_name(self, color: str):
         return self.__dict__.get(color + '_name', color)
 
+    def get_brew_id(self, color: str):
+        return self.__dict__.get(color + '_brew_id', self.get_brew_name(color))
+
+    def get_provider_queue_size(self, provider_key: str):
+        return self.__dict__.get(provider_key + '_queue_size', self.provider_queue_size)
+
+    def get_provider_overflow_policy(self, provider_key: str):
+        return self.__dict__.get(provider_key + '_overflow_policy', self.provider_overflow_policy)
+
+    def get_provider_values(self, provider_key: str):
+        return self.__dict__.get(provider_key + '_values', self.provider_values)
+
+    def get_provider_aggregate(self, provider_key: str):
+        return self.__dict__.get(provider_key + '_aggregate', self.provider_aggregate)
+
+    def get_filter_type(self, color: str):
+        return self.__dict__.get(color + '_filter_type', self.filter_type)
+
 
     @staticmethod
     def load(additional_config: dict = None):
@@ -0,0 +1,297 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional
+from prometheus_client import Counter, Gauge, Histogram
+from .aggregation import Aggregator
+from .configuration import PitchConfig
+from .models import ProviderStats, TiltStatus
+from .rate_limiter import RateLimitedException
+from .runtime import AsyncRuntime
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_COALESCE = "coalesce"
+# Waits for room instead of dropping, for replays where every reading has to arrive
+OVERFLOW_BLOCK = "block"
+overflow_policies = [OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_COALESCE, OVERFLOW_BLOCK]
+
+# Which values a provider is sent, see ReadingSmoother
+VALUES_RAW = "raw"
+VALUES_SMOOTHED = "smoothed"
+provider_values = [VALUES_RAW, VALUES_SMOOTHED]
+
+gauge_provider_queue_depth = Gauge('pitch_provider_queue_depth', 'Readings waiting in a provider inbox', ['provider'])
+counter_provider_dropped = Counter('pitch_provider_dropped', 'Readings dropped because a provider inbox was full', ['provider'])
+histogram_provider_update_seconds = Histogram('pitch_provider_update_seconds', 'Time spent in provider update', ['provider'])
+
+
+class ProviderInbox:
+    """
+    Bounded, thread safe inbox of readings waiting for a single provider.
+    """
+    def __init__(self, maxsize: int = 10, overflow_policy: str = OVERFLOW_DROP_OLDEST):
+        if overflow_policy not in overflow_policies:
+            raise ValueError("Overflow policy must be one of: {}".format(", ".join(overflow_policies)))
+        self.maxsize = max(1, maxsize)
+        self.overflow_policy = overflow_policy
+        self.closed = False
+        self._items: Deque[TiltStatus] = deque()
+        lock = threading.Lock()
+        self._not_empty = threading.Condition(lock)
+        self._not_full = threading.Condition(lock)
+
+    def put(self, tilt_status: TiltStatus):
+        """
+        Adds a reading to the inbox, returns False if a reading was dropped to make room (or this one was dropped).
+        """
+        with self._not_empty:
+            if self.overflow_policy == OVERFLOW_COALESCE and self._replace_pending(tilt_status):
+                return True
+            if self.overflow_policy == OVERFLOW_BLOCK:
+                self._not_full.wait_for(lambda: len(self._items) < self.maxsize or self.closed)
+                if self.closed:
+                    return False
+            dropped = False
+            if len(self._items) >= self.maxsize:
+                if self.overflow_policy == OVERFLOW_DROP_NEWEST:
+                    return False
+                self._items.popleft()
+                dropped = True
+            self._items.append(tilt_status)
+            self._not_empty.notify()
+            return not dropped
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        Blocks until a reading is available, returns None on timeout or when the inbox is closed and empty.
+        """
+        with self._not_empty:
+            if not self._items and not self.closed:
+                self._not_empty.wait(timeout)
+            if not self._items:
+                return None
+            self._not_full.notify()
+            return self._items.popleft()
+
+    def qsize(self):
+        return len(self._items)
+
+    def close(self):
+        with self._not_empty:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def _replace_pending(self, tilt_status: TiltStatus):
+        # Only one reading per color needs to wait, the newest one wins
+        for index, pending in enumerate(self._items):
+            if pending.color == tilt_status.color:
+                self._items[index] = tilt_status
+                return True
+        return False
+
+
+class ProviderWorker:
+    """
+    Runs a single provider on its own thread, fed by its own inbox, so a slow provider
+    can't hold up the others.
+    """
+    def __init__(self, provider, name: str, inbox: ProviderInbox, console_log: bool = True, values: str = VALUES_RAW,
+                 aggregator: Aggregator = None):
+        if values not in provider_values:
+            raise ValueError("Provider values must be one of: {}".format(", ".join(provider_values)))
+        self.provider = provider
+        self.name = name
+        self.inbox = inbox
+        self.console_log = console_log
+        self.values = values
+        # Averages readings the provider rate limits into the next one it sends
+        self.aggregator = aggregator
+        # Stats
+        self.processed = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.dropped = 0
+        self.last_latency = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def __str__(self):
+        return str(self.provider)
+
+    def start(self):
+        self._thread = threading.Thread(name="provider-{}".format(self.name), target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, tilt_status: TiltStatus):
+        if self.values == VALUES_RAW:
+            tilt_status = tilt_status.raw
+        if not self.inbox.put(tilt_status):
+            self.dropped += 1
+            counter_provider_dropped.labels(provider=self.name).inc()
+        gauge_provider_queue_depth.labels(provider=self.name).set(self.inbox.qsize())
+
+    def stats(self):
+        return ProviderStats(name=self.name,
+                             provider=str(self.provider),
+                             queue_depth=self.inbox.qsize(),
+                             queue_size=self.inbox.maxsize,
+                             processed=self.processed,
+                             rate_limited=self.rate_limited,
+                             errors=self.errors,
+                             dropped=self.dropped,
+                             last_latency=self.last_latency)
+
+    def stop(self, timeout: float = 5):
+        self.inbox.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._stop_provider()
+
+    def _stop_provider(self):
+        try:
+            self.provider.stop()
+        except Exception as e:
+            print("...stopped: {} ({})".format(self.provider, e))
+
+    def _run(self):
+        while True:
+            tilt_status = self.inbox.get()
+            if tilt_status is None:
+                return  # inbox closed and drained
+            gauge_provider_queue_depth.labels(provider=self.name).set(self.inbox.qsize())
+            self._update(tilt_status)
+
+    def _aggregate(self, tilt_status: TiltStatus):
+        if self.aggregator is None:
+            return tilt_status
+        return self.aggregator.add(tilt_status)
+
+    def _update(self, tilt_status: TiltStatus):
+        tilt_status = self._aggregate(tilt_status)
+        start = time.time()
+        try:
+            self.provider.update(tilt_status)
+            self._updated(tilt_status, start)
+        except RateLimitedException:
+            self._rate_limited(tilt_status)
+        except Exception as e:
+            self._failed(tilt_status, e)
+
+    def _updated(self, tilt_status: TiltStatus, start: float):
+        self.last_latency = time.time() - start
+        self.processed += 1
+        if self.aggregator is not None:
+            self.aggregator.reset(tilt_status.color)
+        histogram_provider_update_seconds.labels(provider=self.name).observe(self.last_latency)
+        if self.console_log:
+            print("Updated provider {} for color {} took {:.3f} seconds".format(self.provider, tilt_status.color, self.last_latency))
+
+    def _rate_limited(self, tilt_status: TiltStatus):
+        # nothing to worry about, just called this too many times (locally)
+        self.rate_limited += 1
+        if self.console_log:
+            print("Skipping update due to rate limiting for provider {} for color {}".format(self.provider, tilt_status.color))
+
+    def _failed(self, tilt_status: TiltStatus, e: Exception):
+        self.errors += 1
+        if self.console_log:
+            print("Failed to update provider {} for color {}".format(self.provider, tilt_status.color))
+        print(e)
+
+
+class AsyncProviderWorker(ProviderWorker):
+    """
+    Runs a provider implementing update_async as a task on the shared event loop, no thread needed.
+    """
+    def __init__(self, provider, name: str, inbox: ProviderInbox, runtime: AsyncRuntime, console_log: bool = True,
+                 values: str = VALUES_RAW, aggregator: Aggregator = None):
+        super().__init__(provider, name, inbox, console_log, values, aggregator)
+        self.runtime = runtime
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task = None
+
+    def start(self):
+        self._task = self.runtime.submit(self._run_async())
+
+    def submit(self, tilt_status: TiltStatus):
+        super().submit(tilt_status)
+        self.runtime.call_soon(self._wake)
+
+    def stop(self, timeout: float = 5):
+        self.inbox.close()
+        self.runtime.call_soon(self._wake)
+        try:
+            self._task.result(timeout)
+        except Exception as e:
+            print("...stopped: {} ({})".format(self.provider, e))
+        self._stop_provider()
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run_async(self):
+        # Created here so it belongs to the runtime's loop
+        self._wakeup = asyncio.Event()
+        while True:
+            tilt_status = self.inbox.get(timeout=0)
+            if tilt_status is None:
+                if self.inbox.closed:
+                    return  # inbox closed and drained
+                self._wakeup.clear()
+                if not self.inbox.qsize():
+                    await self._wakeup.wait()
+                continue
+            gauge_provider_queue_depth.labels(provider=self.name).set(self.inbox.qsize())
+            await self._update_async(tilt_status)
+
+    async def _update_async(self, tilt_status: TiltStatus):
+        tilt_status = self._aggregate(tilt_status)
+        start = time.time()
+        try:
+            await self.provider.update_async(tilt_status)
+            self._updated(tilt_status, start)
+        except RateLimitedException:
+            self._rate_limited(tilt_status)
+        except Exception as e:
+            self._failed(tilt_status, e)
+
+
+class Dispatcher:
+    """
+    Fans readings out to every enabled provider, each with its own bounded inbox, either raw or smoothed
+    values ({provider}_values) and optionally aggregation ({provider}_aggregate).  Providers implementing
+    update_async run on the shared event loop when a runtime is given, the rest get a worker thread.
+    """
+    def __init__(self, providers: list, config: PitchConfig, console_log: bool = True, runtime: AsyncRuntime = None):
+        self.workers: List[ProviderWorker] = list()
+        names = dict()
+        for provider in providers:
+            key = getattr(provider, 'config_key', None) or 'provider'
+            # Several providers can share a key (e.g. webhooks), keep metric labels unique
+            names[key] = names.get(key, 0) + 1
+            name = key if names[key] == 1 else "{}_{}".format(key, names[key])
+            inbox = ProviderInbox(config.get_provider_queue_size(key), config.get_provider_overflow_policy(key))
+            values = config.get_provider_values(key)
+            aggregator = Aggregator(config) if config.get_provider_aggregate(key) else None
+            if runtime is not None and provider.supports_async():
+                self.workers.append(AsyncProviderWorker(provider, name, inbox, runtime, console_log, values, aggregator))
+            else:
+                self.workers.append(ProviderWorker(provider, name, inbox, console_log, values, aggregator))
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, tilt_status: TiltStatus):
+        for worker in self.workers:
+            worker.submit(tilt_status)
+
+    def stats(self):
+        return [worker.stats() for worker in self.workers]
+
+    def stop(self, timeout: float = 5):
+        for worker in self.workers:
+            worker.stop(timeout)
@@ -0,0 +1,144 @@
+import bisect
+from collections import deque
+from typing import Dict, Optional, Tuple
+from .configuration import PitchConfig
+from .models import TiltStatus
+
+FILTER_NONE = "none"
+FILTER_MOVING_AVERAGE = "moving_average"
+FILTER_EXPONENTIAL = "exponential"
+FILTER_MEDIAN = "median"
+FILTER_KALMAN = "kalman"
+filter_types = [FILTER_NONE, FILTER_MOVING_AVERAGE, FILTER_EXPONENTIAL, FILTER_MEDIAN, FILTER_KALMAN]
+
+
+class ReadingFilter:
+    """
+    Incremental filter over a stream of values, update returns the filtered value.
+    """
+    def update(self, value: float) -> float:
+        raise NotImplementedError()
+
+
+class NoFilter(ReadingFilter):
+
+    def update(self, value: float) -> float:
+        return value
+
+
+class MovingAverageFilter(ReadingFilter):
+    """
+    Mean of the last window values, kept as a running sum.
+    """
+    def __init__(self, window: int):
+        self.window = max(1, window)
+        self._values = deque(maxlen=self.window)
+        self._sum = 0.0
+
+    def update(self, value: float) -> float:
+        if len(self._values) == self.window:
+            self._sum -= self._values[0]
+        self._values.append(value)
+        self._sum += value
+        return self._sum / len(self._values)
+
+
+class ExponentialFilter(ReadingFilter):
+    """
+    Exponential moving average, alpha is the weight of the newest value (0-1).
+    """
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self._value: Optional[float] = None
+
+    def update(self, value: float) -> float:
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self.alpha * (value - self._value)
+        return self._value
+
+
+class MedianFilter(ReadingFilter):
+    """
+    Median of the last window values, good at ignoring the odd spike.  The window is fixed so the
+    sorted copy stays small.
+    """
+    def __init__(self, window: int):
+        self.window = max(1, window)
+        self._values = deque(maxlen=self.window)
+        self._sorted = list()
+
+    def update(self, value: float) -> float:
+        if len(self._values) == self.window:
+            del self._sorted[bisect.bisect_left(self._sorted, self._values[0])]
+        self._values.append(value)
+        bisect.insort(self._sorted, value)
+        middle = len(self._sorted) // 2
+        if len(self._sorted) % 2:
+            return self._sorted[middle]
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2
+
+
+class KalmanFilter(ReadingFilter):
+    """
+    1-D Kalman filter for a value that changes slowly.  Only the ratio of process to measurement noise
+    matters, a lower ratio gives a smoother (slower) value.
+    """
+    def __init__(self, process_noise: float, measurement_noise: float):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self._estimate: Optional[float] = None
+        self._error = measurement_noise
+
+    def update(self, value: float) -> float:
+        if self._estimate is None:
+            self._estimate = value
+            return value
+        self._error += self.process_noise
+        gain = self._error / (self._error + self.measurement_noise)
+        self._estimate += gain * (value - self._estimate)
+        self._error *= 1 - gain
+        return self._estimate
+
+
+def create_filter(filter_type: str, config: PitchConfig) -> ReadingFilter:
+    if filter_type == FILTER_NONE:
+        return NoFilter()
+    if filter_type == FILTER_MOVING_AVERAGE:
+        return MovingAverageFilter(config.filter_window)
+    if filter_type == FILTER_EXPONENTIAL:
+        return ExponentialFilter(config.filter_alpha)
+    if filter_type == FILTER_MEDIAN:
+        return MedianFilter(config.filter_window)
+    if filter_type == FILTER_KALMAN:
+        return KalmanFilter(config.filter_kalman_process_noise, config.filter_kalman_measurement_noise)
+    raise ValueError("Filter type must be one of: {}".format(", ".join(filter_types)))
+
+
+class ReadingSmoother:
+    """
+    Smooths gravity and temperature per Tilt color.  Must see every valid reading, in order, so it runs
+    before readings are queued.  Returns a new TiltStatus, the raw one stays available as .raw
+    """
+    def __init__(self, config: PitchConfig):
+        # filter_type and every {color}_filter_type, checked at startup instead of on a color's first reading
+        for key, value in config.__dict__.items():
+            if (key == 'filter_type' or key.endswith('_filter_type')) and value not in filter_types:
+                raise ValueError("Filter type must be one of: {}".format(", ".join(filter_types)))
+        self.config = config
+        # color -> (gravity filter, temperature filter)
+        self._filters: Dict[str, Tuple[ReadingFilter, ReadingFilter]] = dict()
+
+    def apply(self, tilt_status: TiltStatus) -> TiltStatus:
+        filters = self._filters.get(tilt_status.color)
+        if filters is None:
+            filter_type = self.config.get_filter_type(tilt_status.color)
+            if filter_type == FILTER_NONE:
+                return tilt_status
+            filters = (create_filter(filter_type, self.config), create_filter(filter_type, self.config))
+            self._filters[tilt_status.color] = filters
+        gravity_filter, temp_filter = filters
+        return tilt_status.with_values(temp_fahrenheit=round(temp_filter.update(tilt_status.temp_fahrenheit), 2),
+                                       gravity=round(gravity_filter.update(tilt_status.gravity), 4),
+                                       config=self.config)
@@ -0,0 +1,71 @@
+import random
+import threading
+import time
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import Histogram
+from .configuration import PitchConfig
+
+histogram_http_request_seconds = Histogram('pitch_http_request_seconds', 'Time spent on HTTP requests, including retries', ['provider'])
+
+# Responses worth retrying, anything else is returned to the provider as-is
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+
+class HttpClient:
+    """
+    HTTP client shared by the HTTP based providers.  Connections are pooled per host and kept alive
+    between posts, every request has a timeout, and failures are retried with jittered backoff.
+    """
+    def __init__(self, config: PitchConfig):
+        self.timeout = (config.http_connect_timeout_seconds, config.http_read_timeout_seconds)
+        self.retries = config.http_retries
+        self.retry_backoff_seconds = config.http_retry_backoff_seconds
+        self.session = requests.Session()
+        # requests keeps one pool per host, each provider thread can hold a connection
+        adapter = HTTPAdapter(pool_connections=config.http_pool_hosts, pool_maxsize=config.http_pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def post(self, url: str, provider: str, **kwargs):
+        start = time.time()
+        try:
+            return self._post(url, **kwargs)
+        finally:
+            # The whole call, retries and backoff included
+            histogram_http_request_seconds.labels(provider=provider).observe(time.time() - start)
+
+    def _post(self, url: str, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    return response
+                response.close()
+            time.sleep(self._get_backoff(attempt))
+            attempt += 1
+
+    def _get_backoff(self, attempt: int):
+        # Full jitter, so providers retrying at the same time spread out
+        return random.uniform(0, self.retry_backoff_seconds * (2 ** attempt))
+
+
+_shared_client: Optional[HttpClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client(config: PitchConfig):
+    """
+    Returns the HttpClient shared by all providers, created on first use.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient(config)
+        return _shared_client
@@ -0,0 +1,84 @@
+import struct
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+from prometheus_client import Counter
+
+counter_beacon_packets = Counter('pitch_beacon_packets', 'Bluetooth advertisements seen by the scanner', ['result'])
+counter_beacon_duplicates = Counter('pitch_beacon_duplicates', 'Tilt broadcasts dropped because nothing changed since the last one', ['color'])
+
+# Apple Company ID, used by iBeacon manufacturer data
+APPLE_COMPANY_ID = 0x004C
+# iBeacon payload: type (0x02), length (0x15), 16 byte UUID, major, minor, tx power
+IBEACON_LENGTH = 23
+_ibeacon_body = struct.Struct('>16sHH')
+_ibeacon = struct.Struct('>BB16sHHb')
+
+
+def encode_ibeacon(beacon_uuid: str, major: int, minor: int, tx_power: int = -59) -> bytes:
+    """
+    iBeacon manufacturer data (the value under APPLE_COMPANY_ID), as a Tilt broadcasts it.
+    """
+    return _ibeacon.pack(0x02, 0x15, uuid.UUID(beacon_uuid).bytes, major, minor, tx_power)
+
+
+class IBeaconParser:
+    """
+    Parses Tilt readings out of raw iBeacon manufacturer data.  The scanner sees every advertisement in
+    range, so anything that isn't a Tilt is rejected on cheap byte checks before any object is created.
+    """
+    def __init__(self, uuid_to_colors: Dict[str, str]):
+        # Raw 16 byte UUID -> color, so packets can be matched without building a UUID
+        self.colors = {uuid.UUID(key).bytes: color for key, color in uuid_to_colors.items()}
+        # Tilt UUIDs only differ in a couple of bytes, checking the first one rejects most other beacons
+        self._first_bytes = frozenset(key[0] for key in self.colors)
+        self.accepted = 0
+        self.rejected = 0
+        self._accepted_counter = counter_beacon_packets.labels(result='accepted')
+        self._rejected_counter = counter_beacon_packets.labels(result='rejected')
+
+    def parse(self, manufacturer_data: dict) -> Optional[Tuple[str, int, int]]:
+        """
+        Returns (color, major, minor) for a Tilt iBeacon, otherwise None.
+        """
+        ib = manufacturer_data.get(APPLE_COMPANY_ID) if manufacturer_data else None
+        if (ib is None or len(ib) < IBEACON_LENGTH or ib[0] != 0x02 or ib[1] != 0x15
+                or ib[2] not in self._first_bytes):
+            return self._reject()
+        raw_uuid, major, minor = _ibeacon_body.unpack_from(ib, 2)
+        color = self.colors.get(raw_uuid)
+        if color is None:
+            return self._reject()
+        self.accepted += 1
+        self._accepted_counter.inc()
+        return color, major, minor
+
+    def _reject(self):
+        self.rejected += 1
+        self._rejected_counter.inc()
+        return None
+
+
+class BeaconDeduplicator:
+    """
+    Drops Tilt broadcasts that repeat the last major/minor seen for a color.  A repeat still gets through
+    once every heartbeat_seconds, so providers can tell the Tilt is alive.  0 or less disables it.
+    """
+    def __init__(self, heartbeat_seconds: float, clock=time.monotonic):
+        self.heartbeat_seconds = heartbeat_seconds
+        self.duplicates = 0
+        self._clock = clock
+        # color -> (major, minor, time last let through)
+        self._last = dict()
+
+    def is_duplicate(self, color: str, major: int, minor: int) -> bool:
+        if self.heartbeat_seconds <= 0:
+            return False
+        now = self._clock()
+        last = self._last.get(color)
+        if last is not None and last[0] == major and last[1] == minor and now - last[2] < self.heartbeat_seconds:
+            self.duplicates += 1
+            counter_beacon_duplicates.labels(color=color).inc()
+            return True
+        self._last[color] = (major, minor, now)
+        return False
@@ -0,0 +1,66 @@
+import queue
+import threading
+from collections import OrderedDict
+from prometheus_client import Counter
+from .models import TiltStatus
+
+counter_readings_superseded = Counter('pitch_readings_superseded', 'Readings replaced by a newer reading before being handled', ['color'])
+
+
+class ColorMailbox:
+    """
+    Queue holding at most one pending reading per Tilt color.  A new reading for a color replaces the
+    pending one but keeps its place in line, so colors are still handled in the order they first arrived
+    and a chatty Tilt can't starve the others.  Mirrors the queue.Queue methods used by pitch.
+    """
+    def __init__(self, maxsize: int = 0):
+        # maxsize is the number of colors that can be pending at once, 0 or less means unlimited
+        self.maxsize = maxsize
+        self.superseded = 0
+        self.rejected = 0
+        self.closed = False
+        self._pending: 'OrderedDict[str, TiltStatus]' = OrderedDict()
+        # Reentrant so close() is safe to call from a signal handler on the thread waiting in get()
+        self._not_empty = threading.Condition(threading.RLock())
+
+    def put_nowait(self, tilt_status: TiltStatus):
+        with self._not_empty:
+            if tilt_status.color in self._pending:
+                self._pending[tilt_status.color] = tilt_status
+                self.superseded += 1
+                counter_readings_superseded.labels(color=tilt_status.color).inc()
+                return
+            if 0 < self.maxsize <= len(self._pending):
+                self.rejected += 1
+                raise queue.Full
+            self._pending[tilt_status.color] = tilt_status
+            self._not_empty.notify()
+
+    def get(self, block: bool = True, timeout: float = None):
+        with self._not_empty:
+            if block and not self._pending:
+                self._not_empty.wait_for(lambda: self._pending or self.closed, timeout)
+            if not self._pending:
+                raise queue.Empty
+            _, tilt_status = self._pending.popitem(last=False)
+            return tilt_status
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def close(self):
+        """
+        Wakes up anything waiting in get(), used on shutdown.
+        """
+        with self._not_empty:
+            self.closed = True
+            self._not_empty.notify_all()
+
+    def qsize(self):
+        return len(self._pending)
+
+    def empty(self):
+        return not self._pending
+
+    def full(self):
+        return 0 < self.maxsize <= len(self._pending)
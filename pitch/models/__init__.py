@@ -1,2 +1,7 @@
+from .signal_stats import SignalStats
+from .tilt_reading import TiltReading
+from .reading_aggregate import ReadingAggregate
+from .fermentation_stats import FermentationStats
+from .provider_stats import ProviderStats
 from .tilt_status import TiltStatus
-from .json_serialize import JsonSerialize
\ No newline at end of file
+from .json_serialize import JsonSerialize
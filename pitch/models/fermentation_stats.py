@@ -0,0 +1,14 @@
+import datetime
+from typing import NamedTuple, Optional
+
+
+class FermentationStats(NamedTuple):
+    """
+    Trend of a fermentation, from a rolling regression of gravity over time.
+    """
+    # Change in gravity points (0.001) per day, negative while fermenting
+    gravity_velocity: Optional[float]
+    # When gravity is expected to reach {color}_final_gravity
+    eta: Optional[datetime.datetime]
+    # fermenting, stalled, finished or stable (not moving, no final gravity to compare to)
+    state: Optional[str]
@@ -1,5 +1,39 @@
+import datetime
+import json
 import jsonpickle
 
+# C accelerated encoder with the same settings jsonpickle uses, so output is identical
+_encode = json.JSONEncoder().encode
+
+
 class JsonSerialize:
+    __slots__ = ()
+    # Set on subclasses with a fixed set of attributes to skip jsonpickle's reflection
+    json_fields = None
+
     def json(self):
-        return jsonpickle.encode(self, unpicklable=False)
\ No newline at end of file
+        """
+        Encodes the object as JSON, the result is cached so multiple providers can share it.
+        """
+        try:
+            return self._json
+        except AttributeError:
+            encoded = self._encode_json()
+            # Bypass any __setattr__ (e.g. read only models)
+            object.__setattr__(self, '_json', encoded)
+            return encoded
+
+    def _encode_json(self):
+        if self.json_fields is None:
+            return jsonpickle.encode(self, unpicklable=False)
+        values = dict()
+        for field in self.json_fields:
+            value = getattr(self, field)
+            if isinstance(value, datetime.datetime):
+                value = value.isoformat()
+            values[field] = value
+        try:
+            return _encode(values)
+        except TypeError:
+            # A value json can't encode natively, let jsonpickle flatten it
+            return jsonpickle.encode(values, unpicklable=False)
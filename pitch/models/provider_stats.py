@@ -0,0 +1,16 @@
+from typing import NamedTuple
+
+
+class ProviderStats(NamedTuple):
+    """
+    Point in time stats for one provider worker, see Dispatcher.stats
+    """
+    name: str
+    provider: str
+    queue_depth: int
+    queue_size: int
+    processed: int
+    rate_limited: int
+    errors: int
+    dropped: int
+    last_latency: float
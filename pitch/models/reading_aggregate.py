@@ -0,0 +1,16 @@
+import datetime
+from typing import NamedTuple
+
+
+class ReadingAggregate(NamedTuple):
+    """
+    Summary of the readings for one Tilt since a provider last sent one, see Aggregator.
+    """
+    count: int
+    first_timestamp: datetime.datetime
+    gravity_min: float
+    gravity_max: float
+    gravity_mean: float
+    temp_fahrenheit_min: float
+    temp_fahrenheit_max: float
+    temp_fahrenheit_mean: float
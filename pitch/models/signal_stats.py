@@ -0,0 +1,11 @@
+from typing import NamedTuple, Optional
+
+
+class SignalStats(NamedTuple):
+    """
+    Bluetooth signal quality for one Tilt, over the last few broadcasts.
+    """
+    rssi: Optional[int]
+    rssi_mean: Optional[float]
+    rssi_variance: Optional[float]
+    packets_per_minute: Optional[float]
@@ -0,0 +1,12 @@
+from typing import NamedTuple, Optional
+
+
+class TiltReading(NamedTuple):
+    """
+    A single Tilt broadcast as heard by one receiver (a local Bluetooth adapter or a remote Pitch).
+    """
+    color: str
+    major: int
+    minor: int
+    rssi: Optional[int]
+    receiver: str
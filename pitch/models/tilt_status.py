@@ -1,30 +1,138 @@
 from ..configuration import PitchConfig
 from .json_serialize import JsonSerialize
+from .signal_stats import SignalStats
+from .reading_aggregate import ReadingAggregate
+from .fermentation_stats import FermentationStats
 import datetime
 
 
+# TiltStatus is read only, values are set once while it is built
+_set = object.__setattr__
+
+
 class TiltStatus(JsonSerialize):
+    # JSON output, in the same order jsonpickle used to produce
+    json_fields = ('timestamp', 'color', 'name', 'hd', 'temp_fahrenheit', 'temp_celsius', 'original_gravity', 'gravity',
+                   'degrees_plato', 'alcohol_by_volume', 'apparent_attenuation', 'temp_valid', 'gravity_valid',
+                   'rssi', 'rssi_mean', 'rssi_variance', 'packets_per_minute',
+                   'gravity_velocity', 'fermentation_eta', 'fermentation_state')
+    __slots__ = json_fields + ('_raw', '_aggregate', '_json')
+    # Copied as-is when a reading is rebuilt with other values
+    _carried_fields = ('rssi', 'rssi_mean', 'rssi_variance', 'packets_per_minute',
+                       'gravity_velocity', 'fermentation_eta', 'fermentation_state')
 
-    def __init__(self, color, temp_fahrenheit, current_gravity, config: PitchConfig):
-        self.timestamp = datetime.datetime.now()
-        self.color = color
-        self.name = config.get_brew_name(color)
-        self.hd = current_gravity > 2  # Tilt Pro?
+    def __init__(self, color, temp_fahrenheit, current_gravity, config: PitchConfig, signal: SignalStats = None,
+                 timestamp: datetime.datetime = None):
+        profile = config.get_color_profile(color)
+        hd = current_gravity > 2  # Tilt Pro?
 
         # With Tilt Pro values have more precision, which has to be adjusted
-        if self.hd:
+        if hd:
             current_gravity /= 10
             temp_fahrenheit /= 10
 
-        self.temp_fahrenheit = temp_fahrenheit + config.get_temp_offset(color)
-        self.temp_celsius = TiltStatus.get_celsius(self.temp_fahrenheit)
-        self.original_gravity = config.get_original_gravity(color)
-        self.gravity = current_gravity + config.get_gravity_offset(color)
-        self.degrees_plato = TiltStatus.get_degrees_plato(self.gravity)
-        self.alcohol_by_volume = TiltStatus.get_alcohol_by_volume(self.original_gravity, self.gravity)
-        self.apparent_attenuation = TiltStatus.get_apparent_attenuation(self.original_gravity, self.gravity)
-        self.temp_valid = (config.temp_range_min < self.temp_fahrenheit < config.temp_range_max)
-        self.gravity_valid = (config.gravity_range_min < self.gravity < config.gravity_range_max)
+        self._set_values(timestamp or datetime.datetime.now(), color, profile.name, hd,
+                         temp_fahrenheit + profile.temp_offset,
+                         current_gravity + profile.gravity_offset,
+                         profile.original_gravity, config)
+        self._set_signal(signal)
+        self._set_fermentation(None)
+
+    @property
+    def raw(self):
+        """
+        The reading before smoothing, itself if it wasn't smoothed.
+        """
+        try:
+            return self._raw
+        except AttributeError:
+            return self
+
+    @property
+    def aggregate(self):
+        """
+        Summary of the readings averaged into this one, None for a single reading.
+        """
+        try:
+            return self._aggregate
+        except AttributeError:
+            return None
+
+    def with_values(self, temp_fahrenheit, gravity, config: PitchConfig, aggregate: ReadingAggregate = None):
+        """
+        Copy of this reading with a different (e.g. smoothed) temperature and gravity, derived values are recalculated.
+        """
+        tilt_status = TiltStatus.__new__(TiltStatus)
+        tilt_status._set_values(self.timestamp, self.color, self.name, self.hd, temp_fahrenheit, gravity,
+                                self.original_gravity, config)
+        for name in TiltStatus._carried_fields:
+            _set(tilt_status, name, getattr(self, name))
+        _set(tilt_status, '_raw', self.raw)
+        if aggregate is not None:
+            _set(tilt_status, '_aggregate', aggregate)
+        return tilt_status
+
+    def with_fermentation(self, fermentation: FermentationStats):
+        """
+        Copy of this reading with fermentation analytics (velocity, ETA, state) added.
+        """
+        tilt_status = TiltStatus.__new__(TiltStatus)
+        for name in TiltStatus.__slots__:
+            if name != '_json' and hasattr(self, name):
+                _set(tilt_status, name, getattr(self, name))
+        tilt_status._set_fermentation(fermentation)
+        return tilt_status
+
+    @staticmethod
+    def recorded(color, temp_fahrenheit, gravity, config: PitchConfig, timestamp: datetime.datetime):
+        """
+        A reading read back from a log or database, its calibration offsets were applied when it was recorded.
+        """
+        profile = config.get_color_profile(color)
+        tilt_status = TiltStatus.__new__(TiltStatus)
+        tilt_status._set_values(timestamp, color, profile.name, False, temp_fahrenheit, gravity,
+                                profile.original_gravity, config)
+        tilt_status._set_signal(None)
+        tilt_status._set_fermentation(None)
+        return tilt_status
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TiltStatus is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError("TiltStatus is read only")
+
+    def _set_values(self, timestamp, color, name, hd, temp_fahrenheit, gravity, original_gravity, config: PitchConfig):
+        _set(self, 'timestamp', timestamp)
+        _set(self, 'color', color)
+        _set(self, 'name', name)
+        _set(self, 'hd', hd)
+        _set(self, 'temp_fahrenheit', temp_fahrenheit)
+        _set(self, 'temp_celsius', TiltStatus.get_celsius(temp_fahrenheit))
+        _set(self, 'original_gravity', original_gravity)
+        _set(self, 'gravity', gravity)
+        _set(self, 'degrees_plato', TiltStatus.get_degrees_plato(gravity))
+        _set(self, 'alcohol_by_volume', TiltStatus.get_alcohol_by_volume(original_gravity, gravity))
+        _set(self, 'apparent_attenuation', TiltStatus.get_apparent_attenuation(original_gravity, gravity))
+        _set(self, 'temp_valid', config.temp_range_min < temp_fahrenheit < config.temp_range_max)
+        _set(self, 'gravity_valid', config.gravity_range_min < gravity < config.gravity_range_max)
+
+    def _set_signal(self, signal: SignalStats):
+        # Bluetooth signal quality, None when unknown (e.g. simulated beacons)
+        _set(self, 'rssi', signal.rssi if signal else None)
+        _set(self, 'rssi_mean', TiltStatus._round(signal.rssi_mean, 1) if signal else None)
+        _set(self, 'rssi_variance', TiltStatus._round(signal.rssi_variance, 2) if signal else None)
+        _set(self, 'packets_per_minute', TiltStatus._round(signal.packets_per_minute, 1) if signal else None)
+
+    def _set_fermentation(self, fermentation: FermentationStats):
+        # None until there is enough history, see FermentationAnalytics
+        _set(self, 'gravity_velocity', fermentation.gravity_velocity if fermentation else None)
+        _set(self, 'fermentation_eta', fermentation.eta if fermentation else None)
+        _set(self, 'fermentation_state', fermentation.state if fermentation else None)
+
+    @staticmethod
+    def _round(value, digits):
+        return round(value, digits) if value is not None else None
 
     @staticmethod
     def get_celsius(temp_fahrenheit):
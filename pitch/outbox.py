@@ -0,0 +1,222 @@
+import json
+import random
+import sqlite3
+import threading
+from typing import Optional
+import requests
+from prometheus_client import Counter, Gauge
+from .configuration import PitchConfig
+from .http_client import HttpClient, RETRY_STATUS_CODES
+from .rate_limiter import DeviceRateLimiter, RateLimitedException
+
+gauge_outbox_pending = Gauge('pitch_outbox_pending', 'Posts waiting in a provider outbox for the endpoint to come back', ['provider'])
+counter_outbox_dropped = Counter('pitch_outbox_dropped', 'Posts dropped from a full provider outbox', ['provider'])
+
+# Shared by every outbox, limits how many replay at the same time
+_replay_slots: Optional[threading.BoundedSemaphore] = None
+_replay_slots_lock = threading.Lock()
+
+
+def _get_replay_slots(config: PitchConfig):
+    global _replay_slots
+    with _replay_slots_lock:
+        if _replay_slots is None:
+            _replay_slots = threading.BoundedSemaphore(max(1, config.outbox_replay_concurrency))
+        return _replay_slots
+
+
+class Outbox:
+    """
+    Store and forward for an HTTP provider.  Posts that fail because the endpoint can't be reached (after the
+    HTTP client's own retries) are written to a SQLite table and replayed in order by a background thread,
+    with backoff while the endpoint is still down and within the provider's rate limit.  While posts are
+    waiting new ones queue up behind them, so the endpoint never sees readings out of order.  Direct posts and
+    replays share the provider's rate limiter, so together they never go over the provider's rate limit.
+
+    With coalesce only the newest post per URL and color is kept, for services that only show the latest
+    reading (replaying hours of old readings there just burns through the rate limit).
+    """
+    def __init__(self, config: PitchConfig, name: str, http: HttpClient, rate_limiter: DeviceRateLimiter,
+                 coalesce: bool = False):
+        self.name = name
+        self.http = http
+        self.enabled = config.outbox_enabled
+        self.db_path = config.outbox_db_path
+        self.max_rows = max(1, config.outbox_max_rows)
+        self.retry_min_seconds = config.outbox_retry_min_seconds
+        self.retry_max_seconds = config.outbox_retry_max_seconds
+        self.coalesce = coalesce
+        self.rate_limiter = rate_limiter
+        # The provider's worker and the replay thread both use the rate limiter
+        self._rate_limiter_lock = threading.Lock()
+        self.replay_slots = _get_replay_slots(config)
+        # Stats
+        self.pending = 0
+        self.replayed = 0
+        self.dropped = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not self.enabled:
+            return
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock:
+            # Has to be set before the first table is created, lets deleted rows be given back to the file system
+            self._conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    color TEXT,
+                    url TEXT NOT NULL,
+                    headers TEXT,
+                    body BLOB
+                )
+                '''
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_provider_id ON outbox (provider, id)')
+            self._conn.commit()
+            # Anything left from before a restart goes first
+            self.pending = self._conn.execute('SELECT count(*) FROM outbox WHERE provider = ?', (self.name,)).fetchone()[0]
+        self._update_gauge()
+        self._thread = threading.Thread(name='outbox-{}'.format(self.name), target=self._run, daemon=True)
+        self._thread.start()
+        self._wake.set()
+
+    def stop(self, timeout: float = 5):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    def post(self, color: str, url: str, headers: dict = None, data=None):
+        """
+        Posts now if nothing is waiting, returns the response, or None if the post was stored for later.
+        Raises RateLimitedException if posting now would go over the rate limit.  The limit goes by the time
+        posted, not the reading's time, so replayed readings can't go over the service's own limits.
+        """
+        if self._conn is None:
+            self._approve(color)
+            return self.http.post(url, self.name, headers=headers, data=data)
+        if self.pending:
+            # Sent after the waiting posts, by the replay within the rate limit
+            self._store(color, url, headers, data)
+            return None
+        self._approve(color)
+        try:
+            response = self.http.post(url, self.name, headers=headers, data=data)
+        except (requests.ConnectionError, requests.Timeout):
+            self._store(color, url, headers, data)
+            return None
+        if response.status_code in RETRY_STATUS_CODES:
+            self._store(color, url, headers, data)
+            return None
+        return response
+
+    def _approve(self, color: str):
+        with self._rate_limiter_lock:
+            self.rate_limiter.approve(color)
+
+    def _store(self, color: str, url: str, headers: Optional[dict], data):
+        with self._lock:
+            if self.coalesce:
+                self._conn.execute('DELETE FROM outbox WHERE provider = ? AND url = ? AND color IS ?', (self.name, url, color))
+            self._conn.execute('INSERT INTO outbox (provider, color, url, headers, body) VALUES (?, ?, ?, ?, ?)',
+                               (self.name, color, url, json.dumps(headers or {}), data))
+            # Size cap, the oldest posts go first
+            dropped = self._conn.execute(
+                'DELETE FROM outbox WHERE provider = ? AND id <= '
+                '(SELECT id FROM outbox WHERE provider = ? ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                (self.name, self.name, self.max_rows)).rowcount
+            self._conn.commit()
+            self.pending = self._conn.execute('SELECT count(*) FROM outbox WHERE provider = ?', (self.name,)).fetchone()[0]
+        if dropped > 0:
+            self.dropped += dropped
+            counter_outbox_dropped.labels(provider=self.name).inc(dropped)
+        self._update_gauge()
+        self._wake.set()
+
+    def _run(self):
+        attempt = 0
+        while not self._stop_event.is_set():
+            self._wake.clear()
+            try:
+                delivered = self._replay_oldest()
+            except RateLimitedException:
+                self._stop_event.wait(self.retry_min_seconds)
+                continue
+            if delivered is None:
+                self._wake.wait()
+            elif delivered:
+                attempt = 0
+            else:
+                attempt += 1
+                self._stop_event.wait(self._get_backoff(attempt))
+
+    def _replay_oldest(self):
+        """
+        Replays the oldest waiting post, returns whether it was delivered or None if nothing is waiting.  The post
+        is picked once a replay slot is free, so one coalesced or dropped while waiting for a slot isn't sent.
+        """
+        with self.replay_slots:
+            row = self._oldest()
+            if row is None:
+                return None
+            row_id, color, url, headers, body = row
+            self._approve(color)
+            delivered = self._replay(url, json.loads(headers), body)
+        if delivered:
+            self._delete(row_id)
+        return delivered
+
+    def _replay(self, url: str, headers: dict, body):
+        try:
+            response = self.http.post(url, self.name, headers=headers, data=body)
+        except (requests.ConnectionError, requests.Timeout):
+            return False
+        if response.status_code in RETRY_STATUS_CODES:
+            return False
+        if not response.ok:
+            # The endpoint is back but won't take this one, retrying won't help
+            print("Outbox for {} dropped a post rejected with status {}".format(self.name, response.status_code))
+        self.replayed += 1
+        return True
+
+    def _oldest(self):
+        with self._lock:
+            if self._conn is None:
+                return None
+            return self._conn.execute('SELECT id, color, url, headers, body FROM outbox WHERE provider = ? ORDER BY id LIMIT 1',
+                                      (self.name,)).fetchone()
+
+    def _delete(self, row_id: int):
+        with self._lock:
+            if self._conn is None:
+                return  # stopped while replaying, it will be sent again next time
+            # Already gone if it was coalesced or dropped while being replayed
+            deleted = self._conn.execute('DELETE FROM outbox WHERE id = ?', (row_id,)).rowcount
+            self._conn.commit()
+            self.pending = max(0, self.pending - deleted)
+            if not self.pending:
+                # Caught up, give the space back.  The pragma frees a page per step, a script runs it to the end,
+                # the checkpoint then lets the file itself shrink
+                self._conn.executescript('PRAGMA incremental_vacuum; PRAGMA wal_checkpoint(TRUNCATE);')
+        self._update_gauge()
+
+    def _update_gauge(self):
+        gauge_outbox_pending.labels(provider=self.name).set(self.pending)
+
+    def _get_backoff(self, attempt: int):
+        # Exponential with jitter, capped so a long outage is still retried regularly
+        backoff = min(self.retry_max_seconds, self.retry_min_seconds * (2 ** (attempt - 1)))
+        return random.uniform(backoff / 2, backoff)
@@ -1,16 +1,27 @@
+import os
 import signal
+import socket
 import threading
 import time
 import queue
-import uuid as _uuid
 import asyncio
-from random import randrange
-from .abstractions.beacon_packet import BeaconPacket
-from .models import TiltStatus
+import concurrent.futures
+import functools
+from .models import TiltStatus, TiltReading
 from .providers import *
 from .configuration import PitchConfig
 from .providers.TuiProvider import TuiProvider
-from .rate_limiter import RateLimitedException
+from .dispatcher import Dispatcher, OVERFLOW_BLOCK
+from .mailbox import ColorMailbox
+from .runtime import AsyncRuntime
+from .signal_quality import SignalTracker
+from .filters import ReadingSmoother
+from .analytics import FermentationAnalytics
+from .receivers import ReadingForwarder, ReadingMerger, listen_for_receivers
+from .ibeacon import IBeaconParser, BeaconDeduplicator
+from .simulator import BeaconSimulator
+from .replay import Replayer
+from .storage import LogRecord
 from pyfiglet import Figlet
 from bleak import BleakScanner
 
@@ -31,6 +42,9 @@ uuid_to_colors = {
 
 colors_to_uuid = dict((v, k) for k, v in uuid_to_colors.items())
 
+# Matches raw advertisements against the Tilt UUIDs
+ibeacon_parser = IBeaconParser(uuid_to_colors)
+
 # Load config from file, with defaults, and args
 config: PitchConfig = PitchConfig.load()
 
@@ -42,23 +56,54 @@ normal_providers = [
         GrainfatherCustomStreamCloudProvider(config),
         TaplistIOCloudProvider(config),
         AzureIoTHubCloudProvider(config),
-        SqliteCloudProvider(config)
+        SqliteCloudProvider(config),
+        HistoryApiCloudProvider(config)
     ]
 
-# Queue for holding incoming scans
-pitch_q = queue.Queue(maxsize=config.queue_size)
+# Queue for holding incoming scans, only the latest reading per color is kept.  Not capped, it can't hold more
+# than one reading per color so a new color is never turned away (queue_size is deprecated and ignored)
+pitch_q = ColorMailbox()
+
+# Drops repeated broadcasts before any work is done on them
+beacon_dedup = BeaconDeduplicator(config.beacon_heartbeat_seconds)
+
+# Rolling RSSI and broadcast rate per color
+signal_tracker = SignalTracker(config.signal_window_size)
+
+# Smoothed gravity and temperature per color, for providers that want them
+reading_smoother = ReadingSmoother(config)
+
+# Gravity velocity, ETA and stalled/finished detection per color
+fermentation_analytics = FermentationAnalytics(config)
+
+# Name sent with readings forwarded to a hub
+receiver_name = config.receiver_name or socket.gethostname()
+
+# When set this Pitch is only a receiver, readings are forwarded to the hub instead of handled here
+reading_forwarder = None
+if config.receiver_forward_to:
+    _forward_host, _forward_port = config.receiver_forward_to.rsplit(':', 1)
+    reading_forwarder = ReadingForwarder(_forward_host, int(_forward_port))
+
+# Several adapters or remote receivers can hear the same broadcast, keep the strongest copy
+_receiver_count = len(config.bluetooth_adapters or [None]) + (1 if config.receiver_listen_port else 0)
+reading_merger = ReadingMerger(config.receiver_merge_window_seconds if _receiver_count > 1 else 0,
+                               lambda reading: _tilt_callback(reading))
 
 #############################################
 #############################################
 
 
-def pitch_main(providers, timeout_seconds: int, simulate_beacons: bool, tui_enabled: bool = False, console_log: bool = True):
+def pitch_main(providers, timeout_seconds: int, simulate_beacons: bool, tui_enabled: bool = False, console_log: bool = True,
+               replay_path: str = None, replay_speed: float = 0):
     if providers is None:
         providers = normal_providers
     if tui_enabled:
         providers.append(TuiProvider(config))
 
     _start_message()
+    if replay_path is not None:
+        _check_replay_path(replay_path)
     # add any webhooks defined in config
     webhook_providers = _get_webhook_providers(config)
     if webhook_providers:
@@ -74,112 +119,204 @@ def pitch_main(providers, timeout_seconds: int, simulate_beacons: bool, tui_enab
                 provider__start_message = ''
             print("...started: {} {}".format(provider, provider__start_message))
     # Start
-    _start_scanner(enabled_providers, timeout_seconds, simulate_beacons, console_log)
+    if replay_path is not None:
+        _start_replay(enabled_providers, replay_path, replay_speed, console_log)
+    else:
+        _start_scanner(enabled_providers, timeout_seconds, simulate_beacons, console_log)
 
 
 def _start_scanner(enabled_providers: list, timeout_seconds: int, simulate_beacons: bool, console_log: bool):
+    # Set by SIGTERM, Ctrl+C or the timeout, tells the scanner and simulator threads to stop
+    stop_event = threading.Event()
+    # Trigger stop_event on termination signal, and wake up the main loop waiting on the queue
+    signal.signal(signal.SIGTERM, lambda signalNumber, frame: _stop(stop_event))
+    # One event loop shared by the scanner and any async providers
+    runtime = AsyncRuntime()
+    runtime.start()
+    # Simulated advertisements go through the same parsing as real ones
+    simulator = None
     if simulate_beacons:
-        # Set daemon true so this thread dies when the parent process/thread dies
-        threading.Thread(name='background', target=_start_beacon_simulation, daemon=True).start()
-    else:
-        # Start BLE scanning thread using Bleak
-        stop_event = threading.Event()
-        # Trigger stop_event on termination signal
-        signal.signal(signal.SIGTERM, lambda signalNumber, frame: stop_event.set())
-        threading.Thread(target=_bleak_scanner_thread, args=(stop_event,), daemon=True).start()
+        simulator = BeaconSimulator(config, colors_to_uuid, functools.partial(_bleak_detection_callback, receiver_name, None))
+    scanner = runtime.submit(_start_receiving(stop_event, simulator))
+    scanner.add_done_callback(_scanner_done)
+
+    # Each provider gets its own inbox, and a worker thread unless it can run on the event loop
+    dispatcher = Dispatcher(enabled_providers, config, console_log, runtime)
+    dispatcher.start()
+    for provider in enabled_providers:
+        if isinstance(provider, TuiProvider):
+            provider.watch(dispatcher, pitch_q)
 
     print("Ready!  Listening for beacons")
-    start_time = time.time()
-    end_time = start_time + timeout_seconds
+    end_time = time.time() + timeout_seconds if timeout_seconds else None
     try:
-        while True:
-            _handle_pitch_queue(enabled_providers, console_log)
-            # check timeout
-            if timeout_seconds:
-                current_time = time.time()
-                if current_time > end_time:
+        while not stop_event.is_set():
+            timeout = None
+            if end_time is not None:
+                timeout = end_time - time.time()
+                if timeout <= 0:
                     return  # stop
+            _handle_pitch_queue(dispatcher, console_log, timeout)
+        print("...stopped: Tilt Scanner (termination signal)")
     except KeyboardInterrupt as e:
-        # BLE scanning thread will be terminated when program exits
         print("...stopped: Tilt Scanner (keyboard interrupt)")
     except Exception as e:
-        # BLE scanning thread will be terminated when program exits
         print("...stopped: Tilt Scanner ({})".format(e))
+    finally:
+        stop_event.set()
+        _wait_for_scanner(scanner)
+        dispatcher.stop()
+        runtime.stop()
+        if simulator is not None:
+            _print_simulation_report(simulator, dispatcher)
+
+
+def _print_simulation_report(simulator: BeaconSimulator, dispatcher: Dispatcher):
+    print(simulator.report())
+    provider_stats = dispatcher.stats()
+    print("Pipeline: {} parsed, {} repeats dropped, {} superseded in the scan queue, "
+          "{} dropped and {} rate limited by providers".format(
+              ibeacon_parser.accepted, beacon_dedup.duplicates, pitch_q.superseded,
+              sum(stats.dropped for stats in provider_stats), sum(stats.rate_limited for stats in provider_stats)))
+
+
+def _start_replay(enabled_providers: list, replay_path: str, replay_speed: float, console_log: bool):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signalNumber, frame: stop_event.set())
+    # Every recorded reading reaches every provider, the replay waits for slow ones instead of dropping
+    config.provider_overflow_policy = OVERFLOW_BLOCK
+    runtime = AsyncRuntime()
+    runtime.start()
+    dispatcher = Dispatcher(enabled_providers, config, console_log, runtime)
+    dispatcher.start()
+    for provider in enabled_providers:
+        if isinstance(provider, TuiProvider):
+            provider.watch(dispatcher, pitch_q)
+
+    replayer = Replayer(replay_path, replay_speed)
+    print("Ready!  Replaying {} ({})".format(replay_path, "{}x".format(replay_speed) if replay_speed > 0 else "max speed"))
+    try:
+        replayer.run(lambda record: _replay_callback(dispatcher, record, console_log), stop_event)
+        print("...stopped: Replay ({} readings in {:.1f}s)".format(replayer.replayed, replayer.elapsed_seconds))
+    except KeyboardInterrupt as e:
+        print("...stopped: Replay (keyboard interrupt after {} readings)".format(replayer.replayed))
+    except Exception as e:
+        print("...stopped: Replay ({})".format(e))
+    finally:
+        dispatcher.stop()
+        runtime.stop()
+
+
+def _replay_callback(dispatcher: Dispatcher, record: LogRecord, console_log: bool):
+    tilt_status = TiltStatus.recorded(record.color, record.temp_fahrenheit, record.gravity, config, record.timestamp)
+    if not (tilt_status.temp_valid and tilt_status.gravity_valid):
+        return
+    # Same steps as a live reading, minus the ones that depend on the radio (dedup, signal quality)
+    tilt_status = fermentation_analytics.apply(tilt_status)
+    tilt_status = reading_smoother.apply(tilt_status)
+    # Straight to the providers, the scan queue would replace readings that arrive faster than they are handled
+    dispatcher.submit(tilt_status)
+    if console_log:
+        print(tilt_status.json())
+
+
+def _check_replay_path(replay_path: str):
+    # Replaying a file into itself would duplicate every reading
+    for name, path in (('sqlite_db_path', config.sqlite_db_path), ('log_file_path', config.log_file_path)):
+        if path and os.path.abspath(path) == os.path.abspath(replay_path):
+            raise ValueError("Can't replay {} while it is also {}, set {} to another file".format(replay_path, name, name))
+
 
+def _stop(stop_event: threading.Event):
+    stop_event.set()
+    pitch_q.close()
 
-def _start_beacon_simulation():
-    """Simulates Beacon scanning with fake events. Useful when testing or developing
-    without a beacon, or on a platform with no Bluetooth support"""
-    print("...started: Tilt Beacon Simulator")
-    temp_f = 71  #
-    gravity_sg = 1.055
-    step_temp = -0.05
-    step_grav = 0.00005
-    uuid = colors_to_uuid['simulated']
-    while True:
-        # If we are at the max ranges, swap the step to go in the opposite direction
-        # this gives us some nice yo-yo-ing in the graph for effect
-        if temp_f <= config.temp_range_min or temp_f >= config.temp_range_max:
-            step_temp = step_temp * -1
-        if gravity_sg <= config.gravity_range_min or gravity_sg >= config.gravity_range_max:
-            step_grav = step_grav * -1
-        fake_packet = BeaconPacket(
-            uuid=uuid,
-            major=int(temp_f),  # e.g. 67
-            minor=int(gravity_sg * 1000),  # e.g. 1034
-        )
-        _beacon_callback(fake_packet)
-        temp_f -= step_temp
-        gravity_sg -= step_grav
-        time.sleep(0.5)
-
-
-def _beacon_callback(packet: BeaconPacket):
-    uuid = packet.uuid
-    color = uuid_to_colors.get(uuid)
-    if color:
-        # iBeacon packets have major/minor attributes with data
-        # major = degrees in F (int)
-        # minor = gravity (int) - needs to be converted to float (e.g. 1035 -> 1.035)
-        temp_f = packet.major
-        gravity = _get_decimal_gravity(packet.minor)
-        tilt_status = TiltStatus(color, temp_f, gravity, config)
-        if not tilt_status.temp_valid:
-            print("Ignoring broadcast due to invalid temperature: {}F".format(tilt_status.temp_fahrenheit))
-        elif not tilt_status.gravity_valid:
-            print("Ignoring broadcast due to invalid gravity: " + str(tilt_status.gravity))
-        elif pitch_q.full():
-            print(f"Queue is full, skipping broadcast ({pitch_q.unfinished_tasks}/{pitch_q.maxsize})")
-            return
+
+def _scanner_done(scanner: concurrent.futures.Future):
+    # Report scanner failures (e.g. no Bluetooth adapter) as soon as they happen
+    if not scanner.cancelled() and scanner.exception() is not None:
+        print("...stopped: Tilt Scanner ({})".format(scanner.exception()))
+
+
+def _wait_for_scanner(scanner: concurrent.futures.Future):
+    try:
+        scanner.result(5)
+    except concurrent.futures.TimeoutError:
+        print("...stopped: Tilt Scanner did not shut down in time")
+    except Exception:
+        pass  # already reported by _scanner_done
+
+
+async def _start_receiving(stop_event: threading.Event, simulator: BeaconSimulator = None):
+    """
+    Listens for remote receivers (if configured) and runs the local scanners until shutdown.
+    """
+    listener = None
+    if config.receiver_listen_port:
+        listener = await listen_for_receivers(config.receiver_listen_port, _receive, set(uuid_to_colors.values()))
+        print("...started: Remote receivers (udp://0.0.0.0:{})".format(config.receiver_listen_port))
+    if reading_forwarder is not None:
+        print("...started: Forwarding readings to {}".format(config.receiver_forward_to))
+    try:
+        if simulator is not None:
+            print("...started: Tilt Beacon Simulator ({} Tilts at {}/s)".format(len(simulator.tilts), simulator.target_rate))
+            await simulator.run(stop_event)
         else:
-            pitch_q.put_nowait(tilt_status)
+            # Start BLE scanning using Bleak
+            await _bleak_scanner_loop(stop_event)
+    except Exception as e:
+        if listener is None:
+            raise
+        # A hub without a working adapter of its own still handles the remote receivers
+        print("...stopped: Tilt scanner ({}), still listening for remote receivers".format(e))
+        await asyncio.get_event_loop().run_in_executor(None, stop_event.wait)
+    finally:
+        if listener is not None:
+            listener.close()
+        if reading_forwarder is not None:
+            reading_forwarder.close()
+
 
-def _handle_pitch_queue(enabled_providers: list, console_log: bool):
-    if config.queue_empty_sleep_seconds > 0 and pitch_q.empty():
-        time.sleep(config.queue_empty_sleep_seconds)
+def _receive(reading: TiltReading):
+    # Called on the event loop for every Tilt broadcast, local or from a remote receiver
+    if reading_forwarder is not None:
+        reading_forwarder.send(reading)
+    else:
+        reading_merger.add(reading)
+
+
+def _tilt_callback(reading: TiltReading):
+    color = reading.color
+    # Repeats still count towards signal quality
+    signal_tracker.add(color, reading.rssi)
+    if beacon_dedup.is_duplicate(color, reading.major, reading.minor):
         return
+    # iBeacon packets have major/minor attributes with data
+    # major = degrees in F (int)
+    # minor = gravity (int) - needs to be converted to float (e.g. 1035 -> 1.035)
+    temp_f = reading.major
+    gravity = _get_decimal_gravity(reading.minor)
+    tilt_status = TiltStatus(color, temp_f, gravity, config, signal_tracker.get(color))
+    if not tilt_status.temp_valid:
+        print("Ignoring broadcast due to invalid temperature: {}F".format(tilt_status.temp_fahrenheit))
+    elif not tilt_status.gravity_valid:
+        print("Ignoring broadcast due to invalid gravity: " + str(tilt_status.gravity))
+    else:
+        tilt_status = fermentation_analytics.apply(tilt_status)
+        # Every valid reading goes through the filters, providers pick raw or smoothed values later
+        tilt_status = reading_smoother.apply(tilt_status)
+        # Replaces any reading for this color still waiting in the queue
+        pitch_q.put_nowait(tilt_status)
 
-    if pitch_q.full():
-        length = pitch_q.qsize()
-        print("Queue is full ({} events), scans will be ignored until the queue is reduced".format(length))
 
-    tilt_status = pitch_q.get()
-    for provider in enabled_providers:
-        try:
-            start = time.time()
-            provider.update(tilt_status)
-            time_spent = time.time() - start
-            if console_log:
-                print("Updated provider {} for color {} took {:.3f} seconds".format(provider, tilt_status.color, time_spent))
-        except RateLimitedException:
-            # nothing to worry about, just called this too many times (locally)
-            if console_log:
-                print("Skipping update due to rate limiting for provider {} for color {}".format(provider, tilt_status.color))
-        except Exception as e:
-            if console_log:
-                print("Skipping update due to rate limiting for provider {} for color {}".format(provider,
-                                                                                                 tilt_status.color))
-            print(e)
+def _handle_pitch_queue(dispatcher: Dispatcher, console_log: bool, timeout: float = None):
+    try:
+        # Wait for the next broadcast instead of polling, returns early on timeout or shutdown
+        tilt_status = pitch_q.get(timeout=timeout)
+    except queue.Empty:
+        return
+    # Hand off to the provider workers, this never blocks on a slow provider
+    dispatcher.submit(tilt_status)
     # Log it to console/stdout
     if console_log:
         print(tilt_status.json())
@@ -204,57 +341,49 @@ def _start_message():
     f = Figlet(font='slant')
     print(f.renderText('Pitch'))
 
-def _trigger_graceful_termination(signalNumber, frame):
-    raise Exception("Termination signal received")
-    
-def _bleak_scanner_thread(stop_event):
-    """
-    Thread target to run BleakScanner event loop for BLE scanning.
-    """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(_bleak_scanner_loop(stop_event))
 
 async def _bleak_scanner_loop(stop_event):
     """
-    Asynchronous scanning loop running BleakScanner.
+    Asynchronous scanning loop running one BleakScanner per configured adapter.
     """
+    # No adapters configured means the system default
+    adapters = config.bluetooth_adapters or [None]
+    scanners = [_create_scanner(adapter) for adapter in adapters]
+    try:
+        for adapter, scanner in zip(adapters, scanners):
+            await scanner.start()
+            print("...started: Tilt scanner{}".format(" ({})".format(adapter) if adapter else ""))
+        # Park until shutdown without waking the event loop
+        await asyncio.get_event_loop().run_in_executor(None, stop_event.wait)
+    finally:
+        for scanner in scanners:
+            try:
+                await scanner.stop()
+            except Exception:
+                pass  # never started, or the adapter went away
+
+
+def _create_scanner(adapter: str = None):
+    receiver = "{}/{}".format(receiver_name, adapter) if adapter else receiver_name
+    callback = functools.partial(_bleak_detection_callback, receiver)
+    kwargs = {'adapter': adapter} if adapter else {}
     # Create scanner with detection callback (Bleak >=0.20 API)
     try:
         # Pass callback to constructor for newer Bleak versions
-        scanner = BleakScanner(detection_callback=_bleak_detection_callback)
+        return BleakScanner(detection_callback=callback, **kwargs)
     except TypeError:
         # Fallback for older Bleak versions supporting register_detection_callback
-        scanner = BleakScanner()
-        scanner.register_detection_callback(_bleak_detection_callback)
-    await scanner.start()
-    print("...started: Tilt scanner")
-    try:
-        while not stop_event.is_set():
-            await asyncio.sleep(1.0)
-    finally:
-        await scanner.stop()
+        scanner = BleakScanner(**kwargs)
+        scanner.register_detection_callback(callback)
+        return scanner
 
 
-def _bleak_detection_callback(_, advertisement_data):
+def _bleak_detection_callback(receiver: str, _, advertisement_data):
     """
     Detection callback for BleakScanner.
-    Parses iBeacon manufacturer data and forwards to _beacon_callback.
+    Called for every advertisement in range, only Tilt iBeacons are forwarded to _receive.
     """
-    md = advertisement_data.manufacturer_data
-    if not md:
-        return
-    # Apple Company ID for iBeacon is 0x004C
-    ib = md.get(76)
-    if not ib or len(ib) < 23:
-        return
-    # Confirm iBeacon prefix: 0x02, 0x15
-    if ib[0] != 0x02 or ib[1] != 0x15:
-        return
-    # Extract UUID from bytes 2-17
-    uuid_str = str(_uuid.UUID(bytes=bytes(ib[2:18])))
-    # Extract major (bytes 18-19) and minor (bytes 20-21)
-    major = int.from_bytes(ib[18:20], byteorder='big')
-    minor = int.from_bytes(ib[20:22], byteorder='big')
-    packet =  BeaconPacket(uuid=uuid_str, major=major, minor=minor)
-    _beacon_callback(packet)
+    parsed = ibeacon_parser.parse(advertisement_data.manufacturer_data)
+    if parsed is not None:
+        color, major, minor = parsed
+        _receive(TiltReading(color=color, major=major, minor=minor, rssi=advertisement_data.rssi, receiver=receiver))
@@ -1,18 +1,93 @@
-﻿import time
+﻿import threading
+import time
 import plotext as plt
+from collections import deque
 from datetime import datetime
-from typing import Dict
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
 from pitch.abstractions import CloudProviderBase
 from pitch.configuration import PitchConfig
 from pitch.models import TiltStatus
 
+# Matches plt.date_form("d/m/Y H:M:S")
+LABEL_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+
+class TuiPoint:
+    __slots__ = ('time', 'label', 'gravity', 'temperature', 'count')
+
+    def __init__(self, timestamp: datetime, gravity: float, temperature: float, count: int = 1):
+        self.time = timestamp
+        # Formatted once, not on every redraw
+        self.label = timestamp.strftime(LABEL_FORMAT)
+        self.gravity = gravity
+        self.temperature = temperature
+        self.count = count
+
+    @staticmethod
+    def merge(older: 'TuiPoint', newer: 'TuiPoint'):
+        count = older.count + newer.count
+        return TuiPoint(older.time + (newer.time - older.time) * newer.count / count,
+                        (older.gravity * older.count + newer.gravity * newer.count) / count,
+                        (older.temperature * older.count + newer.temperature * newer.count) / count,
+                        count)
+
+
+class TuiHistory:
+    """
+    Fixed size chart history.  Recent points are kept at full resolution, once a level is full its two
+    oldest points are merged into one on the next level, so each level covers twice the time of the one
+    before it with the same number of points.  The oldest points fall off the last level.
+    """
+    def __init__(self, points_per_level: int, levels: int):
+        self.points_per_level = max(2, points_per_level)
+        # levels[0] is the newest, full resolution
+        self.levels: List[Deque[TuiPoint]] = [deque() for _ in range(max(1, levels))]
+
+    def append(self, point: TuiPoint):
+        self.levels[0].append(point)
+        for index, level in enumerate(self.levels):
+            if len(level) <= self.points_per_level:
+                break
+            if index + 1 == len(self.levels):
+                level.popleft()
+            else:
+                merged = TuiPoint.merge(level.popleft(), level.popleft())
+                self.levels[index + 1].append(merged)
+
+    def points(self):
+        """
+        All points, oldest first.
+        """
+        for level in reversed(self.levels):
+            yield from level
+
+    def sample(self, count: int):
+        """
+        At most count points evenly spread over the history, oldest first, read straight from the levels
+        so the cost depends on count rather than the size of the history.
+        """
+        total = len(self)
+        if total <= count:
+            return list(self.points())
+        step = total / count
+        indexes = [int(i * step) for i in range(count - 1)] + [total - 1]
+        sampled = list()
+        offset = 0
+        for level in reversed(self.levels):
+            size = len(level)
+            while len(sampled) < count and indexes[len(sampled)] < offset + size:
+                sampled.append(level[indexes[len(sampled)] - offset])
+            offset += size
+        return sampled
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
 
 class TuiColorState:
-    def __init__(self, color):
+    def __init__(self, color, points_per_level: int = 200, levels: int = 10):
         self.color = color
-        self.times = []
-        self.gravity = []
-        self.temperature = []
+        self.history = TuiHistory(points_per_level, levels)
         # Used to set Y min/max on chart, starts with defaults and adjust if
         # larger/lower values are seen
         self.gravity_lower_bound = 0.990
@@ -21,9 +96,7 @@ class TuiColorState:
         self.temp_upper_bound = 100
 
     def append(self, tilt_status: TiltStatus):
-        self.times.append(datetime.now())
-        self.gravity.append(tilt_status.gravity)
-        self.temperature.append(tilt_status.temp_fahrenheit)
+        self.history.append(TuiPoint(tilt_status.timestamp, tilt_status.gravity, tilt_status.temp_fahrenheit))
         # Adjust min/max Y values for charting
         if tilt_status.gravity >= self.gravity_upper_bound:
             self.gravity_upper_bound = tilt_status.gravity + 0.05
@@ -34,34 +107,101 @@ class TuiColorState:
         if tilt_status.temp_fahrenheit <= self.temp_lower_bound:
             self.temp_lower_bound = tilt_status.temp_fahrenheit - 5
 
+    def chart_points(self, width: int):
+        """
+        At most width points to draw, evenly spread over the history.
+        """
+        return self.history.sample(width)
+
+
+class TuiChart(NamedTuple):
+    """
+    What the renderer draws for one color, copied out of TuiColorState so drawing doesn't hold the lock.
+    """
+    color: str
+    points: List[TuiPoint]
+    gravity_bounds: Tuple[float, float]
+    temp_bounds: Tuple[float, float]
+
 
 class TuiProvider(CloudProviderBase):
+    """
+    Charts gravity and temperature in the terminal.  update only records the reading, drawing happens on
+    a separate renderer thread so a slow terminal (e.g. over SSH) never holds up the providers.
+    """
+    config_key = 'tui'
 
     def __init__(self, config: PitchConfig):
         self.str_name = "TUI"
+        self.points_per_level = config.tui_history_points
+        self.levels = config.tui_history_levels
+        self.refresh_seconds = config.tui_refresh_seconds
         self.data: Dict[str, TuiColorState] = {}
-        self._last_plot_time = time.time()
+        # Set once the pipeline is running, see watch()
+        self.dispatcher = None
+        self.mailbox = None
+        # Stats
+        self.frames = 0
+        self.skipped_frames = 0
+        self.last_frame_seconds = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
 
     def __str__(self):
         return self.str_name
 
     def start(self):
-        pass
+        self._thread = threading.Thread(name='tui-renderer', target=self._run, daemon=True)
+        self._thread.start()
+
+    def watch(self, dispatcher, mailbox):
+        """
+        Show live stats for the scan queue and provider workers under the charts.
+        """
+        self.dispatcher = dispatcher
+        self.mailbox = mailbox
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
 
     def _set_state(self, tilt_status: TiltStatus):
         # first time seeing this color, add it to state
         if tilt_status.color not in self.data.keys():
-            self.data[tilt_status.color] = TuiColorState(tilt_status.color)
+            self.data[tilt_status.color] = TuiColorState(tilt_status.color, self.points_per_level, self.levels)
         # Update state
         self.data[tilt_status.color].append(tilt_status)
 
     def update(self, tilt_status: TiltStatus):
-        self._set_state(tilt_status)
-        now = time.time()
-        if now - self._last_plot_time < 5:  # redraw every 5 seconds max
-            return
-        self._last_plot_time = now
+        with self._lock:
+            self._set_state(tilt_status)
+
+    def _run(self):
+        interval = self.refresh_seconds
+        while not self._stop_event.wait(interval):
+            start = time.time()
+            charts = self._snapshot(plt.terminal_width() or 80)
+            if not charts:
+                continue  # nothing to draw until the first reading
+            self._render(charts)
+            self.frames += 1
+            self.last_frame_seconds = time.time() - start
+            # Slow terminal, draw less often so drawing never takes more than a quarter of the time
+            interval = max(self.refresh_seconds, self.last_frame_seconds * 4)
+            self.skipped_frames += int(interval / self.refresh_seconds) - 1
 
+    def _snapshot(self, width: int):
+        # Never draw more points than there are columns
+        with self._lock:
+            return [TuiChart(color=color,
+                             points=cstate.chart_points(width),
+                             gravity_bounds=(cstate.gravity_lower_bound, cstate.gravity_upper_bound),
+                             temp_bounds=(cstate.temp_lower_bound, cstate.temp_upper_bound))
+                    for color, cstate in self.data.items()]
+
+    def _render(self, charts: List[TuiChart]):
         plt.date_form("%d/%m/%Y")
         plt.clf()
         plt.theme('clear')
@@ -71,14 +211,12 @@ class TuiProvider(CloudProviderBase):
         plt.date_form("d/m/Y H:M:S")
         plt.title("Gravity")
 
-        for color, cstate in self.data.items():
-            if len(cstate.times) < 2:
+        for chart in charts:
+            if len(chart.points) < 2:
                 continue
-            gravity_color, _ = TuiProvider.get_colors_for(color)
-            x_vals = [dt.strftime("%d/%m/%Y %H:%M:%S")
-                      for dt in cstate.times]
-            plt.plot(x_vals, cstate.gravity, label=f"{color}", color=gravity_color)
-            plt.ylim(cstate.gravity_lower_bound, cstate.gravity_upper_bound)
+            gravity_color, _ = TuiProvider.get_colors_for(chart.color)
+            plt.plot([p.label for p in chart.points], [p.gravity for p in chart.points], label=f"{chart.color}", color=gravity_color)
+            plt.ylim(*chart.gravity_bounds)
 
         plt.show()
 
@@ -88,16 +226,30 @@ class TuiProvider(CloudProviderBase):
         plt.title("Temperature")
         plt.ylim(40, 100)
 
-        for color, cstate in self.data.items():
-            if len(cstate.times) < 2:
+        for chart in charts:
+            if len(chart.points) < 2:
                 continue
-            x_vals = [dt.strftime("%d/%m/%Y %H:%M:%S")
-                      for dt in cstate.times]
-            _, temp_color = TuiProvider.get_colors_for(color)
-            plt.plot(x_vals, cstate.temperature, label=f"{color}", color=temp_color)
-            plt.ylim(cstate.temp_lower_bound, cstate.temp_upper_bound)
+            _, temp_color = TuiProvider.get_colors_for(chart.color)
+            plt.plot([p.label for p in chart.points], [p.temperature for p in chart.points], label=f"{chart.color}", color=temp_color)
+            plt.ylim(*chart.temp_bounds)
 
         plt.show()
+        print(self._get_stats_text())
+
+    def _get_stats_text(self):
+        lines = list()
+        if self.mailbox is not None:
+            lines.append("Scan queue: {}/{} colors waiting, {} superseded".format(
+                self.mailbox.qsize(), self.mailbox.maxsize, self.mailbox.superseded))
+        if self.dispatcher is not None:
+            lines.append("{:<28} {:>9} {:>10} {:>10} {:>8} {:>8} {:>7}".format(
+                "Provider", "Inbox", "Latency", "Processed", "Limited", "Dropped", "Errors"))
+            for stats in self.dispatcher.stats():
+                lines.append("{:<28} {:>9} {:>8.1f}ms {:>10} {:>8} {:>8} {:>7}".format(
+                    stats.provider[:28], "{}/{}".format(stats.queue_depth, stats.queue_size), stats.last_latency * 1000,
+                    stats.processed, stats.rate_limited, stats.dropped, stats.errors))
+        lines.append("Frame {:.0f}ms, {} skipped".format(self.last_frame_seconds * 1000, self.skipped_frames))
+        return "\n".join(lines)
 
     # noinspection PyMethodMayBeStatic
     def enabled(self):
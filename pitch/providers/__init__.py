@@ -8,3 +8,4 @@ from .grainfather_custom_stream import GrainfatherCustomStreamCloudProvider
 from .taplistio_custom_stream import TaplistIOCloudProvider
 from .azure_iothub import AzureIoTHubCloudProvider
 from .sqlite import SqliteCloudProvider
+from .history_api import HistoryApiCloudProvider
@@ -2,16 +2,34 @@ from ..models import TiltStatus
 from ..abstractions import CloudProviderBase
 from ..configuration import PitchConfig
 from ..rate_limiter import DeviceRateLimiter
+from ..runtime import AsyncRuntime
 from azure.iot.device import IoTHubSession, MQTTError, MQTTConnectionFailedError
+from collections import deque
 import asyncio
+import random
 
 
 class AzureIoTHubCloudProvider(CloudProviderBase):
+    config_key = 'azure_iot_hub'
 
-    def __init__(self, config: PitchConfig):
+    def __init__(self, config: PitchConfig, session_factory=None):
         self.config = config
         self.str_name = "Azure IoT Hub ({})".format(config.azure_iot_hub_connectionstring)
         self.rate_limiter = DeviceRateLimiter(rate=config.azure_iot_hub_limit_rate, period=config.azure_iot_hub_limit_period)
+        # Creates the IoTHubSession, can be swapped for a local stand-in when testing
+        self.session_factory = session_factory or IoTHubSession.from_connection_string
+        # Readings waiting to be sent, kept while the connection is down (oldest dropped when full)
+        self.buffer = deque(maxlen=config.azure_iot_hub_buffer_size)
+        self.batch_size = max(1, config.azure_iot_hub_batch_size)
+        self.batch_linger = config.azure_iot_hub_batch_linger_seconds
+        self.connected = False
+        self.connects = 0
+        self._pending = None
+        self._session_task = None
+        self._loop = None
+        self._stopping = False
+        # Event loop for update(), when not running on the shared one
+        self._runtime = None
 
     def __str__(self):
         return self.str_name
@@ -19,19 +37,117 @@ class AzureIoTHubCloudProvider(CloudProviderBase):
     def start(self):
         pass
 
-    async def send(self, tilt_status: TiltStatus):        
-        try:
-            async with IoTHubSession.from_connection_string(self.config.azure_iot_hub_connectionstring) as session:
-                await session.send_message(tilt_status.json())
-        except MQTTError as e:
-            print(f"Connection to IoT Hub dropped: {e}")
-        except MQTTConnectionFailedError as e:
-            print(f"Could not connect to IoT Hub: {e}.")
-
     def update(self, tilt_status: TiltStatus):
+        # Not on the shared event loop, run the same long lived session on a loop of our own
+        if self._runtime is None:
+            self._runtime = AsyncRuntime()
+            self._runtime.start()
+        self._runtime.submit(self.update_async(tilt_status)).result()
+
+    async def update_async(self, tilt_status: TiltStatus):
+        # Runs on the shared event loop, readings are handed to the long lived session.  Limited by the time
+        # sent, not the reading's time, so replayed readings stay within the hub's daily message quota
         self.rate_limiter.approve(tilt_status.color)
-        asyncio.run(self.send(tilt_status))
+        if self._session_task is None:
+            self._loop = asyncio.get_event_loop()
+            self._pending = asyncio.Event()
+            self._session_task = asyncio.ensure_future(self._run_session())
+        self.buffer.append(tilt_status.json())
+        self._pending.set()
+
+    def stop(self):
+        """
+        Sends what is still buffered (for up to azure_iot_hub_stop_timeout_seconds) and closes the session.
+        """
+        if self._session_task is not None:
+            timeout = self.config.azure_iot_hub_stop_timeout_seconds
+            try:
+                asyncio.run_coroutine_threadsafe(self._close(timeout), self._loop).result(timeout + 1)
+            except Exception as e:
+                print("...stopped: {} ({})".format(self, e))
+        if self._runtime is not None:
+            self._runtime.stop()
 
     def enabled(self):
         enabled = True if self.config.azure_iot_hub_connectionstring else False
         return enabled
+
+    async def _run_session(self):
+        """
+        Keeps one session open for as long as Pitch runs, reconnecting with exponential backoff.
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self.session_factory(self.config.azure_iot_hub_connectionstring) as session:
+                    self.connected = True
+                    self.connects += 1
+                    attempt = 0
+                    await self._send_buffered(session)
+            except MQTTError as e:
+                print(f"Connection to IoT Hub dropped: {e}")
+            except MQTTConnectionFailedError as e:
+                print(f"Could not connect to IoT Hub: {e}.")
+            except asyncio.CancelledError:
+                raise  # stopping, an Exception before Python 3.8
+            except Exception as e:
+                print(f"IoT Hub session failed: {e}")
+            finally:
+                self.connected = False
+            await asyncio.sleep(self._get_backoff(attempt))
+            attempt += 1
+
+    async def _send_buffered(self, session):
+        while True:
+            if not self.buffer:
+                self._pending.clear()
+                await self._pending.wait()
+                continue
+            if len(self.buffer) < self.batch_size:
+                await self._linger()
+            # Only remove readings once IoT Hub has them, so nothing is lost on a dropped connection
+            batch = [self.buffer[i] for i in range(min(self.batch_size, len(self.buffer)))]
+            if self.batch_size > 1:
+                await session.send_message("[{}]".format(", ".join(batch)))
+            else:
+                await session.send_message(batch[0])
+            for message in batch:
+                # The buffer may have overflowed while sending, don't drop readings we haven't sent
+                if self.buffer and self.buffer[0] is message:
+                    self.buffer.popleft()
+
+    async def _linger(self):
+        """
+        Waits a little for more readings so a batch isn't sent with only the first one.
+        """
+        deadline = self._loop.time() + self.batch_linger
+        while len(self.buffer) < self.batch_size and not self._stopping:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                return
+            self._pending.clear()
+            try:
+                await asyncio.wait_for(self._pending.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def _close(self, timeout: float):
+        self._stopping = True
+        self._pending.set()
+        deadline = self._loop.time() + timeout
+        while self.buffer and self._loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if self.buffer:
+            print("...stopped: {} ({} readings not sent)".format(self, len(self.buffer)))
+        # Leaves the session's async with, which disconnects
+        self._session_task.cancel()
+        try:
+            await self._session_task
+        except asyncio.CancelledError:
+            pass
+
+    def _get_backoff(self, attempt: int):
+        backoff = min(self.config.azure_iot_hub_reconnect_max_seconds,
+                      self.config.azure_iot_hub_reconnect_min_seconds * (2 ** attempt))
+        # Jitter so several Pitch instances don't reconnect in lockstep
+        return backoff * random.uniform(0.5, 1)
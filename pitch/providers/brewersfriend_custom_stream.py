@@ -14,34 +14,28 @@
 # }
 
 from ..models import TiltStatus
-from ..abstractions import CloudProviderBase
+from ..abstractions import HttpCloudProviderBase
 from ..configuration import PitchConfig
-from ..rate_limiter import DeviceRateLimiter
-import requests
 import json
 
 
-class BrewersFriendCustomStreamCloudProvider(CloudProviderBase):
+class BrewersFriendCustomStreamCloudProvider(HttpCloudProviderBase):
+    config_key = 'brewersfriend'
 
     def __init__(self, config: PitchConfig):
+        super().__init__(config)
         self.api_key = config.brewersfriend_api_key
         self.url = "https://log.brewersfriend.com/stream/{}".format(config.brewersfriend_api_key)
         self.str_name = "Brewer's Friend ({})".format(self.url)
-        self.rate_limiter = DeviceRateLimiter(rate=1, period=(60 * 15))  # 15 minutes
         self.headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
         self.temp_unit = BrewersFriendCustomStreamCloudProvider._get_temp_unit(config)
 
     def __str__(self):
         return self.str_name
 
-    def start(self):
-        pass
-
     def update(self, tilt_status: TiltStatus):
-        self.rate_limiter.approve(tilt_status.color)
         payload = self._get_payload(tilt_status)
-        result = requests.post(self.url, headers=self.headers, data=json.dumps(payload))
-        result.raise_for_status()
+        self.post(tilt_status, self.url, self.headers, json.dumps(payload))
 
     def enabled(self):
         return True if self.api_key else False
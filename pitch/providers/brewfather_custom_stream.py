@@ -16,33 +16,27 @@
 # }
 
 from ..models import TiltStatus
-from ..abstractions import CloudProviderBase
+from ..abstractions import HttpCloudProviderBase
 from ..configuration import PitchConfig
-from ..rate_limiter import DeviceRateLimiter
-import requests
 import json
 
 
-class BrewfatherCustomStreamCloudProvider(CloudProviderBase):
+class BrewfatherCustomStreamCloudProvider(HttpCloudProviderBase):
+    config_key = 'brewfather'
 
     def __init__(self, config: PitchConfig):
+        super().__init__(config)
         self.url = config.brewfather_custom_stream_url
         self.temp_unit = BrewfatherCustomStreamCloudProvider._get_temp_unit(config)
         self.str_name = "Brewfather ({})".format(self.url)
-        self.rate_limiter = DeviceRateLimiter(rate=1, period=(60 * 15))  # 15 minutes
 
     def __str__(self):
         return self.str_name
 
-    def start(self):
-        pass
-
     def update(self, tilt_status: TiltStatus):
-        self.rate_limiter.approve(tilt_status.color)
         headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
         payload = self._get_payload(tilt_status)
-        result = requests.post(self.url, headers=headers, data=json.dumps(payload))
-        result.raise_for_status()
+        self.post(tilt_status, self.url, headers, json.dumps(payload))
 
     def enabled(self):
         return True if self.url else False
@@ -3,6 +3,7 @@ from ..abstractions import CloudProviderBase
 
 
 class CalibrationCloudProvider(CloudProviderBase):
+    config_key = 'calibration'
 
     def __init__(self, color: str, actual_temp: int = 0, actual_gravity: float = 0):
         self.color = color.lower()
@@ -1,28 +1,34 @@
 from ..models import TiltStatus
 from ..abstractions import CloudProviderBase
 from ..configuration import PitchConfig
-from pathlib import Path
-import logging
-import logging.handlers
+from ..storage import SegmentLogWriter
 
 
 class FileCloudProvider(CloudProviderBase):
+    config_key = 'log_file'
 
     def __init__(self, config: PitchConfig):
         self.config = config
         self.str_name = "File ({})".format(config.log_file_path)
-        self.logger = logging.getLogger(self.str_name)
+        self.writer = SegmentLogWriter(config.log_file_path,
+                                       log_format=config.log_file_format,
+                                       compression=config.log_file_compression,
+                                       max_bytes=config.log_file_max_mb * 1024 * 1024,
+                                       max_segments=config.log_file_max_segments,
+                                       flush_seconds=config.log_file_flush_seconds)
 
     def __str__(self):
         return self.str_name
 
     def start(self):
-        max_bytes = self.config.log_file_max_mb * 1024 * 1024
-        handler = logging.handlers.RotatingFileHandler(self.config.log_file_path, maxBytes=max_bytes)
-        self.logger.addHandler(handler)
+        self.writer.open()
 
     def update(self, tilt_status: TiltStatus):
-        self.logger.warning(tilt_status.json())
+        self.writer.write(tilt_status)
+
+    def stop(self):
+        # Write anything still buffered
+        self.writer.close()
 
     def enabled(self):
-        return (self.config.log_file_path)
\ No newline at end of file
+        return (self.config.log_file_path)
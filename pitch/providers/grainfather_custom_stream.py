@@ -6,38 +6,31 @@
 # }
 
 from ..models import TiltStatus
-from ..abstractions import CloudProviderBase
+from ..abstractions import HttpCloudProviderBase
 from ..configuration import PitchConfig
-from ..rate_limiter import DeviceRateLimiter
-CloudProviderBase
-import requests
 import json
 
 
-class GrainfatherCustomStreamCloudProvider(CloudProviderBase):
+class GrainfatherCustomStreamCloudProvider(HttpCloudProviderBase):
+    config_key = 'grainfather'
 
     def __init__(self, config: PitchConfig):
+        super().__init__(config)
         self.color_urls = GrainfatherCustomStreamCloudProvider._normalize_color_keys(config.grainfather_custom_stream_urls)
         self.temp_unit = GrainfatherCustomStreamCloudProvider._get_temp_unit(config)
         self.str_name = "Grainfather Custom URL"
-        self.rate_limiter = DeviceRateLimiter(rate=1, period=(60 * 15))  # 15 minutes
 
     def __str__(self):
         return self.str_name
 
-    def start(self):
-        pass
-
     def update(self, tilt_status: TiltStatus):
         # Skip if this color doesn't have a grainfather URL assigned
         if tilt_status.color not in self.color_urls.keys():
             return
         url = self.color_urls[tilt_status.color]
-        self.rate_limiter.approve(tilt_status.color)
         headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
         payload = self._get_payload(tilt_status)
-        result = requests.post(url, headers=headers, data=json.dumps(payload))
-        result.raise_for_status()
+        self.post(tilt_status, url, headers, json.dumps(payload))
 
     def enabled(self):
         return True if self.color_urls else False
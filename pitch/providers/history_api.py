@@ -0,0 +1,104 @@
+import csv
+import io
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from ..abstractions import CloudProviderBase
+from ..configuration import PitchConfig
+from ..models import TiltStatus
+from ..storage import HistoryReader, HISTORY_COLUMNS
+
+MAX_POINTS = 10000
+
+
+class HistoryApiCloudProvider(CloudProviderBase):
+    """
+    Serves the SQLite history over HTTP, e.g. GET /readings?color=purple&start=...&end=...&points=500&format=csv
+    """
+    config_key = 'history_api'
+
+    def __init__(self, config: PitchConfig):
+        self.is_enabled = config.history_api_enabled
+        self.port = config.history_api_port
+        self.reader = HistoryReader(config.sqlite_db_path)
+        self.server = None
+
+    def __str__(self):
+        return "History API"
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('', self.port), _get_handler(self.reader))
+        self.server.daemon_threads = True
+        threading.Thread(name='history-api', target=self.server.serve_forever, daemon=True).start()
+        return "(http://127.0.0.1:{}/readings)".format(self.port)
+
+    def update(self, tilt_status: TiltStatus):
+        # Reads what the SQLite provider writes, nothing to do per reading
+        pass
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def enabled(self):
+        return self.is_enabled
+
+
+def _get_handler(reader: HistoryReader):
+
+    class HistoryRequestHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/readings':
+                self.send_error(404)
+                return
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                color = query['color'].lower()
+                end = int(query.get('end', time.time()))
+                start = int(query.get('start', end - 7 * 86400))
+                points = min(MAX_POINTS, int(query.get('points', 500)))
+                output_format = query.get('format', 'jsonl')
+                if output_format not in ['jsonl', 'csv']:
+                    raise ValueError("format must be jsonl or csv")
+            except KeyError:
+                self.send_error(400, "color is required")
+                return
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            rows = reader.query(color, start, end, points, query.get('brew_id'))
+            try:
+                # Run the query before answering, so errors can still get an error status
+                first = list(itertools.islice(rows, 1))
+            except sqlite3.Error as e:
+                self.send_error(503, str(e))
+                return
+            rows = itertools.chain(first, rows)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv' if output_format == 'csv' else 'application/x-ndjson')
+            self.end_headers()
+            # No content length, rows are streamed as they are read and the connection closed at the end
+            out = io.TextIOWrapper(self.wfile, encoding='utf-8', newline='')
+            try:
+                if output_format == 'csv':
+                    writer = csv.writer(out)
+                    writer.writerow(HISTORY_COLUMNS)
+                    for row in rows:
+                        writer.writerow(row.values())
+                else:
+                    for row in rows:
+                        out.write(json.dumps(row) + '\n')
+            finally:
+                out.detach()
+
+        def log_message(self, *args):
+            pass
+
+    return HistoryRequestHandler
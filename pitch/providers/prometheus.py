@@ -1,7 +1,8 @@
 from ..models import TiltStatus
 from ..abstractions import CloudProviderBase
 from ..configuration import PitchConfig
-from prometheus_client import Counter, Gauge, start_http_server
+from ..analytics import fermentation_states
+from prometheus_client import Counter, Enum, Gauge, start_http_server
 
 counter_beacons_received = Counter('pitch_beacons_received', 'Number of beacons received', ['color', 'name'])
 gauge_temperature_fahrenheit = Gauge('pitch_temperature_fahrenheit', 'Temperature in fahrenheit', ['color', 'name'])
@@ -9,9 +10,18 @@ gauge_temperature_celsius = Gauge('pitch_temperature_celsius', 'Temperature in c
 gauge_gravity = Gauge('pitch_gravity', 'Gravity of the beer', ['color', 'name'])
 gauge_alcohol_by_volume = Gauge('pitch_alcohol_by_volume', 'ABV of the beer', ['color', 'name'])
 gauge_aa = Gauge('pitch_apparent_attenuation', 'Apparent attenuation of the beer', ['color', 'name'])
+gauge_last_seen = Gauge('pitch_last_seen_timestamp_seconds', 'Unix time of the last reading from the Tilt', ['color', 'name'])
+gauge_rssi = Gauge('pitch_rssi', 'Bluetooth signal strength of the last broadcast (dBm)', ['color', 'name'])
+gauge_rssi_mean = Gauge('pitch_rssi_mean', 'Mean Bluetooth signal strength over recent broadcasts (dBm)', ['color', 'name'])
+gauge_rssi_variance = Gauge('pitch_rssi_variance', 'Variance of Bluetooth signal strength over recent broadcasts', ['color', 'name'])
+gauge_packets_per_minute = Gauge('pitch_packets_per_minute', 'Broadcasts received per minute over recent broadcasts', ['color', 'name'])
+gauge_gravity_velocity = Gauge('pitch_gravity_velocity', 'Change in gravity points per day, over the analytics window', ['color', 'name'])
+gauge_fermentation_eta = Gauge('pitch_fermentation_eta_timestamp_seconds', 'Unix time gravity is expected to reach the final gravity', ['color', 'name'])
+enum_fermentation_state = Enum('pitch_fermentation_state', 'State of the fermentation', ['color', 'name'], states=fermentation_states)
 
 
 class PrometheusCloudProvider(CloudProviderBase):
+    config_key = 'prometheus'
 
     def __init__(self, config: PitchConfig):
         self.is_enabled = config.prometheus_enabled
@@ -31,6 +41,20 @@ class PrometheusCloudProvider(CloudProviderBase):
         gauge_gravity.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.gravity)
         gauge_alcohol_by_volume.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.alcohol_by_volume)
         gauge_aa.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.apparent_attenuation)
+        gauge_last_seen.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.timestamp.timestamp())
+        # Signal stats are unknown for simulated beacons
+        if tilt_status.rssi is not None:
+            gauge_rssi.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.rssi)
+            gauge_rssi_mean.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.rssi_mean)
+            gauge_rssi_variance.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.rssi_variance)
+        # Fermentation analytics need a few hours of readings first
+        if tilt_status.gravity_velocity is not None:
+            gauge_gravity_velocity.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.gravity_velocity)
+            enum_fermentation_state.labels(color=tilt_status.color, name=tilt_status.name).state(tilt_status.fermentation_state)
+            if tilt_status.fermentation_eta is not None:
+                gauge_fermentation_eta.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.fermentation_eta.timestamp())
+        if tilt_status.packets_per_minute is not None:
+            gauge_packets_per_minute.labels(color=tilt_status.color, name=tilt_status.name).set(tilt_status.packets_per_minute)
 
     def enabled(self):
         return self.is_enabled
@@ -1,80 +1,83 @@
 import sqlite3
-import threading
 import time
+from typing import List
 from ..abstractions import CloudProviderBase
 from ..models import TiltStatus
 from ..configuration import PitchConfig
 from ..rate_limiter import DeviceRateLimiter
+from ..storage import SqliteWriter, sqlite_schema
 
 
 class SqliteCloudProvider(CloudProviderBase):
     """
     Persist TiltStatus updates into a local SQLite database (enabled by default).
     """
+    config_key = 'sqlite'
+
     def __init__(self, config: PitchConfig):
-        # Default database file path
-        self.db_path = getattr(config, 'sqlite_db_path', 'pitch.db')
-        # Ensure only one thread initializes the DB
-        self._lock = threading.Lock()
+        self.config = config
+        self.db_path = config.sqlite_db_path
+        self.retention_seconds = config.sqlite_retention_days * 86400
+        self._last_prune = 0
         self._rate_limiter = DeviceRateLimiter(rate=1, period=60)
+        # One connection for the life of Pitch, rows are written in batches
+        self.writer = SqliteWriter(self.db_path, self._write_rows,
+                                   batch_size=config.sqlite_batch_size,
+                                   flush_seconds=config.sqlite_flush_seconds,
+                                   setup=sqlite_schema.migrate)
 
     def __str__(self):
         return f"SQLite ({self.db_path})"
 
     def start(self):
         """
-        Create the SQLite database and table if they don't exist.
+        Create or migrate the SQLite database, and start the writer.
         """
-        with self._lock:
-            conn = sqlite3.connect(self.db_path)
-            cur = conn.cursor()
-            cur.execute(
-                '''
-                CREATE TABLE IF NOT EXISTS fermentation_readings (
-                    timestamp INTEGER,
-                    color TEXT,
-                    name TEXT,
-                    temp_f REAL,
-                    temp_c REAL,
-                    gravity REAL,
-                    abv REAL,
-                    attenuation REAL
-                );
-                '''
-            )
-            conn.commit()
-            conn.close()
+        self.writer.start()
         # no extra startup message
         return ''
 
     def update(self, tilt_status: TiltStatus):
         """
-        Insert a new row for each TiltStatus.
+        Buffer a new row for each TiltStatus, written in the next batch.
         """
         # Tilt beacons can broadcast pretty quickly, but the values won't change often
         # We can ignore a lot of them and reduce size/query times in DB using a rate limiter
-        self._rate_limiter.approve(tilt_status.color)
-        # Use a new connection on each thread
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        cur = conn.cursor()
-        cur.execute(
-            'INSERT INTO fermentation_readings (timestamp, color, name, temp_f, temp_c, gravity, abv, attenuation) '
-            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
-            (
-                int(time.time()),
-                tilt_status.color,
-                tilt_status.name,
-                tilt_status.temp_fahrenheit,
-                tilt_status.temp_celsius,
-                tilt_status.gravity,
-                tilt_status.alcohol_by_volume,
-                tilt_status.apparent_attenuation,
-            )
-        )
-        conn.commit()
-        conn.close()
+        self._rate_limiter.approve(tilt_status.color, tilt_status.timestamp.timestamp())
+        self.writer.add((
+            int(tilt_status.timestamp.timestamp()),
+            tilt_status.color,
+            tilt_status.name,
+            self.config.get_brew_id(tilt_status.color),
+            tilt_status.temp_fahrenheit,
+            tilt_status.temp_celsius,
+            tilt_status.gravity,
+            tilt_status.alcohol_by_volume,
+            tilt_status.apparent_attenuation,
+            tilt_status.gravity_velocity,
+            int(tilt_status.fermentation_eta.timestamp()) if tilt_status.fermentation_eta else None,
+            tilt_status.fermentation_state,
+        ))
+
+    def stop(self):
+        # Write anything still buffered
+        self.writer.stop()
 
     # noinspection PyMethodMayBeStatic
     def enabled(self):
         # Always enabled by default
         return True
+
+    def _write_rows(self, conn: sqlite3.Connection, rows: List[tuple]):
+        # Rollup tables are updated by triggers in the same transaction
+        conn.executemany(
+            'INSERT INTO fermentation_readings (timestamp, color, name, brew_id, temp_f, temp_c, gravity, abv, attenuation, '
+            'gravity_velocity, fermentation_eta, fermentation_state) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        # Prune old raw readings at most once an hour
+        now = time.time()
+        if self.retention_seconds > 0 and now - self._last_prune > 3600:
+            self._last_prune = now
+            sqlite_schema.prune(conn, int(now - self.retention_seconds))
@@ -1,27 +1,24 @@
-from ..rate_limiter import DeviceRateLimiter
 from ..models import TiltStatus
-from ..abstractions import CloudProviderBase
+from ..abstractions import HttpCloudProviderBase
 from ..configuration import PitchConfig
-import requests
 
 
-class WebhookCloudProvider(CloudProviderBase):
+class WebhookCloudProvider(HttpCloudProviderBase):
+    config_key = 'webhook'
 
     def __init__(self, url, config: PitchConfig):
+        # Webhooks get every reading, nothing is coalesced
+        super().__init__(config, "webhook ({})".format(url), rate=config.webhook_limit_rate,
+                         period=config.webhook_limit_period, coalesce=False)
         self.url = url
         self.str_name = "Webhook ({})".format(url)
-        self.rate_limiter = DeviceRateLimiter(rate=config.webhook_limit_rate, period=config.webhook_limit_period)
 
     def __str__(self):
         return self.str_name
 
-    def start(self):
-        pass
-
     def update(self, tilt_status: TiltStatus):
-        self.rate_limiter.approve(tilt_status.color)
         headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
-        requests.post(self.url, headers=headers, data=tilt_status.json())
+        self.outbox.post(tilt_status.color, self.url, headers=headers, data=tilt_status.json())
 
     def enabled(self):
         return True
@@ -12,13 +12,16 @@ class DeviceRateLimiter:
         self.default_period = period
         self.device_limiters = dict()
 
-    def approve(self, device_id):
+    def approve(self, device_id, timestamp: float = None):
+        """
+        timestamp is when the reading was made (e.g. recorded time while replaying), now if not given.
+        """
         if device_id not in self.device_limiters:
             # No limiter for this device yet
             self.device_limiters[device_id] = self._get_new_limiter()
         # Check if this color is too frequent
         limiter = self.device_limiters[device_id]
-        limiter.approve()
+        limiter.approve(timestamp)
 
     def _get_new_limiter(self):
         return RateLimiter(self.default_rate, self.default_period)
@@ -31,14 +34,15 @@ class RateLimiter:
         self.allowance: int = rate
         self.last_check: Optional[float] = None
 
-    def approve(self):
+    def approve(self, timestamp: float = None):
+        current = timestamp if timestamp is not None else time.time()
         if self.last_check is None:
             # first time checking, approve
-            self.last_check = time.time()
+            self.last_check = current
             return
 
-        current = time.time()
-        time_passed = current - self.last_check
+        # Readings can be handled out of order (e.g. a replayed reading after a live retry), that isn't time passing
+        time_passed = max(0.0, current - self.last_check)
         self.last_check = current
         self.allowance = self.allowance + time_passed * (self.rate / self.period)
         if self.allowance > self.rate:
@@ -0,0 +1,116 @@
+import asyncio
+import socket
+import struct
+from typing import Callable, Optional
+from prometheus_client import Counter
+from .models import TiltReading
+
+counter_readings_merged = Counter('pitch_readings_merged', 'Copies of a Tilt broadcast dropped in favour of a stronger receiver', ['color'])
+
+# Datagram sent from a receiver to the hub: magic, major, minor, rssi, color length, then color and receiver name (utf-8)
+_MAGIC = b'PTC1'
+_header = struct.Struct('>4sHHhB')
+# RSSI is a signed 16 bit value on the wire, this marks "unknown" (e.g. simulated beacons)
+_RSSI_UNKNOWN = -32768
+
+
+def encode_reading(reading: TiltReading) -> bytes:
+    color = reading.color.encode('utf-8')
+    rssi = reading.rssi if reading.rssi is not None else _RSSI_UNKNOWN
+    return _header.pack(_MAGIC, reading.major, reading.minor, rssi, len(color)) + color + reading.receiver.encode('utf-8')
+
+
+def decode_reading(data: bytes, address: str = '') -> Optional[TiltReading]:
+    """
+    Returns the reading in a datagram, or None if it isn't one.  The receiver name is prefixed with the sender's address.
+    """
+    if len(data) < _header.size or not data.startswith(_MAGIC):
+        return None
+    _, major, minor, rssi, color_length = _header.unpack_from(data)
+    color_end = _header.size + color_length
+    try:
+        color = data[_header.size:color_end].decode('utf-8')
+        receiver = data[color_end:].decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    return TiltReading(color=color,
+                       major=major,
+                       minor=minor,
+                       rssi=rssi if rssi != _RSSI_UNKNOWN else None,
+                       receiver='{}/{}'.format(address, receiver) if address else receiver)
+
+
+class ReadingForwarder:
+    """
+    Sends readings to a hub Pitch over UDP, used when this Pitch is only a receiver.  Fire and forget,
+    a lost datagram is covered by the next broadcast.
+    """
+    def __init__(self, host: str, port: int):
+        self.address = (host, port)
+        self.sent = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def send(self, reading: TiltReading):
+        try:
+            self._socket.sendto(encode_reading(reading), self.address)
+            self.sent += 1
+        except OSError as e:
+            print("Could not forward reading to {}:{} ({})".format(*self.address, e))
+
+    def close(self):
+        self._socket.close()
+
+
+class _ReceiverProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, on_reading: Callable[[TiltReading], None], known_colors):
+        self.on_reading = on_reading
+        self.known_colors = known_colors
+
+    def datagram_received(self, data, address):
+        reading = decode_reading(data, address[0])
+        if reading is not None and reading.color in self.known_colors:
+            self.on_reading(reading)
+
+
+async def listen_for_receivers(port: int, on_reading: Callable[[TiltReading], None], known_colors):
+    """
+    Accepts readings from remote receivers on the running loop, returns the transport (close it to stop).
+    """
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: _ReceiverProtocol(on_reading, known_colors), local_addr=('0.0.0.0', port))
+    return transport
+
+
+class ReadingMerger:
+    """
+    Merges copies of the same Tilt broadcast heard by several receivers.  The first copy opens a window
+    for that color, the strongest copy heard before it closes is passed on.  With a window of 0 every
+    reading is passed on straight away (a single receiver has nothing to merge).  Runs on the event loop.
+    """
+    def __init__(self, window_seconds: float, on_reading: Callable[[TiltReading], None]):
+        self.window_seconds = window_seconds
+        self.on_reading = on_reading
+        self.merged = 0
+        self._pending = dict()
+
+    def add(self, reading: TiltReading):
+        if self.window_seconds <= 0:
+            self.on_reading(reading)
+            return
+        best = self._pending.get(reading.color)
+        if best is None:
+            self._pending[reading.color] = reading
+            asyncio.get_running_loop().call_later(self.window_seconds, self._flush, reading.color)
+            return
+        # Unknown RSSI loses to any known one, a tie goes to the newer copy
+        if best.rssi is None or (reading.rssi is not None and reading.rssi >= best.rssi):
+            self._pending[reading.color] = reading
+        self.merged += 1
+        counter_readings_merged.labels(color=reading.color).inc()
+
+    def _flush(self, color: str):
+        reading = self._pending.pop(color, None)
+        if reading is not None:
+            self.on_reading(reading)
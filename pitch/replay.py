@@ -0,0 +1,73 @@
+import datetime
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterator, Optional
+from .storage import LogRecord, read_log
+
+_SQLITE_MAGIC = b'SQLite format 3\x00'
+
+
+def read_recording(path: str) -> Iterator[LogRecord]:
+    """
+    Readings from a log file (log_file_path, any format) or a Pitch SQLite database, oldest first.
+    """
+    with open(path, 'rb') as file:
+        is_sqlite = file.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+    if is_sqlite:
+        yield from _read_sqlite(path)
+    else:
+        yield from read_log(path)
+
+
+def _read_sqlite(path: str) -> Iterator[LogRecord]:
+    # Read only, and only rows that were there when the replay started
+    conn = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True)
+    try:
+        last_id = conn.execute('SELECT max(id) FROM fermentation_readings').fetchone()[0] or 0
+        rows = conn.execute('SELECT timestamp, color, temp_f, gravity FROM fermentation_readings '
+                            'WHERE id <= ? ORDER BY timestamp, id', (last_id,))
+        for timestamp, color, temp_f, gravity in rows:
+            yield LogRecord(timestamp=datetime.datetime.fromtimestamp(timestamp),
+                            color=color,
+                            temp_fahrenheit=temp_f,
+                            gravity=gravity,
+                            rssi=None)
+    finally:
+        conn.close()
+
+
+class Replayer:
+    """
+    Plays recorded readings back in order.  speed is a multiplier on the recorded time between readings
+    (1 is real time), 0 replays as fast as the readings can be handled.  Readings keep their recorded time,
+    which rate limiters go by, so providers get the updates they got when the readings were made however fast
+    they are replayed.
+    """
+    def __init__(self, path: str, speed: float = 0):
+        self.path = path
+        self.speed = speed
+        # Stats
+        self.replayed = 0
+        self.elapsed_seconds = 0.0
+
+    def run(self, on_reading: Callable[[LogRecord], None], stop_event: threading.Event = None):
+        stop_event = stop_event or threading.Event()
+        started = time.monotonic()
+        first: Optional[datetime.datetime] = None
+        try:
+            for record in read_recording(self.path):
+                if stop_event.is_set():
+                    return
+                if first is None:
+                    first = record.timestamp
+                if self.speed > 0:
+                    # Scheduled from the start, so time spent handling readings doesn't add up
+                    due = started + (record.timestamp - first).total_seconds() / self.speed
+                    wait = due - time.monotonic()
+                    if wait > 0 and stop_event.wait(wait):
+                        return
+                on_reading(record)
+                self.replayed += 1
+        finally:
+            self.elapsed_seconds = time.monotonic() - started
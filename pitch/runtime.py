@@ -0,0 +1,45 @@
+import asyncio
+import concurrent.futures
+import threading
+
+
+class AsyncRuntime:
+    """
+    A single asyncio event loop running on a background thread.  The BLE scanner and every provider
+    implementing update_async share it, so there is no per-message loop or thread startup.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(name='pitch-asyncio', target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, coroutine) -> concurrent.futures.Future:
+        """
+        Schedules a coroutine on the loop from any thread.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout: float = 5):
+        if not self._thread.is_alive():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            # Give anything still running a chance to clean up (e.g. close network sessions)
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
@@ -0,0 +1,66 @@
+import time
+from collections import deque
+from typing import Optional
+from .models import SignalStats
+
+
+class SignalWindow:
+    """
+    Ring buffer of the last broadcasts from one Tilt.  Running sums are kept as broadcasts come and go,
+    so stats are O(1) no matter the window size.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self._times = deque(maxlen=size)
+        self._rssi = deque(maxlen=size)
+        self._rssi_sum = 0
+        self._rssi_sum_squares = 0
+
+    def add(self, rssi: Optional[int], now: float):
+        self._times.append(now)
+        # Simulated broadcasts have no RSSI
+        if rssi is None:
+            return
+        if len(self._rssi) == self.size:
+            oldest = self._rssi[0]
+            self._rssi_sum -= oldest
+            self._rssi_sum_squares -= oldest * oldest
+        self._rssi.append(rssi)
+        self._rssi_sum += rssi
+        self._rssi_sum_squares += rssi * rssi
+
+    def stats(self):
+        rssi = rssi_mean = rssi_variance = packets_per_minute = None
+        count = len(self._rssi)
+        if count:
+            rssi = self._rssi[-1]
+            rssi_mean = self._rssi_sum / count
+            # RSSI values are ints, so the numerator is exact and never negative from rounding
+            rssi_variance = (count * self._rssi_sum_squares - self._rssi_sum ** 2) / (count * count)
+        elapsed = self._times[-1] - self._times[0]
+        if elapsed > 0:
+            packets_per_minute = (len(self._times) - 1) * 60 / elapsed
+        return SignalStats(rssi=rssi,
+                           rssi_mean=rssi_mean,
+                           rssi_variance=rssi_variance,
+                           packets_per_minute=packets_per_minute)
+
+
+class SignalTracker:
+    """
+    Signal quality per Tilt color, from every broadcast heard (including the repeats that get dropped).
+    """
+    def __init__(self, window_size: int, clock=time.time):
+        self.window_size = window_size
+        self._clock = clock
+        self._windows = dict()
+
+    def add(self, color: str, rssi: Optional[int]):
+        window = self._windows.get(color)
+        if window is None:
+            window = self._windows[color] = SignalWindow(self.window_size)
+        window.add(rssi, self._clock())
+
+    def get(self, color: str) -> Optional[SignalStats]:
+        window = self._windows.get(color)
+        return window.stats() if window is not None else None
@@ -0,0 +1,158 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple
+from .configuration import PitchConfig
+from .ibeacon import APPLE_COMPANY_ID, encode_ibeacon
+
+# The eight Tilt colors, simulate_colors can also be "all" for these
+TILT_COLORS = ['red', 'green', 'black', 'purple', 'orange', 'blue', 'yellow', 'pink']
+
+
+class SimulatedAdvertisement(NamedTuple):
+    """
+    Stands in for bleak's AdvertisementData, only the fields the detection callback reads.
+    """
+    manufacturer_data: Dict[int, bytes]
+    rssi: int
+
+
+class VirtualTilt:
+    """
+    One simulated Tilt.  Gravity follows a logistic curve from original to final gravity (slow start, most of
+    the drop in the middle, tapering off), temperature swings a little around the set point once a day, and
+    both get a bit of sensor noise.
+    """
+    def __init__(self, color: str, beacon_uuid: str, interval: float, hd: bool, original_gravity: float,
+                 final_gravity: float, fermentation_days: float, temp_fahrenheit: float, start_day: float,
+                 rng: random.Random):
+        self.color = color
+        self.beacon_uuid = beacon_uuid
+        self.interval = interval
+        self.hd = hd
+        self.original_gravity = original_gravity
+        self.final_gravity = final_gravity
+        self.fermentation_days = fermentation_days
+        self.temp_fahrenheit = temp_fahrenheit
+        self.start_day = start_day
+        self.rssi = rng.randint(-90, -55)
+        self.next_due = 0.0
+        self._rng = rng
+
+    def gravity_at(self, day: float):
+        # Midpoint a third of the way in, steep enough to be within a point of final gravity by the end
+        midpoint = self.fermentation_days / 3
+        steepness = 8 / self.fermentation_days
+        drop = self.original_gravity - self.final_gravity
+        return self.final_gravity + drop / (1 + math.exp(steepness * (day - midpoint)))
+
+    def temp_at(self, day: float):
+        return self.temp_fahrenheit + 1.5 * math.sin(2 * math.pi * day)
+
+    def broadcast(self, elapsed_seconds: float):
+        day = self.start_day + elapsed_seconds / 86400
+        gravity = self.gravity_at(day) + self._rng.gauss(0, 0.0003)
+        temp = self.temp_at(day) + self._rng.gauss(0, 0.1)
+        if self.hd:
+            # Tilt Pro, one more digit for both
+            major, minor = round(temp * 10), round(gravity * 10000)
+        else:
+            major, minor = round(temp), round(gravity * 1000)
+        rssi = max(-127, min(-20, self.rssi + round(self._rng.gauss(0, 3))))
+        return SimulatedAdvertisement(manufacturer_data={APPLE_COMPANY_ID: encode_ibeacon(self.beacon_uuid, major, minor)},
+                                      rssi=rssi)
+
+
+class BeaconSimulator:
+    """
+    Simulates any number of Tilts broadcasting at any rate, for development and load testing.  Advertisements
+    are raw iBeacon bytes handed to the same callback as the Bluetooth scanner, so parsing is exercised too.
+    Broadcasts can be jittered, lost, or repeated in bursts like a real Tilt in a noisy room.
+    """
+    def __init__(self, config: PitchConfig, colors_to_uuid: Dict[str, str],
+                 on_advertisement: Callable[[SimulatedAdvertisement], None], rng: random.Random = None):
+        # At 1 or more a broadcast could be due again straight away, and the simulator would never catch up
+        if not 0 <= config.simulate_jitter < 1:
+            raise ValueError("Simulated jitter must be at least 0 and less than 1")
+        if not config.simulate_rate_hz > 0:
+            raise ValueError("Simulated rate must be more than 0")
+        if not 0 <= config.simulate_packet_loss <= 1:
+            raise ValueError("Simulated packet loss must be between 0 and 1")
+        if not 0 <= config.simulate_duplicate_chance <= 1:
+            raise ValueError("Simulated duplicate chance must be between 0 and 1")
+        self.on_advertisement = on_advertisement
+        self.rate_hz = config.simulate_rate_hz
+        self.time_scale = config.simulate_time_scale
+        self.jitter = config.simulate_jitter
+        self.packet_loss = config.simulate_packet_loss
+        self.duplicate_chance = config.simulate_duplicate_chance
+        self.duplicate_burst = config.simulate_duplicate_burst
+        self._rng = rng or random.Random(config.simulate_seed)
+        colors = TILT_COLORS if config.simulate_colors == "all" else config.simulate_colors
+        self.tilts: List[VirtualTilt] = list()
+        for color in colors:
+            if color not in colors_to_uuid:
+                raise ValueError("Simulated colors must be \"all\" or a list of: {}".format(", ".join(colors_to_uuid)))
+            self.tilts.append(VirtualTilt(
+                color=color,
+                beacon_uuid=colors_to_uuid[color],
+                interval=1 / self.rate_hz,
+                hd=config.simulate_tilt_pro,
+                original_gravity=config.get_original_gravity(color) or config.simulate_original_gravity,
+                final_gravity=config.get_final_gravity(color) or config.simulate_final_gravity,
+                fermentation_days=config.simulate_fermentation_days,
+                temp_fahrenheit=config.simulate_temp_fahrenheit + self._rng.uniform(-2, 2),
+                # Spread the Tilts out over the fermentation so their charts differ
+                start_day=self._rng.uniform(0, config.simulate_fermentation_days / 2) if len(colors) > 1 else 0,
+                rng=self._rng))
+        # Stats
+        self.sent = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.elapsed_seconds = 0.0
+
+    @property
+    def target_rate(self):
+        return self.rate_hz * len(self.tilts)
+
+    async def run(self, stop_event: threading.Event):
+        started = time.monotonic()
+        for tilt in self.tilts:
+            # Don't have every Tilt broadcast at the same moment
+            tilt.next_due = started + self._rng.uniform(0, tilt.interval)
+        try:
+            while not stop_event.is_set():
+                now = time.monotonic()
+                self.elapsed_seconds = now - started
+                for tilt in self.tilts:
+                    # Catch up on everything due, at high rates one wake up sends many
+                    while tilt.next_due <= now:
+                        self._broadcast(tilt, (tilt.next_due - started) * self.time_scale)
+                        tilt.next_due += tilt.interval * (1 + self._rng.uniform(-self.jitter, self.jitter))
+                # Waking up more than once a millisecond costs more than it's worth
+                wait = min(tilt.next_due for tilt in self.tilts) - time.monotonic() if self.tilts else 1
+                # and sleeping longer than half a second holds up shutdown
+                await asyncio.sleep(min(0.5, max(0.001, wait)))
+        finally:
+            self.elapsed_seconds = time.monotonic() - started
+
+    def report(self):
+        rate = self.sent / self.elapsed_seconds if self.elapsed_seconds else 0
+        return ("Simulated {} broadcasts from {} Tilts in {:.1f}s ({:.0f}/s, target {:.0f}/s), "
+                "{} lost, {} duplicates").format(self.sent, len(self.tilts), self.elapsed_seconds, rate,
+                                                 self.target_rate, self.lost, self.duplicates)
+
+    def _broadcast(self, tilt: VirtualTilt, elapsed_seconds: float):
+        if self.packet_loss and self._rng.random() < self.packet_loss:
+            self.lost += 1
+            return
+        advertisement = tilt.broadcast(elapsed_seconds)
+        copies = 1
+        if self.duplicate_chance and self._rng.random() < self.duplicate_chance:
+            copies += self._rng.randint(1, max(1, self.duplicate_burst))
+            self.duplicates += copies - 1
+        for _ in range(copies):
+            self.on_advertisement(advertisement)
+            self.sent += 1
@@ -0,0 +1,4 @@
+from .sqlite_writer import SqliteWriter
+from . import sqlite_schema
+from .history import HistoryReader, HISTORY_COLUMNS
+from .segment_log import SegmentLogWriter, LogRecord, read_log, segment_paths
@@ -0,0 +1,60 @@
+import sqlite3
+from typing import Iterator, Optional
+
+# Columns of every row returned by HistoryReader.query
+HISTORY_COLUMNS = ['timestamp', 'color', 'count', 'gravity_avg', 'gravity_min', 'gravity_max',
+                   'temp_f_avg', 'temp_f_min', 'temp_f_max']
+
+# Downsampled sources, coarsest first, (table, bucket size in seconds)
+_ROLLUP_SOURCES = [
+    ('fermentation_rollups_hour', 3600),
+    ('fermentation_rollups_minute', 60),
+]
+
+
+class HistoryReader:
+    """
+    Range queries over the SQLite history, downsampled to roughly the number of points asked for.
+    Answers from the coarsest rollup table that still has enough resolution, and yields rows as
+    they are read so large exports are never held in memory.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    def query(self, color: str, start: int, end: int, points: int = 500, brew_id: Optional[str] = None) -> Iterator[dict]:
+        step = max(1, (end - start) // max(1, points))
+        sql, params = HistoryReader._get_sql(color, start, end, step, brew_id)
+        # Read only, so a bad query can never touch the data
+        conn = sqlite3.connect('file:{}?mode=ro'.format(self.db_path), uri=True)
+        try:
+            for row in conn.execute(sql, params):
+                yield dict(zip(HISTORY_COLUMNS, row))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _get_sql(color: str, start: int, end: int, step: int, brew_id: Optional[str]):
+        brew_filter = ' AND brew_id = ?' if brew_id is not None else ''
+        params = [step, color, start, end] + ([brew_id] if brew_id is not None else [])
+        for table, bucket_seconds in _ROLLUP_SOURCES:
+            if step >= bucket_seconds:
+                sql = '''
+                    SELECT bucket - bucket % ?, color, sum(count),
+                           sum(gravity_sum) / sum(count), min(gravity_min), max(gravity_max),
+                           sum(temp_f_sum) / sum(count), min(temp_f_min), max(temp_f_max)
+                    FROM {table}
+                    WHERE color = ? AND bucket >= ? AND bucket < ?{brew_filter}
+                    GROUP BY 1
+                    ORDER BY 1
+                '''.format(table=table, brew_filter=brew_filter)
+                return sql, params
+        sql = '''
+            SELECT timestamp - timestamp % ?, color, count(*),
+                   avg(gravity), min(gravity), max(gravity),
+                   avg(temp_f), min(temp_f), max(temp_f)
+            FROM fermentation_readings
+            WHERE color = ? AND timestamp >= ? AND timestamp < ?{brew_filter}
+            GROUP BY 1
+            ORDER BY 1
+        '''.format(brew_filter=brew_filter)
+        return sql, params
@@ -0,0 +1,300 @@
+import datetime
+import glob
+import gzip
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is always available
+    zstandard = None
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+log_formats = [FORMAT_JSON, FORMAT_BINARY]
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+log_compressions = [COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD]
+_extensions = {COMPRESSION_NONE: '', COMPRESSION_GZIP: '.gz', COMPRESSION_ZSTD: '.zst'}
+
+# Binary segments start with the magic and the color table, records refer to colors by index
+_MAGIC = b'PTL1'
+LOG_COLORS = ('red', 'green', 'black', 'purple', 'orange', 'blue', 'yellow', 'pink', 'simulated')
+# Fixed width record: unix time, color index, gravity * 10000, temperature (F) * 100, rssi
+_record = struct.Struct('<dBHhb')
+# RSSI is a signed byte in a record, this marks "unknown" (e.g. simulated beacons)
+_RSSI_UNKNOWN = -128
+# What follows the log path in a closed segment's name, the time it was closed in milliseconds and the compression
+_segment_suffix = re.compile(r'\.(\d{13,})(?:\.gz|\.zst)?')
+
+
+class LogRecord(NamedTuple):
+    timestamp: datetime.datetime
+    color: str
+    temp_fahrenheit: float
+    gravity: float
+    rssi: Optional[int]
+
+
+def _binary_header(colors=LOG_COLORS):
+    names = b''.join(bytes([len(color)]) + color.encode('utf-8') for color in colors)
+    return _MAGIC + bytes([len(colors)]) + names
+
+
+class SegmentLogWriter:
+    """
+    Append only reading log split into segments.  Writes are buffered and flushed within flush_seconds, once
+    the active file reaches max_bytes it is renamed with the time it was closed and compressed, so segment
+    names sort in time order.  The binary format is a fixed width record per reading, around 40x smaller
+    than a JSON line.
+    """
+    def __init__(self, path: str, log_format: str = FORMAT_JSON, compression: str = COMPRESSION_GZIP,
+                 max_bytes: int = 10 * 1024 * 1024, max_segments: int = 0, flush_seconds: float = 5):
+        if log_format not in log_formats:
+            raise ValueError("Log format must be one of: {}".format(", ".join(log_formats)))
+        if compression not in log_compressions:
+            raise ValueError("Log compression must be one of: {}".format(", ".join(log_compressions)))
+        if compression == COMPRESSION_ZSTD and zstandard is None:
+            raise ValueError("zstd log compression needs the zstandard package (pip install zstandard)")
+        self.path = path
+        self.log_format = log_format
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_segments = max_segments
+        self.flush_seconds = flush_seconds
+        self._colors = {color: index for index, color in enumerate(LOG_COLORS)}
+        self._file: Optional[BinaryIO] = None
+        self._size = 0
+        self._last_flush = 0.0
+        # Flushes what is buffered when no more readings come in to do it, e.g. the Tilts stopped broadcasting
+        self._flush_timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        # Stats
+        self.records = 0
+        self.rotations = 0
+
+    def open(self):
+        if os.path.isfile(self.path) and os.path.getsize(self.path):
+            if _is_binary(self.path) != (self.log_format == FORMAT_BINARY):
+                # Format changed since the last run, don't mix the two in one file
+                self._rotate()
+                return
+            if self.log_format == FORMAT_BINARY:
+                _trim_binary(self.path)
+        self._file = open(self.path, 'ab', buffering=64 * 1024)
+        self._size = self._file.tell()
+        if not self._size and self.log_format == FORMAT_BINARY:
+            self._write(_binary_header())
+        self._last_flush = time.time()
+
+    def write(self, tilt_status):
+        with self._lock:
+            if self.log_format == FORMAT_BINARY:
+                color = self._colors.get(tilt_status.color)
+                if color is None:
+                    return
+                rssi = max(-127, min(127, tilt_status.rssi)) if tilt_status.rssi is not None else _RSSI_UNKNOWN
+                self._write(_record.pack(tilt_status.timestamp.timestamp(), color, round(tilt_status.gravity * 10000),
+                                         round(tilt_status.temp_fahrenheit * 100), rssi))
+            else:
+                self._write(tilt_status.json().encode('utf-8') + b'\n')
+            self.records += 1
+            wait = self._last_flush + self.flush_seconds - time.time()
+            if wait <= 0:
+                self._flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(wait, self._timed_flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            if self._size >= self.max_bytes:
+                self._rotate()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._close()
+
+    def _flush(self):
+        if self._file is not None:
+            self._file.flush()
+        self._last_flush = time.time()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._flush_timer = None
+            self._flush()
+
+    def _close(self):
+        # Closing writes anything still buffered
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._size += len(data)
+
+    def _rotate(self):
+        self._close()
+        closed_at = int(time.time() * 1000)
+        # Names have to be unique and sort in order, even for segments closed in the same millisecond
+        while glob.glob(glob.escape('{}.{:013d}'.format(self.path, closed_at)) + '*'):
+            closed_at += 1
+        segment = '{}.{:013d}'.format(self.path, closed_at)
+        os.replace(self.path, segment)
+        if self.compression != COMPRESSION_NONE:
+            with open(segment, 'rb') as source, open(segment + _extensions[self.compression], 'wb') as target:
+                if self.compression == COMPRESSION_ZSTD:
+                    zstandard.ZstdCompressor().copy_stream(source, target)
+                else:
+                    with gzip.GzipFile(fileobj=target, mode='wb') as compressed:
+                        shutil.copyfileobj(source, compressed)
+            os.remove(segment)
+        self.rotations += 1
+        if self.max_segments > 0:
+            # The active file was just renamed, so these are all closed segments
+            for old in segment_paths(self.path)[:-self.max_segments]:
+                os.remove(old)
+        self.open()
+
+
+def segment_paths(path: str) -> List[str]:
+    """
+    Closed segments oldest first, then the active file.
+    """
+    segments = [p for p in glob.glob(glob.escape(path) + '.*') if _closed_at(p, path) is not None]
+    segments.sort(key=lambda p: _closed_at(p, path))
+    if os.path.isfile(path):
+        segments.append(path)
+    return segments
+
+
+def read_log(path: str, start: datetime.datetime = None, end: datetime.datetime = None) -> Iterator[LogRecord]:
+    """
+    Every reading in the log, oldest first.  Segments closed before start are skipped without being read,
+    files are memory-mapped, and binary segments jump straight to start.
+    """
+    start_seconds = start.timestamp() if start is not None else None
+    end_seconds = end.timestamp() if end is not None else None
+    for segment in segment_paths(path):
+        closed_at = _closed_at(segment, path)
+        if start_seconds is not None and closed_at is not None and closed_at < start_seconds:
+            continue
+        for record in _read_segment(segment, start_seconds):
+            if end_seconds is not None and record.timestamp.timestamp() > end_seconds:
+                return
+            yield record
+
+
+def _closed_at(segment: str, path: str) -> Optional[float]:
+    # pitch_log.json.1600000000000.gz -> 1600000000.0, None for anything the writer didn't name (e.g. pitch_log.json.1)
+    match = _segment_suffix.fullmatch(segment[len(path):])
+    return int(match.group(1)) / 1000 if match else None
+
+
+def _is_binary(path: str):
+    with open(path, 'rb') as file:
+        return file.read(len(_MAGIC)) == _MAGIC
+
+
+def _trim_binary(path: str):
+    """
+    Cuts off a record left partly written (e.g. by a power cut), records appended after it would be misaligned.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as file:
+        # Magic, number of colors and up to 255 colors of up to 255 bytes
+        header = file.read(len(_MAGIC) + 1 + 255 * 256)
+    end = len(_MAGIC) + 1
+    if len(header) < end:
+        whole = 0
+    else:
+        for _ in range(header[len(_MAGIC)]):
+            end = end + 1 + header[end] if end < len(header) else len(header) + 1
+        # Without a complete header start the file over
+        whole = end + (size - end) // _record.size * _record.size if end <= size else 0
+    if whole < size:
+        os.truncate(path, whole)
+
+
+def _read_segment(segment: str, start_seconds: Optional[float]) -> Iterator[LogRecord]:
+    with open(segment, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if segment.endswith(_extensions[COMPRESSION_GZIP]):
+                data = gzip.decompress(mapped)
+            elif segment.endswith(_extensions[COMPRESSION_ZSTD]):
+                if zstandard is None:
+                    raise ValueError("Reading {} needs the zstandard package (pip install zstandard)".format(segment))
+                data = zstandard.ZstdDecompressor().stream_reader(mapped).read()
+            else:
+                data = mapped
+            if data[:len(_MAGIC)] == _MAGIC:
+                yield from _read_binary(data, start_seconds)
+            else:
+                yield from _read_json(data, start_seconds)
+            # Release the map before it is closed
+            del data
+
+
+def _read_binary(data, start_seconds: Optional[float]) -> Iterator[LogRecord]:
+    offset = len(_MAGIC) + 1
+    colors = list()
+    for _ in range(data[len(_MAGIC)]):
+        length = data[offset]
+        colors.append(bytes(data[offset + 1:offset + 1 + length]).decode('utf-8'))
+        offset += 1 + length
+    count = (len(data) - offset) // _record.size  # a partly written last record is ignored
+    first = 0
+    if start_seconds is not None:
+        # Records are in time order, find the first one at or after start without reading the rest
+        high = count
+        while first < high:
+            middle = (first + high) // 2
+            if _record.unpack_from(data, offset + middle * _record.size)[0] < start_seconds:
+                first = middle + 1
+            else:
+                high = middle
+    records = memoryview(data)[offset + first * _record.size:offset + count * _record.size]
+    try:
+        for timestamp, color, gravity, temp, rssi in _record.iter_unpack(records):
+            yield LogRecord(timestamp=datetime.datetime.fromtimestamp(timestamp),
+                            color=colors[color],
+                            temp_fahrenheit=temp / 100,
+                            gravity=gravity / 10000,
+                            rssi=rssi if rssi != _RSSI_UNKNOWN else None)
+    finally:
+        records.release()
+
+
+def _read_json(data, start_seconds: Optional[float]) -> Iterator[LogRecord]:
+    lines = iter(data.readline, b'') if isinstance(data, mmap.mmap) else data.splitlines()
+    for line in lines:
+        if not line.strip():
+            continue
+        reading = json.loads(line)
+        timestamp = datetime.datetime.fromisoformat(reading['timestamp'])
+        if start_seconds is not None and timestamp.timestamp() < start_seconds:
+            continue
+        yield LogRecord(timestamp=timestamp,
+                        color=reading['color'],
+                        temp_fahrenheit=reading['temp_fahrenheit'],
+                        gravity=reading['gravity'],
+                        rssi=reading.get('rssi'))
+
@@ -0,0 +1,167 @@
+import sqlite3
+
+# Rollup tables kept up to date by triggers as raw readings are inserted, (table name, bucket size in seconds)
+ROLLUPS = [
+    ('fermentation_rollups_minute', 60),
+    ('fermentation_rollups_hour', 3600),
+]
+
+
+def _migrate_v1(conn: sqlite3.Connection):
+    # Original table, databases created before migrations already have it
+    conn.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS fermentation_readings (
+            timestamp INTEGER,
+            color TEXT,
+            name TEXT,
+            temp_f REAL,
+            temp_c REAL,
+            gravity REAL,
+            abv REAL,
+            attenuation REAL
+        )
+        '''
+    )
+
+
+def _migrate_v2(conn: sqlite3.Connection):
+    # Rebuild with a primary key and brew id, SQLite can't add a primary key in place
+    conn.execute('ALTER TABLE fermentation_readings RENAME TO fermentation_readings_v1')
+    conn.execute(
+        '''
+        CREATE TABLE fermentation_readings (
+            id INTEGER PRIMARY KEY,
+            timestamp INTEGER NOT NULL,
+            color TEXT NOT NULL,
+            name TEXT,
+            brew_id TEXT,
+            temp_f REAL,
+            temp_c REAL,
+            gravity REAL,
+            abv REAL,
+            attenuation REAL
+        )
+        '''
+    )
+    conn.execute(
+        '''
+        INSERT INTO fermentation_readings (timestamp, color, name, brew_id, temp_f, temp_c, gravity, abv, attenuation)
+        SELECT timestamp, color, name, name, temp_f, temp_c, gravity, abv, attenuation
+        FROM fermentation_readings_v1 ORDER BY timestamp
+        '''
+    )
+    conn.execute('DROP TABLE fermentation_readings_v1')
+    conn.execute('CREATE INDEX idx_fermentation_readings_color_timestamp ON fermentation_readings (color, timestamp)')
+    conn.execute('CREATE INDEX idx_fermentation_readings_brew_id_timestamp ON fermentation_readings (brew_id, timestamp)')
+    for table, bucket_seconds in ROLLUPS:
+        _create_rollup(conn, table, bucket_seconds)
+
+
+def _migrate_v3(conn: sqlite3.Connection):
+    # Fermentation analytics, empty for older readings
+    conn.execute('ALTER TABLE fermentation_readings ADD COLUMN gravity_velocity REAL')
+    conn.execute('ALTER TABLE fermentation_readings ADD COLUMN fermentation_eta INTEGER')
+    conn.execute('ALTER TABLE fermentation_readings ADD COLUMN fermentation_state TEXT')
+
+
+def _create_rollup(conn: sqlite3.Connection, table: str, bucket_seconds: int):
+    conn.execute(
+        '''
+        CREATE TABLE {table} (
+            color TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            name TEXT,
+            brew_id TEXT,
+            count INTEGER NOT NULL,
+            gravity_min REAL,
+            gravity_max REAL,
+            gravity_sum REAL,
+            temp_f_min REAL,
+            temp_f_max REAL,
+            temp_f_sum REAL,
+            PRIMARY KEY (color, bucket)
+        )
+        '''.format(table=table)
+    )
+    # Averages are sum / count, the view saves dashboards from doing it
+    conn.execute(
+        '''
+        CREATE VIEW {table}_avg AS
+        SELECT color, bucket AS timestamp, name, brew_id, count,
+               gravity_min, gravity_max, gravity_sum / count AS gravity_avg,
+               temp_f_min, temp_f_max, temp_f_sum / count AS temp_f_avg
+        FROM {table}
+        '''.format(table=table)
+    )
+    upsert = '''
+        INSERT INTO {table} (color, bucket, name, brew_id, count,
+                             gravity_min, gravity_max, gravity_sum, temp_f_min, temp_f_max, temp_f_sum)
+        VALUES ({color}, {timestamp} - {timestamp} % {bucket_seconds}, {name}, {brew_id}, 1,
+                {gravity}, {gravity}, {gravity}, {temp_f}, {temp_f}, {temp_f})
+        ON CONFLICT (color, bucket) DO UPDATE SET
+            name = excluded.name,
+            brew_id = excluded.brew_id,
+            count = count + 1,
+            gravity_min = min(gravity_min, excluded.gravity_min),
+            gravity_max = max(gravity_max, excluded.gravity_max),
+            gravity_sum = gravity_sum + excluded.gravity_sum,
+            temp_f_min = min(temp_f_min, excluded.temp_f_min),
+            temp_f_max = max(temp_f_max, excluded.temp_f_max),
+            temp_f_sum = temp_f_sum + excluded.temp_f_sum
+    '''
+    # Backfill from existing rows, then keep up to date on every insert
+    conn.execute(
+        '''
+        INSERT INTO {table} (color, bucket, name, brew_id, count,
+                             gravity_min, gravity_max, gravity_sum, temp_f_min, temp_f_max, temp_f_sum)
+        SELECT color, timestamp - timestamp % {bucket_seconds}, max(name), max(brew_id), count(*),
+               min(gravity), max(gravity), sum(gravity), min(temp_f), max(temp_f), sum(temp_f)
+        FROM fermentation_readings
+        GROUP BY color, timestamp - timestamp % {bucket_seconds}
+        '''.format(table=table, bucket_seconds=bucket_seconds)
+    )
+    conn.execute(
+        '''
+        CREATE TRIGGER {table}_insert AFTER INSERT ON fermentation_readings
+        BEGIN
+        {upsert};
+        END
+        '''.format(table=table, upsert=upsert.format(
+            table=table, bucket_seconds=bucket_seconds, color='new.color', timestamp='new.timestamp',
+            name='new.name', brew_id='new.brew_id', gravity='new.gravity', temp_f='new.temp_f'))
+    )
+
+
+# Index is the version the migration upgrades from, append new migrations to the end
+MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn: sqlite3.Connection):
+    """
+    Brings the database up to SCHEMA_VERSION, tracked with SQLite's user_version.
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for upgrade_from in range(version, SCHEMA_VERSION):
+        # Each migration is all or nothing
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            MIGRATIONS[upgrade_from](conn)
+            conn.execute('PRAGMA user_version = {}'.format(upgrade_from + 1))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def prune(conn: sqlite3.Connection, older_than: int):
+    """
+    Deletes raw readings older than the given unix timestamp, rollups are kept.
+    """
+    return conn.execute('DELETE FROM fermentation_readings WHERE timestamp < ?', (older_than,)).rowcount
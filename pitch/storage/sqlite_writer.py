@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class SqliteWriter:
+    """
+    Owns a single long lived SQLite connection (WAL mode) on its own thread.  Rows are buffered and
+    written together in one transaction once batch_size rows are waiting or flush_seconds have passed,
+    and anything left is written on stop().
+    """
+    def __init__(self, db_path: str, write_rows: Callable[[sqlite3.Connection, List[tuple]], None],
+                 batch_size: int = 20, flush_seconds: float = 60,
+                 setup: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.db_path = db_path
+        self.write_rows = write_rows
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.setup = setup
+        self.rows_written = 0
+        self.flushes = 0
+        self._rows: List[tuple] = list()
+        self._stopping = False
+        self._flush_requested = False
+        self._ready = threading.Event()
+        self._error: Optional[Exception] = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(name='sqlite-writer', target=self._run, daemon=True)
+
+    def start(self):
+        """
+        Opens the connection and runs setup (e.g. creating tables), raising any error here.
+        """
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def add(self, row: tuple):
+        with self._condition:
+            self._rows.append(row)
+            if len(self._rows) >= self.batch_size:
+                self._condition.notify()
+
+    def flush(self):
+        """
+        Asks the writer to write buffered rows now, without waiting for it to finish.
+        """
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify()
+
+    def stop(self, timeout: float = 10):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            while True:
+                with self._condition:
+                    deadline = time.time() + self.flush_seconds
+                    while not (self._stopping or self._flush_requested) and len(self._rows) < self.batch_size:
+                        remaining = deadline - time.time()
+                        if remaining <= 0 or not self._condition.wait(remaining):
+                            break
+                    rows, self._rows = self._rows, list()
+                    self._flush_requested = False
+                    stopping = self._stopping
+                if rows:
+                    self._write(conn, rows)
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        # WAL lets readers (e.g. Grafana) query while Pitch writes, and NORMAL sync
+        # only fsyncs on checkpoints instead of on every commit
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        if self.setup is not None:
+            with conn:
+                self.setup(conn)
+        return conn
+
+    def _write(self, conn: sqlite3.Connection, rows: List[tuple]):
+        try:
+            with conn:
+                self.write_rows(conn, rows)
+            self.rows_written += len(rows)
+            self.flushes += 1
+        except Exception as e:
+            print("Failed to write {} rows to {}: {}".format(len(rows), self.db_path, e))
@@ -1 +1,19 @@
-from .test_tilt_status import TiltStatusTests
\ No newline at end of file
+from .test_tilt_status import TiltStatusTests
+from .test_dispatcher import DispatcherTests
+from .test_mailbox import ColorMailboxTests
+from .test_azure_iothub import AzureIoTHubTests
+from .test_http_client import HttpClientTests
+from .test_sqlite import SqliteTests
+from .test_sqlite_schema import SqliteSchemaTests
+from .test_history_api import HistoryApiTests
+from .test_ibeacon import IBeaconParserTests, BeaconDeduplicatorTests
+from .test_signal_quality import SignalTrackerTests
+from .test_receivers import ReceiverTests
+from .test_filters import FilterTests, ReadingSmootherTests
+from .test_aggregation import AggregationTests
+from .test_analytics import AnalyticsTests
+from .test_tui import TuiHistoryTests, TuiProviderTests
+from .test_outbox import OutboxTests
+from .test_segment_log import SegmentLogTests
+from .test_replay import ReplayTests
+from .test_simulator import SimulatorTests
@@ -0,0 +1,65 @@
+import unittest
+from pitch.abstractions import CloudProviderBase
+from pitch.aggregation import Aggregator
+from pitch.configuration import PitchConfig
+from pitch.dispatcher import ProviderInbox, ProviderWorker
+from pitch.models import TiltStatus
+from pitch.rate_limiter import RateLimitedException
+
+
+class EveryThirdProvider(CloudProviderBase):
+    """Rate limits all but every third reading"""
+
+    def __init__(self):
+        self.calls = 0
+        self.sent = list()
+
+    def update(self, tilt_status: TiltStatus):
+        self.calls += 1
+        if self.calls % 3:
+            raise RateLimitedException()
+        self.sent.append(tilt_status)
+
+
+class AggregationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = PitchConfig({})
+
+    def _status(self, gravity, temp=70, color="purple"):
+        return TiltStatus(color, temp, gravity, self.config)
+
+    def test_aggregate(self):
+        aggregator = Aggregator(self.config)
+        aggregator.add(self._status(1.050, 68))
+        aggregator.add(self._status(1.040, 72))
+        last = self._status(1.045, 70)
+        tilt_status = aggregator.add(last)
+        self.assertEqual(tilt_status.gravity, 1.045)
+        self.assertEqual(tilt_status.temp_fahrenheit, 70)
+        self.assertEqual(tilt_status.timestamp, last.timestamp)
+        self.assertEqual(tilt_status.aggregate.count, 3)
+        self.assertEqual(tilt_status.aggregate.gravity_min, 1.040)
+        self.assertEqual(tilt_status.aggregate.gravity_max, 1.050)
+        self.assertEqual(tilt_status.aggregate.temp_fahrenheit_max, 72)
+        self.assertIsNone(last.aggregate)
+
+    def test_reset(self):
+        aggregator = Aggregator(self.config)
+        aggregator.add(self._status(1.050))
+        aggregator.add(self._status(1.050, color="red"))
+        aggregator.reset("purple")
+        self.assertEqual(aggregator.add(self._status(1.040)).aggregate.count, 1)
+        self.assertEqual(aggregator.add(self._status(1.040, color="red")).aggregate.count, 2)
+
+    def test_worker_sends_average_of_rate_limited_readings(self):
+        provider = EveryThirdProvider()
+        worker = ProviderWorker(provider, 'every_third', ProviderInbox(), console_log=False, aggregator=Aggregator(self.config))
+        for gravity in [1.050, 1.046, 1.042, 1.040, 1.030, 1.020]:
+            worker._update(self._status(gravity))
+        self.assertEqual([s.gravity for s in provider.sent], [1.046, 1.030])
+        self.assertEqual([s.aggregate.count for s in provider.sent], [3, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
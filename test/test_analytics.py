@@ -0,0 +1,67 @@
+import datetime
+import unittest
+from pitch.analytics import FermentationAnalytics, GravityTrend, STATE_FERMENTING, STATE_FINISHED, STATE_STALLED, STATE_STABLE
+from pitch.configuration import PitchConfig
+from pitch.models import TiltStatus
+
+START = datetime.datetime(2020, 9, 11, 12, 0, 0)
+
+
+class AnalyticsTests(unittest.TestCase):
+
+    def _feed(self, config, gravity_at, hours, color="purple"):
+        # One reading every 10 minutes, gravity_at(hours since start)
+        analytics = FermentationAnalytics(config)
+        tilt_status = None
+        for step in range(int(hours * 6) + 1):
+            hour = step / 6
+            reading = TiltStatus(color, 68, gravity_at(hour), config, timestamp=START + datetime.timedelta(hours=hour))
+            tilt_status = analytics.apply(reading)
+        return tilt_status
+
+    def test_trend_slope(self):
+        trend = GravityTrend(window_seconds=86400, sample_seconds=0)
+        for hour in range(13):
+            trend.add(hour * 3600, 1.060 - 0.010 * hour / 24)
+        slope, gravity = trend.line()
+        self.assertAlmostEqual(slope, -0.010)
+        self.assertAlmostEqual(gravity, 1.055)
+
+    def test_window_drops_old_samples(self):
+        trend = GravityTrend(window_seconds=6 * 3600, sample_seconds=0)
+        for hour in range(24):
+            # Fast at first, then flat
+            trend.add(hour * 3600, 1.050 if hour >= 12 else 1.060 - hour * 0.001)
+        slope, _ = trend.line()
+        self.assertAlmostEqual(slope, 0)
+
+    def test_not_enough_history(self):
+        tilt_status = self._feed(PitchConfig({}), lambda hour: 1.050, hours=2)
+        self.assertIsNone(tilt_status.gravity_velocity)
+        self.assertIsNone(tilt_status.fermentation_state)
+
+    def test_fermenting_with_eta(self):
+        config = PitchConfig({'purple_final_gravity': 1.010})
+        # 10 points a day from 1.060
+        tilt_status = self._feed(config, lambda hour: 1.060 - 0.010 * hour / 24, hours=12)
+        self.assertAlmostEqual(tilt_status.gravity_velocity, -10, places=1)
+        self.assertEqual(tilt_status.fermentation_state, STATE_FERMENTING)
+        # 1.055 now, 4.5 more days to 1.010
+        expected_eta = START + datetime.timedelta(hours=12, days=4.5)
+        self.assertLess(abs((tilt_status.fermentation_eta - expected_eta).total_seconds()), 3600)
+        self.assertIn('"fermentation_state": "fermenting"', tilt_status.json())
+
+    def test_stalled_and_stable(self):
+        flat = self._feed(PitchConfig({'purple_final_gravity': 1.010}), lambda hour: 1.030, hours=8)
+        self.assertEqual(flat.fermentation_state, STATE_STALLED)
+        self.assertIsNone(flat.fermentation_eta)
+        flat = self._feed(PitchConfig({}), lambda hour: 1.030, hours=8)
+        self.assertEqual(flat.fermentation_state, STATE_STABLE)
+
+    def test_finished(self):
+        tilt_status = self._feed(PitchConfig({'purple_final_gravity': 1.010}), lambda hour: 1.011, hours=8)
+        self.assertEqual(tilt_status.fermentation_state, STATE_FINISHED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+import unittest
+from azure.iot.device import MQTTError
+from pitch.configuration import PitchConfig
+from pitch.dispatcher import Dispatcher
+from pitch.models import TiltStatus
+from pitch.providers import AzureIoTHubCloudProvider
+from pitch.runtime import AsyncRuntime
+
+
+class FakeIoTHub:
+    """
+    Local stand-in for IoT Hub, hands out sessions that record messages and can drop the connection.
+    """
+    def __init__(self, fail_sends: int = 0, send_seconds: float = 0):
+        self.messages = []
+        self.sessions = 0
+        self.closed = 0
+        self.fail_sends = fail_sends
+        self.send_seconds = send_seconds
+
+    def session_factory(self, connection_string):
+        return FakeSession(self)
+
+
+class FakeSession:
+    def __init__(self, hub: FakeIoTHub):
+        self.hub = hub
+
+    async def __aenter__(self):
+        self.hub.sessions += 1
+        return self
+
+    async def __aexit__(self, *args):
+        self.hub.closed += 1
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.hub.send_seconds)
+        if self.hub.fail_sends > 0:
+            self.hub.fail_sends -= 1
+            raise MQTTError(rc=7)
+        self.hub.messages.append(message)
+
+
+class AzureIoTHubTests(unittest.TestCase):
+
+    def _config(self, **kwargs):
+        data = {
+            'azure_iot_hub_connectionstring': 'HostName=localhost;DeviceId=test;SharedAccessKey=abc',
+            'azure_iot_hub_reconnect_min_seconds': 0.01,
+            'azure_iot_hub_reconnect_max_seconds': 0.01,
+        }
+        data.update(kwargs)
+        return PitchConfig(data)
+
+    def _send_all(self, provider, hub, statuses, expected_messages):
+        async def run():
+            for tilt_status in statuses:
+                await provider.update_async(tilt_status)
+            for _ in range(200):
+                if len(hub.messages) >= expected_messages and not provider.buffer:
+                    break
+                await asyncio.sleep(0.01)
+            provider._session_task.cancel()
+        asyncio.run(run())
+
+    def test_session_is_reused(self):
+        hub = FakeIoTHub()
+        config = self._config()
+        provider = AzureIoTHubCloudProvider(config, session_factory=hub.session_factory)
+        statuses = [TiltStatus(color, 70, 1.050, config) for color in ["red", "blue", "green"]]
+        self._send_all(provider, hub, statuses, 3)
+        self.assertEqual(len(hub.messages), 3)
+        self.assertEqual(hub.sessions, 1)
+
+    def test_reconnects_without_losing_readings(self):
+        hub = FakeIoTHub(fail_sends=2)
+        config = self._config()
+        provider = AzureIoTHubCloudProvider(config, session_factory=hub.session_factory)
+        self._send_all(provider, hub, [TiltStatus("red", 70, 1.050, config)], 1)
+        self.assertEqual(len(hub.messages), 1)
+        self.assertEqual(hub.sessions, 3)
+
+    def test_batches_readings(self):
+        hub = FakeIoTHub(fail_sends=1)
+        config = self._config(azure_iot_hub_batch_size=3)
+        provider = AzureIoTHubCloudProvider(config, session_factory=hub.session_factory)
+        statuses = [TiltStatus(color, 70, 1.050, config) for color in ["red", "blue", "green"]]
+        self._send_all(provider, hub, statuses, 1)
+        colors = [reading['color'] for reading in json.loads(hub.messages[0])]
+        self.assertEqual(colors, ["red", "blue", "green"])
+
+    def test_batch_lingers_for_more_readings(self):
+        hub = FakeIoTHub()
+        config = self._config(azure_iot_hub_batch_size=3, azure_iot_hub_batch_linger_seconds=0.5)
+        provider = AzureIoTHubCloudProvider(config, session_factory=hub.session_factory)
+
+        async def run():
+            for color in ["red", "blue", "green"]:
+                await provider.update_async(TiltStatus(color, 70, 1.050, config))
+                await asyncio.sleep(0.05)
+            for _ in range(200):
+                if hub.messages:
+                    break
+                await asyncio.sleep(0.01)
+            provider._session_task.cancel()
+        asyncio.run(run())
+        self.assertEqual(len(hub.messages), 1)
+        self.assertEqual(len(json.loads(hub.messages[0])), 3)
+
+    def test_stop_flushes_buffer_and_closes_session(self):
+        hub = FakeIoTHub(send_seconds=0.02)
+        config = self._config(azure_iot_hub_aggregate=False, azure_iot_hub_limit_rate=100, azure_iot_hub_limit_period=1)
+        provider = AzureIoTHubCloudProvider(config, session_factory=hub.session_factory)
+        runtime = AsyncRuntime()
+        runtime.start()
+        dispatcher = Dispatcher([provider], config, console_log=False, runtime=runtime)
+        dispatcher.start()
+        for color in ["red", "blue", "green", "black", "pink"]:
+            dispatcher.submit(TiltStatus(color, 70, 1.050, config))
+        time.sleep(0.01)
+        dispatcher.stop()
+        runtime.stop()
+        self.assertEqual(len(hub.messages), 5)
+        self.assertEqual(hub.closed, 1)
+
+    def test_update_uses_one_session(self):
+        hub = FakeIoTHub()
+        config = self._config()
+        provider = AzureIoTHubCloudProvider(config, session_factory=hub.session_factory)
+        for color in ["red", "blue", "green"]:
+            provider.update(TiltStatus(color, 70, 1.050, config))
+        provider.stop()
+        self.assertEqual(len(hub.messages), 3)
+        self.assertEqual(hub.sessions, 1)
+        self.assertEqual(hub.closed, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import threading
+import unittest
+from pitch.abstractions import CloudProviderBase
+from pitch.configuration import PitchConfig
+from pitch.dispatcher import Dispatcher, ProviderInbox, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_COALESCE, \
+    OVERFLOW_BLOCK
+from pitch.models import TiltStatus
+from pitch.runtime import AsyncRuntime
+
+
+class BlockingProvider(CloudProviderBase):
+    config_key = 'blocking'
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def update(self, tilt_status: TiltStatus):
+        self.release.wait(5)
+
+
+class RecordingProvider(CloudProviderBase):
+    config_key = 'recording'
+
+    def __init__(self):
+        self.received = threading.Event()
+
+    def update(self, tilt_status: TiltStatus):
+        self.received.set()
+
+
+class AsyncRecordingProvider(CloudProviderBase):
+    config_key = 'async_recording'
+
+    def __init__(self):
+        self.received = threading.Event()
+        self.thread_name = None
+
+    async def update_async(self, tilt_status: TiltStatus):
+        self.thread_name = threading.current_thread().name
+        self.received.set()
+
+
+class DispatcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = PitchConfig({})
+
+    def _status(self, color, gravity=1.050):
+        return TiltStatus(color, 70, gravity, self.config)
+
+    def test_drop_oldest(self):
+        inbox = ProviderInbox(2, OVERFLOW_DROP_OLDEST)
+        inbox.put(self._status("red", 1.050))
+        inbox.put(self._status("red", 1.049))
+        self.assertFalse(inbox.put(self._status("red", 1.048)))
+        self.assertEqual(inbox.get(0).gravity, 1.049)
+
+    def test_drop_newest(self):
+        inbox = ProviderInbox(1, OVERFLOW_DROP_NEWEST)
+        inbox.put(self._status("red", 1.050))
+        self.assertFalse(inbox.put(self._status("red", 1.049)))
+        self.assertEqual(inbox.get(0).gravity, 1.050)
+
+    def test_coalesce_keeps_latest_per_color(self):
+        inbox = ProviderInbox(5, OVERFLOW_COALESCE)
+        inbox.put(self._status("red", 1.050))
+        inbox.put(self._status("blue", 1.040))
+        self.assertTrue(inbox.put(self._status("red", 1.049)))
+        self.assertEqual(inbox.qsize(), 2)
+        self.assertEqual(inbox.get(0).gravity, 1.049)
+        self.assertEqual(inbox.get(0).color, "blue")
+
+    def test_block_waits_for_room(self):
+        inbox = ProviderInbox(1, OVERFLOW_BLOCK)
+        inbox.put(self._status("red", 1.050))
+        put = threading.Thread(target=inbox.put, args=(self._status("red", 1.049),))
+        put.start()
+        put.join(0.1)
+        self.assertTrue(put.is_alive(), msg="Expected put to wait while the inbox is full")
+        self.assertEqual(inbox.get(0).gravity, 1.050)
+        put.join(5)
+        self.assertEqual(inbox.get(0).gravity, 1.049)
+
+    def test_slow_provider_does_not_block_others(self):
+        slow = BlockingProvider()
+        fast = RecordingProvider()
+        dispatcher = Dispatcher([slow, fast], self.config, console_log=False)
+        dispatcher.start()
+        try:
+            dispatcher.submit(self._status("red"))
+            self.assertTrue(fast.received.wait(2), msg="Fast provider was held up by the slow one")
+        finally:
+            slow.release.set()
+            dispatcher.stop()
+
+    def test_per_provider_config(self):
+        config = PitchConfig({'recording_queue_size': 1, 'recording_overflow_policy': OVERFLOW_COALESCE})
+        dispatcher = Dispatcher([RecordingProvider(), BlockingProvider()], config, console_log=False)
+        recording, blocking = dispatcher.workers
+        self.assertEqual(recording.inbox.maxsize, 1)
+        self.assertEqual(recording.inbox.overflow_policy, OVERFLOW_COALESCE)
+        self.assertEqual(blocking.inbox.maxsize, config.provider_queue_size)
+
+    def test_async_provider_runs_on_shared_loop(self):
+        runtime = AsyncRuntime()
+        runtime.start()
+        provider = AsyncRecordingProvider()
+        dispatcher = Dispatcher([provider, RecordingProvider()], self.config, console_log=False, runtime=runtime)
+        dispatcher.start()
+        try:
+            dispatcher.submit(self._status("red"))
+            self.assertTrue(provider.received.wait(2))
+            self.assertEqual(provider.thread_name, 'pitch-asyncio')
+            self.assertFalse(dispatcher.workers[1].provider.supports_async())
+        finally:
+            dispatcher.stop()
+            runtime.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
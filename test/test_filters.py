@@ -0,0 +1,77 @@
+import unittest
+from pitch.configuration import PitchConfig
+from pitch.dispatcher import ProviderInbox, ProviderWorker, VALUES_RAW, VALUES_SMOOTHED
+from pitch.filters import ExponentialFilter, KalmanFilter, MedianFilter, MovingAverageFilter, ReadingSmoother
+from pitch.models import TiltStatus
+
+
+class FilterTests(unittest.TestCase):
+
+    def test_moving_average(self):
+        moving_average = MovingAverageFilter(3)
+        results = [moving_average.update(value) for value in [3, 6, 9, 12]]
+        self.assertEqual(results, [3, 4.5, 6, 9])
+
+    def test_exponential(self):
+        exponential = ExponentialFilter(0.5)
+        results = [exponential.update(value) for value in [10, 20, 20]]
+        self.assertEqual(results, [10, 15, 17.5])
+
+    def test_median_ignores_spike(self):
+        median = MedianFilter(3)
+        results = [median.update(value) for value in [1.050, 1.051, 1.200, 1.050, 1.049]]
+        self.assertEqual(results, [1.050, 1.0505, 1.051, 1.051, 1.050])
+
+    def test_kalman_converges(self):
+        kalman = KalmanFilter(0.01, 1)
+        self.assertEqual(kalman.update(1.050), 1.050)
+        for _ in range(100):
+            value = kalman.update(1.040)
+        self.assertAlmostEqual(value, 1.040, places=3)
+        # A single outlier only moves it a little
+        self.assertLess(kalman.update(1.140), 1.060)
+
+
+class ReadingSmootherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = PitchConfig({'filter_type': 'moving_average', 'filter_window': 2, 'red_filter_type': 'none',
+                                   'purple_original_gravity': 1.060})
+
+    def test_smoothed_values(self):
+        smoother = ReadingSmoother(self.config)
+        smoother.apply(TiltStatus("purple", 70, 1.050, self.config))
+        raw = TiltStatus("purple", 72, 1.040, self.config)
+        smoothed = smoother.apply(raw)
+        self.assertEqual(smoothed.gravity, 1.045)
+        self.assertEqual(smoothed.temp_fahrenheit, 71)
+        self.assertEqual(smoothed.alcohol_by_volume, TiltStatus.get_alcohol_by_volume(1.060, 1.045))
+        self.assertIs(smoothed.raw, raw)
+        self.assertIs(raw.raw, raw)
+        self.assertNotIn('_raw', smoothed.json())
+
+    def test_filter_per_color(self):
+        smoother = ReadingSmoother(self.config)
+        raw = TiltStatus("red", 70, 1.050, self.config)
+        self.assertIs(smoother.apply(raw), raw)
+
+    def test_unknown_filter_type(self):
+        with self.assertRaises(ValueError):
+            ReadingSmoother(PitchConfig({'filter_type': 'average'}))
+        with self.assertRaises(ValueError):
+            ReadingSmoother(PitchConfig({'purple_filter_type': 'kalmann'}))
+
+    def test_provider_values(self):
+        smoother = ReadingSmoother(self.config)
+        smoother.apply(TiltStatus("purple", 70, 1.050, self.config))
+        smoothed = smoother.apply(TiltStatus("purple", 72, 1.040, self.config))
+        raw_worker = ProviderWorker(None, 'raw', ProviderInbox(), values=VALUES_RAW)
+        smoothed_worker = ProviderWorker(None, 'smoothed', ProviderInbox(), values=VALUES_SMOOTHED)
+        raw_worker.submit(smoothed)
+        smoothed_worker.submit(smoothed)
+        self.assertEqual(raw_worker.inbox.get(0).gravity, 1.040)
+        self.assertEqual(smoothed_worker.inbox.get(0).gravity, 1.045)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from urllib.request import urlopen
+from urllib.error import HTTPError
+from pitch.configuration import PitchConfig
+from pitch.providers import HistoryApiCloudProvider
+from pitch.storage import HistoryReader, sqlite_schema
+
+
+class HistoryApiTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'pitch.db')
+        conn = sqlite3.connect(self.db_path)
+        sqlite_schema.migrate(conn)
+        # Two days of readings, one a minute
+        conn.executemany('INSERT INTO fermentation_readings (timestamp, color, name, brew_id, temp_f, gravity) '
+                         'VALUES (?, ?, ?, ?, ?, ?)',
+                         [(t, 'red', 'IPA', 'ipa-1', 68, 1.050 - t / 10000000) for t in range(0, 2 * 86400, 60)])
+        conn.commit()
+        conn.close()
+        self.reader = HistoryReader(self.db_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_downsamples_to_points(self):
+        rows = list(self.reader.query('red', 0, 2 * 86400, points=48))
+        self.assertEqual(len(rows), 48)
+        self.assertEqual(rows[0]['count'], 60)
+        self.assertEqual(sum(row['count'] for row in rows), 2 * 1440)
+
+    def test_short_window_uses_raw_readings(self):
+        rows = list(self.reader.query('red', 0, 600, points=100))
+        self.assertEqual([row['timestamp'] for row in rows], list(range(0, 600, 60)))
+
+    def test_http_api(self):
+        config = PitchConfig({'sqlite_db_path': self.db_path, 'history_api_port': 0})
+        provider = HistoryApiCloudProvider(config)
+        provider.start()
+        try:
+            base = "http://127.0.0.1:{}/readings".format(provider.server.server_port)
+            with urlopen(base + "?color=red&start=0&end=86400&points=24") as response:
+                rows = [json.loads(line) for line in response]
+            self.assertEqual(len(rows), 24)
+            with urlopen(base + "?color=red&start=0&end=86400&points=24&format=csv") as response:
+                lines = response.read().decode().splitlines()
+            self.assertEqual(lines[0].split(',')[:3], ['timestamp', 'color', 'count'])
+            self.assertEqual(len(lines), 25)
+            with self.assertRaises(HTTPError):
+                urlopen(base + "?start=0")
+        finally:
+            provider.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
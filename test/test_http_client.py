@@ -0,0 +1,68 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from prometheus_client import REGISTRY
+from pitch.configuration import PitchConfig
+from pitch.http_client import HttpClient
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.clients.add(self.client_address)
+        self.server.requests += 1
+        status = 503 if self.server.failures > 0 else 200
+        self.server.failures -= 1
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.clients = set()
+        self.server.requests = 0
+        self.server.failures = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_port)
+        self.client = HttpClient(PitchConfig({'http_retry_backoff_seconds': 0.01}))
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_reused(self):
+        for _ in range(3):
+            self.client.post(self.url, 'test', data='{}').raise_for_status()
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(len(self.server.clients), 1, msg="Expected one kept-alive connection")
+
+    def test_retries_server_errors(self):
+        self.server.failures = 2
+        response = self.client.post(self.url, 'test', data='{}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_gives_up_after_retries(self):
+        self.server.failures = 5
+        response = self.client.post(self.url, 'test', data='{}')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_duration_includes_retries(self):
+        self.server.failures = 2
+        self.client.post(self.url, 'retried', data='{}')
+        # One observation for the whole call, not one per attempt
+        self.assertEqual(REGISTRY.get_sample_value('pitch_http_request_seconds_count', {'provider': 'retried'}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
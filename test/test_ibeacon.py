@@ -0,0 +1,72 @@
+import struct
+import unittest
+import uuid
+from pitch.ibeacon import IBeaconParser, BeaconDeduplicator
+
+TILT_UUIDS = {
+    "a495bb10-c5b1-4b44-b512-1370f02d74de": "red",
+    "a495bb40-c5b1-4b44-b512-1370f02d74de": "purple",
+}
+
+
+def _ibeacon(uuid_str, major, minor):
+    return b'\x02\x15' + uuid.UUID(uuid_str).bytes + struct.pack('>HHb', major, minor, -59)
+
+
+class IBeaconParserTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = IBeaconParser(TILT_UUIDS)
+
+    def test_tilt_beacon(self):
+        reading = self.parser.parse({0x004C: _ibeacon("a495bb40-c5b1-4b44-b512-1370f02d74de", 68, 1050)})
+        self.assertEqual(reading, ("purple", 68, 1050))
+        self.assertEqual(self.parser.accepted, 1)
+
+    def test_tilt_pro_beacon(self):
+        reading = self.parser.parse({0x004C: _ibeacon("a495bb10-c5b1-4b44-b512-1370f02d74de", 680, 10500)})
+        self.assertEqual(reading, ("red", 680, 10500))
+
+    def test_rejects_other_packets(self):
+        packets = [
+            None,
+            {},
+            {0x0006: b'\x01\x09\x20\x02'},  # not Apple
+            {0x004C: b'\x10\x05\x01\x18'},  # Apple, but not an iBeacon
+            {0x004C: _ibeacon("a495bb40-c5b1-4b44-b512-1370f02d74de", 68, 1050)[:20]},  # truncated
+            {0x004C: _ibeacon("f7826da6-4fa2-4e98-8024-bc5b71e0893e", 68, 1050)},  # other iBeacon
+            {0x004C: _ibeacon("a495bb90-c5b1-4b44-b512-1370f02d74de", 68, 1050)},  # unknown Tilt color
+        ]
+        for packet in packets:
+            self.assertIsNone(self.parser.parse(packet))
+        self.assertEqual(self.parser.rejected, len(packets))
+        self.assertEqual(self.parser.accepted, 0)
+
+
+class BeaconDeduplicatorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.dedup = BeaconDeduplicator(10, clock=lambda: self.now)
+
+    def test_repeat_is_dropped_until_heartbeat(self):
+        self.assertFalse(self.dedup.is_duplicate("purple", 68, 1050))
+        self.now = 9
+        self.assertTrue(self.dedup.is_duplicate("purple", 68, 1050))
+        self.now = 10
+        self.assertFalse(self.dedup.is_duplicate("purple", 68, 1050))
+        self.assertEqual(self.dedup.duplicates, 1)
+
+    def test_change_gets_through(self):
+        self.assertFalse(self.dedup.is_duplicate("purple", 68, 1050))
+        self.assertFalse(self.dedup.is_duplicate("purple", 68, 1049))
+        self.assertFalse(self.dedup.is_duplicate("red", 68, 1049))
+
+    def test_disabled(self):
+        dedup = BeaconDeduplicator(0)
+        self.assertFalse(dedup.is_duplicate("purple", 68, 1050))
+        self.assertFalse(dedup.is_duplicate("purple", 68, 1050))
+
+
+if __name__ == '__main__':
+    unittest.main()
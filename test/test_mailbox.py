@@ -0,0 +1,66 @@
+import queue
+import threading
+import unittest
+from pitch.configuration import PitchConfig
+from pitch.mailbox import ColorMailbox
+from pitch.models import TiltStatus
+
+
+class ColorMailboxTests(unittest.TestCase):
+
+    def setUp(self):
+        self.config = PitchConfig({})
+
+    def _status(self, color, gravity=1.050):
+        return TiltStatus(color, 70, gravity, self.config)
+
+    def test_newer_reading_replaces_pending(self):
+        mailbox = ColorMailbox(3)
+        mailbox.put_nowait(self._status("red", 1.050))
+        mailbox.put_nowait(self._status("red", 1.049))
+        self.assertEqual(mailbox.qsize(), 1)
+        self.assertEqual(mailbox.superseded, 1)
+        self.assertEqual(mailbox.get_nowait().gravity, 1.049)
+
+    def test_colors_keep_arrival_order(self):
+        mailbox = ColorMailbox(3)
+        mailbox.put_nowait(self._status("red"))
+        mailbox.put_nowait(self._status("blue"))
+        mailbox.put_nowait(self._status("red", 1.049))
+        self.assertEqual(mailbox.get_nowait().color, "red")
+        self.assertEqual(mailbox.get_nowait().color, "blue")
+
+    def test_full_only_rejects_new_colors(self):
+        mailbox = ColorMailbox(1)
+        mailbox.put_nowait(self._status("red"))
+        self.assertTrue(mailbox.full())
+        mailbox.put_nowait(self._status("red", 1.049))
+        with self.assertRaises(queue.Full):
+            mailbox.put_nowait(self._status("blue"))
+
+    def test_unlimited_takes_every_color(self):
+        mailbox = ColorMailbox()
+        for color in ["red", "green", "black", "purple", "orange", "blue", "yellow", "pink", "simulated"]:
+            mailbox.put_nowait(self._status(color))
+        self.assertFalse(mailbox.full())
+        self.assertEqual(mailbox.qsize(), 9)
+        self.assertEqual(mailbox.rejected, 0)
+
+    def test_get_times_out_when_empty(self):
+        with self.assertRaises(queue.Empty):
+            ColorMailbox(1).get(timeout=0.01)
+
+    def test_close_wakes_waiting_get(self):
+        mailbox = ColorMailbox(1)
+        threading.Timer(0.05, mailbox.close).start()
+        with self.assertRaises(queue.Empty):
+            mailbox.get(timeout=5)
+
+    def test_get_wakes_on_arrival(self):
+        mailbox = ColorMailbox(1)
+        threading.Timer(0.05, mailbox.put_nowait, args=(self._status("red"),)).start()
+        self.assertEqual(mailbox.get(timeout=5).color, "red")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pitch.configuration import PitchConfig
+from pitch.http_client import HttpClient
+from pitch.outbox import Outbox
+from pitch.rate_limiter import DeviceRateLimiter, RateLimitedException
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status = 503 if self.server.down else 200
+        if not self.server.down:
+            self.server.bodies.append(body.decode())
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        self.server.requests += 1
+
+    def log_message(self, *args):
+        pass
+
+
+class OutboxTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.bodies = list()
+        self.server.down = True
+        self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_port)
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = PitchConfig({
+            'http_retries': 0,
+            'outbox_db_path': os.path.join(self.directory.name, 'outbox.db'),
+            'outbox_max_rows': 3,
+            # Long enough that nothing is replayed while a test is still posting
+            'outbox_retry_min_seconds': 0.5,
+            'outbox_retry_max_seconds': 0.5,
+        })
+        self.client = HttpClient(self.config)
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def _create_outbox(self, coalesce=False, rate=100):
+        outbox = Outbox(self.config, 'test', self.client, DeviceRateLimiter(rate=rate, period=1), coalesce=coalesce)
+        outbox.start()
+        self.addCleanup(outbox.stop)
+        return outbox
+
+    def _wait_for_replay(self, outbox):
+        deadline = time.time() + 5
+        while outbox.pending and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(outbox.pending, 0)
+
+    def test_replays_in_order_when_endpoint_is_back(self):
+        outbox = self._create_outbox()
+        self.assertIsNone(outbox.post('red', self.url, data='1'))
+        self.server.down = False
+        outbox.post('red', self.url, data='2')
+        self._wait_for_replay(outbox)
+        self.assertEqual(self.server.bodies, ['1', '2'])
+        self.assertEqual(outbox.post('red', self.url, data='3').status_code, 200)
+
+    def test_coalesce_keeps_latest_per_color(self):
+        outbox = self._create_outbox(coalesce=True)
+        for body in ['red 1', 'blue 1', 'red 2']:
+            outbox.post(body.split()[0], self.url, data=body)
+        self.assertEqual(outbox.pending, 2)
+        self.server.down = False
+        self._wait_for_replay(outbox)
+        # red 1 may already have been on its way when red 2 replaced it, but never after it
+        self.assertEqual(self.server.bodies[-2:], ['blue 1', 'red 2'])
+
+    def test_oldest_dropped_when_full(self):
+        outbox = self._create_outbox()
+        outbox.post('red', self.url, data='1')
+        # The first replay fails right away, wait for it so it isn't still on its way when the endpoint is back
+        deadline = time.time() + 5
+        while self.server.requests < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        for body in ['2', '3', '4', '5']:
+            outbox.post('red', self.url, data=body)
+        self.assertEqual(outbox.pending, 3)
+        self.assertEqual(outbox.dropped, 2)
+        self.server.down = False
+        self._wait_for_replay(outbox)
+        self.assertEqual(self.server.bodies, ['3', '4', '5'])
+
+    def test_survives_restart(self):
+        outbox = self._create_outbox()
+        outbox.post('red', self.url, data='1')
+        outbox.stop()
+        self.server.down = False
+        restarted = self._create_outbox()
+        self._wait_for_replay(restarted)
+        self.assertEqual(self.server.bodies, ['1'])
+
+    def test_file_shrinks_once_drained(self):
+        def size():
+            # Most of it is still in the write-ahead log until a checkpoint
+            return sum(os.path.getsize(path) for path in (outbox.db_path, outbox.db_path + '-wal')
+                       if os.path.exists(path))
+        outbox = self._create_outbox()
+        for body in ['1', '2', '3']:
+            outbox.post('red', self.url, data=body * 200000)
+        full_size = size()
+        self.server.down = False
+        self._wait_for_replay(outbox)
+        deadline = time.time() + 5
+        while size() >= full_size / 10 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertLess(size(), full_size / 10)
+
+    def test_replays_and_posts_share_rate_limit(self):
+        outbox = self._create_outbox(coalesce=True, rate=1)
+        self.assertIsNone(outbox.post('red', self.url, data='1'))
+        self.server.down = False
+        # Newer posts replace the waiting one without using up the rate limit
+        self.assertIsNone(outbox.post('red', self.url, data='2'))
+        self._wait_for_replay(outbox)
+        self.assertEqual(self.server.bodies, ['2'])
+        # The replay just used this second's post
+        with self.assertRaises(RateLimitedException):
+            outbox.post('red', self.url, data='3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import asyncio
+import socket
+import unittest
+from pitch.models import TiltReading
+from pitch.receivers import ReadingForwarder, ReadingMerger, decode_reading, encode_reading, listen_for_receivers
+
+
+def _reading(rssi, receiver="rx1", color="purple", minor=1050):
+    return TiltReading(color=color, major=68, minor=minor, rssi=rssi, receiver=receiver)
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ReceiverTests(unittest.TestCase):
+
+    def test_encode_decode(self):
+        for reading in [_reading(-67), _reading(None, receiver="cellar-pi")]:
+            self.assertEqual(decode_reading(encode_reading(reading)), reading)
+        self.assertEqual(decode_reading(encode_reading(_reading(-67)), '10.0.0.5').receiver, '10.0.0.5/rx1')
+
+    def test_decode_rejects_other_datagrams(self):
+        self.assertIsNone(decode_reading(b''))
+        self.assertIsNone(decode_reading(b'hello world, not a reading'))
+
+    def test_merger_keeps_strongest(self):
+        emitted = []
+
+        async def run():
+            merger = ReadingMerger(0.05, emitted.append)
+            merger.add(_reading(-80, "rx1"))
+            merger.add(_reading(-60, "rx2"))
+            merger.add(_reading(-70, "rx3"))
+            merger.add(_reading(-90, "rx1", color="red"))
+            await asyncio.sleep(0.1)
+            return merger
+
+        merger = asyncio.run(run())
+        self.assertEqual([(r.color, r.receiver) for r in emitted], [("purple", "rx2"), ("red", "rx1")])
+        self.assertEqual(merger.merged, 2)
+
+    def test_merger_without_window(self):
+        emitted = []
+        merger = ReadingMerger(0, emitted.append)
+        merger.add(_reading(-80))
+        merger.add(_reading(-60))
+        self.assertEqual(len(emitted), 2)
+
+    def test_remote_receivers(self):
+        # Two simulated receivers hear the same broadcast, the hub keeps the strongest copy
+        port = _free_port()
+        emitted = []
+
+        async def run():
+            merger = ReadingMerger(0.1, emitted.append)
+            listener = await listen_for_receivers(port, merger.add, {"purple"})
+            forwarders = [ReadingForwarder('127.0.0.1', port) for _ in range(2)]
+            try:
+                forwarders[0].send(_reading(-85, "rx1"))
+                forwarders[1].send(_reading(-55, "rx2"))
+                forwarders[1].send(_reading(-55, "rx2", color="not-a-tilt"))
+                await asyncio.sleep(0.3)
+            finally:
+                listener.close()
+                for forwarder in forwarders:
+                    forwarder.close()
+
+        asyncio.run(run())
+        self.assertEqual(len(emitted), 1)
+        self.assertEqual(emitted[0].rssi, -55)
+        self.assertEqual(emitted[0].receiver, "127.0.0.1/rx2")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pitch.configuration import PitchConfig
+from pitch.dispatcher import Dispatcher, OVERFLOW_BLOCK
+from pitch.models import TiltStatus
+from pitch.providers import SqliteCloudProvider, WebhookCloudProvider
+from pitch.rate_limiter import DeviceRateLimiter, RateLimitedException
+from pitch.replay import Replayer
+from pitch.storage import SegmentLogWriter, sqlite_schema
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class ReplayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = PitchConfig({})
+        self.start = datetime.datetime(2020, 9, 11, 2, 15)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _readings(self, count, seconds_apart=60):
+        return [TiltStatus("purple", 70, 1.050 - i % 40 / 1000, self.config,
+                           timestamp=self.start + datetime.timedelta(seconds=i * seconds_apart))
+                for i in range(count)]
+
+    def _write_log(self, readings):
+        path = os.path.join(self.directory.name, 'pitch_log.json')
+        writer = SegmentLogWriter(path, log_format='binary')
+        writer.open()
+        for reading in readings:
+            writer.write(reading)
+        writer.close()
+        return path
+
+    def test_replays_log_in_order(self):
+        readings = self._readings(5)
+        records = list()
+        replayer = Replayer(self._write_log(readings))
+        replayer.run(records.append)
+        self.assertEqual(replayer.replayed, 5)
+        self.assertEqual([r.gravity for r in records], [round(r.gravity, 4) for r in readings])
+
+    def test_replays_sqlite(self):
+        path = os.path.join(self.directory.name, 'pitch.db')
+        conn = sqlite3.connect(path)
+        with conn:
+            sqlite_schema.migrate(conn)
+            for reading in reversed(self._readings(3)):
+                conn.execute('INSERT INTO fermentation_readings (timestamp, color, temp_f, gravity) VALUES (?, ?, ?, ?)',
+                             (int(reading.timestamp.timestamp()), reading.color, reading.temp_fahrenheit, reading.gravity))
+        conn.close()
+        records = list()
+        Replayer(path).run(records.append)
+        self.assertEqual([r.timestamp for r in records], [r.timestamp for r in self._readings(3)])
+
+    def test_speed(self):
+        records = list()
+        # 2 recorded minutes at 1200x is 0.1 seconds
+        replayer = Replayer(self._write_log(self._readings(3)), speed=1200)
+        replayer.run(records.append)
+        self.assertEqual(len(records), 3)
+        self.assertGreaterEqual(replayer.elapsed_seconds, 0.1)
+
+    def test_rate_limiter_follows_recorded_time(self):
+        limiter = DeviceRateLimiter(rate=1, period=60)
+        approved = list()
+
+        def on_reading(record):
+            try:
+                limiter.approve(record.color, record.timestamp.timestamp())
+                approved.append(True)
+            except RateLimitedException:
+                approved.append(False)
+
+        Replayer(self._write_log(self._readings(4, seconds_apart=30))).run(on_reading)
+        self.assertEqual(approved, [True, True, False, True])
+
+    def _replay_into_sqlite(self, log_path, **config):
+        db_path = os.path.join(self.directory.name, 'replayed_{}.db'.format(len(os.listdir(self.directory.name))))
+        config = PitchConfig(dict(config, sqlite_db_path=db_path, provider_overflow_policy=OVERFLOW_BLOCK))
+        provider = SqliteCloudProvider(config)
+        provider.start()
+        dispatcher = Dispatcher([provider], config, console_log=False)
+        dispatcher.start()
+        Replayer(log_path).run(lambda record: dispatcher.submit(TiltStatus.recorded(
+            record.color, record.temp_fahrenheit, record.gravity, config, record.timestamp)))
+        dispatcher.stop()
+        conn = sqlite3.connect(db_path)
+        try:
+            return conn.execute('SELECT count(*) FROM fermentation_readings').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_rows_written_dont_depend_on_queue_size(self):
+        # SQLite keeps one reading a minute, every other one of these plus the first two
+        log_path = self._write_log(self._readings(5000, seconds_apart=30))
+        self.assertEqual(self._replay_into_sqlite(log_path), 2501)
+        self.assertEqual(self._replay_into_sqlite(log_path, provider_queue_size=1), 2501)
+
+    def test_remote_providers_limited_by_real_time(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        config = PitchConfig({'outbox_enabled': False, 'webhook_limit_rate': 1, 'webhook_limit_period': 60})
+        provider = WebhookCloudProvider("http://127.0.0.1:{}/".format(server.server_port), config)
+        # Recorded an hour apart, but sent a moment apart
+        readings = self._readings(3, seconds_apart=3600)
+        provider.update(readings[0])
+        provider.update(readings[1])
+        with self.assertRaises(RateLimitedException):
+            provider.update(readings[2])
+
+    def test_recorded_reading_keeps_calibrated_values(self):
+        config = PitchConfig({'purple_gravity_offset': 0.002, 'purple_temp_offset': 1})
+        tilt_status = TiltStatus.recorded("purple", 71, 1.052, config, self.start)
+        self.assertEqual(tilt_status.gravity, 1.052)
+        self.assertEqual(tilt_status.temp_fahrenheit, 71)
+        self.assertEqual(tilt_status.timestamp, self.start)
+
+
+if __name__ == '__main__':
+    unittest.main()
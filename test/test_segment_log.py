@@ -0,0 +1,121 @@
+import datetime
+import gzip
+import os
+import tempfile
+import time
+import unittest
+from pitch.configuration import PitchConfig
+from pitch.models import TiltStatus, SignalStats
+from pitch.storage import SegmentLogWriter, read_log, segment_paths
+
+
+class SegmentLogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'pitch_log.json')
+        self.config = PitchConfig({})
+        self.start = datetime.datetime(2020, 9, 11, 2, 15)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _readings(self, count):
+        signal = SignalStats(rssi=-70, rssi_mean=-70.0, rssi_variance=0.0, packets_per_minute=60.0)
+        return [TiltStatus("purple", 70 + i % 3, 1.050 - i / 10000, self.config, signal=signal,
+                           timestamp=self.start + datetime.timedelta(minutes=i))
+                for i in range(count)]
+
+    def _write(self, readings, **kwargs):
+        writer = SegmentLogWriter(self.path, **kwargs)
+        writer.open()
+        for reading in readings:
+            writer.write(reading)
+        writer.close()
+        return writer
+
+    def test_binary_round_trip(self):
+        readings = self._readings(5)
+        self._write(readings, log_format='binary')
+        records = list(read_log(self.path))
+        self.assertEqual([r.timestamp for r in records], [r.timestamp for r in readings])
+        self.assertEqual([r.gravity for r in records], [r.gravity for r in readings])
+        self.assertEqual([r.temp_fahrenheit for r in records], [r.temp_fahrenheit for r in readings])
+        self.assertEqual(records[0].color, 'purple')
+        self.assertEqual(records[0].rssi, -70)
+
+    def test_binary_is_smaller_than_json(self):
+        readings = self._readings(100)
+        self._write(readings, log_format='json')
+        json_size = os.path.getsize(self.path)
+        os.remove(self.path)
+        self._write(readings, log_format='binary')
+        self.assertLess(os.path.getsize(self.path) * 10, json_size)
+
+    def test_rotated_segments_are_compressed_and_read_in_order(self):
+        readings = self._readings(50)
+        writer = self._write(readings, log_format='json', max_bytes=4096)
+        self.assertGreater(writer.rotations, 1)
+        segments = segment_paths(self.path)
+        self.assertTrue(all(s.endswith('.gz') for s in segments[:-1]))
+        with gzip.open(segments[0]) as file:
+            self.assertTrue(file.readline().startswith(b'{"timestamp"'))
+        self.assertEqual([r.timestamp for r in read_log(self.path)], [r.timestamp for r in readings])
+
+    def test_reads_time_range(self):
+        readings = self._readings(50)
+        self._write(readings, log_format='binary', max_bytes=256)
+        start, end = readings[10].timestamp, readings[20].timestamp
+        records = list(read_log(self.path, start=start, end=end))
+        self.assertEqual([r.timestamp for r in records], [r.timestamp for r in readings[10:21]])
+
+    def test_oldest_segments_are_removed(self):
+        self._write(self._readings(50), log_format='binary', max_bytes=256, max_segments=2)
+        self.assertEqual(len(segment_paths(self.path)), 3, msg="Two closed segments and the active file")
+
+    def test_only_own_segments_are_removed(self):
+        for name in ['pitch_log.json.1', 'pitch_log.json.backup']:
+            with open(os.path.join(self.directory.name, name), 'w') as file:
+                file.write('keep')
+        self._write(self._readings(50), log_format='binary', max_bytes=256, max_segments=2)
+        self.assertEqual(len(segment_paths(self.path)), 3)
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertTrue(os.path.exists(self.path + '.backup'))
+
+    def test_flushes_without_more_readings(self):
+        writer = SegmentLogWriter(self.path, log_format='json', flush_seconds=0.1)
+        writer.open()
+        self.addCleanup(writer.close)
+        writer.write(self._readings(1)[0])
+        # First write is within flush_seconds of opening, nothing is written yet
+        self.assertEqual(os.path.getsize(self.path), 0)
+        deadline = time.time() + 5
+        while not os.path.getsize(self.path) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(list(read_log(self.path))), 1)
+
+    def test_format_change_starts_new_segment(self):
+        readings = self._readings(4)
+        self._write(readings[:1], log_format='binary')
+        self._write(readings[1:2], log_format='json')
+        self._write(readings[2:], log_format='binary')
+        self.assertEqual(len(segment_paths(self.path)), 3)
+        self.assertEqual([r.timestamp for r in read_log(self.path)], [r.timestamp for r in readings])
+
+    def test_partly_written_record_is_cut_off(self):
+        readings = self._readings(3)
+        self._write(readings[:2], log_format='binary')
+        # Power cut halfway through the second record
+        os.truncate(self.path, os.path.getsize(self.path) - 5)
+        self._write(readings[2:], log_format='binary')
+        self.assertEqual([r.timestamp for r in read_log(self.path)], [readings[0].timestamp, readings[2].timestamp])
+
+    def test_appends_across_restarts(self):
+        readings = self._readings(4)
+        self._write(readings[:2], log_format='binary')
+        self._write(readings[2:], log_format='binary')
+        self.assertEqual(len(list(read_log(self.path))), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from pitch.configuration import PitchConfig
+from pitch.models import TiltStatus
+from pitch.signal_quality import SignalTracker
+
+
+class SignalTrackerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.tracker = SignalTracker(4, clock=lambda: self.now)
+
+    def _add(self, color, *rssi_values):
+        for rssi in rssi_values:
+            self.tracker.add(color, rssi)
+            self.now += 1
+
+    def test_unknown_color(self):
+        self.assertIsNone(self.tracker.get("purple"))
+
+    def test_stats(self):
+        self._add("purple", -70, -72, -74)
+        stats = self.tracker.get("purple")
+        self.assertEqual(stats.rssi, -74)
+        self.assertEqual(stats.rssi_mean, -72)
+        self.assertAlmostEqual(stats.rssi_variance, 8 / 3)
+        self.assertEqual(stats.packets_per_minute, 60)
+
+    def test_window_drops_oldest(self):
+        self._add("purple", -40, -70, -70, -70, -70)
+        stats = self.tracker.get("purple")
+        self.assertEqual(stats.rssi_mean, -70)
+        self.assertEqual(stats.rssi_variance, 0)
+
+    def test_no_rssi(self):
+        self._add("simulated", None, None)
+        stats = self.tracker.get("simulated")
+        self.assertIsNone(stats.rssi_mean)
+        self.assertEqual(stats.packets_per_minute, 60)
+
+    def test_tilt_status_includes_signal(self):
+        self._add("purple", -70, -72)
+        tilt_status = TiltStatus("purple", 70, 1.050, PitchConfig({}), self.tracker.get("purple"))
+        self.assertEqual(tilt_status.rssi, -72)
+        self.assertEqual(tilt_status.rssi_mean, -71)
+        self.assertIn('"rssi_variance": 1.0', tilt_status.json())
+
+
+if __name__ == '__main__':
+    unittest.main()
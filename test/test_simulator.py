@@ -0,0 +1,74 @@
+import asyncio
+import random
+import threading
+import unittest
+from pitch.configuration import PitchConfig
+from pitch.ibeacon import IBeaconParser
+from pitch.simulator import BeaconSimulator, TILT_COLORS
+
+COLORS_TO_UUID = {color: "a495bb{}0-c5b1-4b44-b512-1370f02d74de".format(index + 1) for index, color in enumerate(TILT_COLORS)}
+
+
+class SimulatorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = IBeaconParser({uuid: color for color, uuid in COLORS_TO_UUID.items()})
+        self.readings = list()
+
+    def _on_advertisement(self, advertisement):
+        self.readings.append(self.parser.parse(advertisement.manufacturer_data))
+
+    def _run(self, seconds=0.2, **settings):
+        config = PitchConfig(dict({'simulate_colors': 'all', 'simulate_rate_hz': 100}, **settings))
+        simulator = BeaconSimulator(config, COLORS_TO_UUID, self._on_advertisement, random.Random(1))
+        stop_event = threading.Event()
+        threading.Timer(seconds, stop_event.set).start()
+        asyncio.run(simulator.run(stop_event))
+        return simulator
+
+    def test_broadcasts_every_color_at_rate(self):
+        simulator = self._run()
+        self.assertEqual({reading[0] for reading in self.readings}, set(TILT_COLORS))
+        self.assertEqual(simulator.sent, len(self.readings))
+        # 8 Tilts at 100/s for 0.2s, with some slack for a busy machine
+        self.assertGreater(simulator.sent, 80)
+
+    def test_tilt_pro_precision(self):
+        self._run(simulate_tilt_pro=True, simulate_temp_fahrenheit=68)
+        _, major, minor = self.readings[0]
+        self.assertGreater(major, 600)
+        self.assertGreater(minor, 10000)
+
+    def test_packet_loss_and_duplicates(self):
+        simulator = self._run(simulate_packet_loss=0.5, simulate_duplicate_chance=1)
+        self.assertGreater(simulator.lost, 0)
+        self.assertGreater(simulator.duplicates, 0)
+        self.assertEqual(simulator.sent, len(self.readings))
+
+    def test_fermentation_curve(self):
+        config = PitchConfig({'simulate_original_gravity': 1.060, 'simulate_final_gravity': 1.012})
+        tilt = BeaconSimulator(config, {'simulated': COLORS_TO_UUID['red']}, self._on_advertisement).tilts[0]
+        gravities = [tilt.gravity_at(day) for day in range(0, 8)]
+        self.assertEqual(gravities, sorted(gravities, reverse=True))
+        self.assertAlmostEqual(gravities[0], 1.060, delta=0.005)
+        self.assertAlmostEqual(gravities[-1], 1.012, delta=0.001)
+
+    def test_unknown_color(self):
+        with self.assertRaises(ValueError):
+            BeaconSimulator(PitchConfig({'simulate_colors': ['plaid']}), COLORS_TO_UUID, self._on_advertisement)
+
+    def test_jitter_out_of_range(self):
+        for jitter in [-0.1, 1, 1.5]:
+            with self.assertRaises(ValueError):
+                BeaconSimulator(PitchConfig({'simulate_jitter': jitter}), COLORS_TO_UUID, self._on_advertisement)
+
+    def test_rate_and_chances_out_of_range(self):
+        for config in [{'simulate_rate_hz': 0}, {'simulate_rate_hz': -2},
+                       {'simulate_packet_loss': -0.1}, {'simulate_packet_loss': 1.5},
+                       {'simulate_duplicate_chance': -0.1}, {'simulate_duplicate_chance': 2}]:
+            with self.assertRaises(ValueError):
+                BeaconSimulator(PitchConfig(config), COLORS_TO_UUID, self._on_advertisement)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from pitch.configuration import PitchConfig
+from pitch.models import TiltStatus
+from pitch.providers import SqliteCloudProvider
+
+
+class SqliteTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'pitch.db')
+        self.config = PitchConfig({'sqlite_db_path': self.db_path, 'sqlite_batch_size': 3})
+        self.provider = SqliteCloudProvider(self.config)
+        self.provider.start()
+
+    def tearDown(self):
+        self.provider.stop()
+        self.directory.cleanup()
+
+    def _count(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM fermentation_readings').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_rows_are_batched_and_flushed_on_stop(self):
+        self.provider.update(TiltStatus("red", 70, 1.050, self.config))
+        self.provider.update(TiltStatus("blue", 70, 1.050, self.config))
+        self.assertEqual(self._count(), 0, msg="Rows should wait for a full batch")
+        self.provider.stop()
+        self.assertEqual(self._count(), 2)
+        self.assertEqual(self.provider.writer.flushes, 1)
+
+    def test_uses_wal(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import sqlite3
+import unittest
+from pitch.storage import sqlite_schema
+
+
+class SqliteSchemaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+
+    def tearDown(self):
+        self.conn.close()
+
+    def _insert(self, timestamp, color, gravity, temp_f):
+        self.conn.execute('INSERT INTO fermentation_readings (timestamp, color, name, brew_id, temp_f, gravity) '
+                          'VALUES (?, ?, ?, ?, ?, ?)', (timestamp, color, color, color, temp_f, gravity))
+
+    def test_migrates_original_table(self):
+        sqlite_schema._migrate_v1(self.conn)
+        self.conn.execute("INSERT INTO fermentation_readings (timestamp, color, name, gravity, temp_f) "
+                          "VALUES (120, 'red', 'IPA', 1.050, 68)")
+        self.conn.commit()
+        sqlite_schema.migrate(self.conn)
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        self.assertEqual(version, sqlite_schema.SCHEMA_VERSION)
+        row = self.conn.execute('SELECT id, brew_id, gravity, fermentation_state FROM fermentation_readings').fetchone()
+        self.assertEqual(row, (1, 'IPA', 1.050, None))
+        plan = self.conn.execute("EXPLAIN QUERY PLAN SELECT * FROM fermentation_readings "
+                                 "WHERE color = 'red' AND timestamp > 100").fetchall()
+        self.assertIn('idx_fermentation_readings_color_timestamp', str(plan))
+        rollup = self.conn.execute('SELECT count, gravity_avg FROM fermentation_rollups_minute_avg').fetchone()
+        self.assertEqual(rollup, (1, 1.050))
+
+    def test_rollups_are_incremental(self):
+        sqlite_schema.migrate(self.conn)
+        self._insert(60, 'red', 1.050, 68)
+        self._insert(90, 'red', 1.040, 70)
+        self._insert(130, 'red', 1.030, 72)
+        minutes = self.conn.execute('SELECT timestamp, count, gravity_min, gravity_max, temp_f_avg '
+                                    'FROM fermentation_rollups_minute_avg ORDER BY timestamp').fetchall()
+        self.assertEqual(minutes, [(60, 2, 1.040, 1.050, 69.0), (120, 1, 1.030, 1.030, 72.0)])
+        hour = self.conn.execute('SELECT bucket, count FROM fermentation_rollups_hour').fetchall()
+        self.assertEqual(hour, [(0, 3)])
+
+    def test_prune_keeps_rollups(self):
+        sqlite_schema.migrate(self.conn)
+        self._insert(60, 'red', 1.050, 68)
+        self._insert(7200, 'red', 1.040, 68)
+        self.assertEqual(sqlite_schema.prune(self.conn, 3600), 1)
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM fermentation_readings').fetchone()[0], 1)
+        self.assertEqual(self.conn.execute('SELECT COUNT(*) FROM fermentation_rollups_hour').fetchone()[0], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
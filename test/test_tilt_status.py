@@ -1,4 +1,5 @@
 import unittest
+import jsonpickle
 from pitch.configuration import PitchConfig
 from pitch.models import TiltStatus
 
@@ -22,6 +23,37 @@ class TiltStatusTests(unittest.TestCase):
     def test_gravity_high(self):
         tilt_status = TiltStatus("purple", 70, self.config.gravity_range_max + 0.001, self.config)
         self.assertFalse(tilt_status.gravity_valid, msg="Gravity is less than max")
+
+    def test_json_matches_jsonpickle(self):
+        config = PitchConfig({'purple_original_gravity': 1.060, 'purple_name': 'Brü Ale'})
+        for tilt_status in [TiltStatus("purple", 70, 1.050, config), TiltStatus("red", 700, 10500 / 1000, config)]:
+            expected = jsonpickle.encode(tilt_status, unpicklable=False)
+            self.assertEqual(tilt_status.json(), expected)
+
+    def test_tilt_pro(self):
+        # Tilt Pro broadcasts one more digit, minor 10500 is read as 10.5 like any other gravity
+        tilt_status = TiltStatus("red", 700, 10500 / 1000, self.config)
+        self.assertTrue(tilt_status.hd)
+        self.assertAlmostEqual(tilt_status.gravity, 1.050)
+        self.assertAlmostEqual(tilt_status.temp_fahrenheit, 70.0)
+        self.assertTrue(tilt_status.gravity_valid)
+        self.assertTrue(tilt_status.temp_valid)
+
+    def test_json_is_cached(self):
+        tilt_status = TiltStatus("purple", 70, 1.050, self.config)
+        self.assertIs(tilt_status.json(), tilt_status.json())
+
+    def test_read_only(self):
+        tilt_status = TiltStatus("purple", 70, 1.050, self.config)
+        with self.assertRaises(AttributeError):
+            tilt_status.gravity = 1.000
+
+    def test_config_change_updates_profile(self):
+        TiltStatus("purple", 70, 1.050, self.config)
+        self.config.update({'purple_name': 'Stout', 'purple_gravity_offset': 0.002})
+        tilt_status = TiltStatus("purple", 70, 1.050, self.config)
+        self.assertEqual(tilt_status.name, 'Stout')
+        self.assertAlmostEqual(tilt_status.gravity, 1.052)
         
 
 if __name__ == '__main__':
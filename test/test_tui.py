@@ -0,0 +1,81 @@
+import unittest
+from datetime import datetime, timedelta
+from pitch.configuration import PitchConfig
+from pitch.models import TiltStatus
+from pitch.dispatcher import Dispatcher
+from pitch.mailbox import ColorMailbox
+from pitch.providers.TuiProvider import TuiColorState, TuiHistory, TuiPoint, TuiProvider
+
+START = datetime(2020, 9, 11, 12, 0, 0)
+
+
+class TuiHistoryTests(unittest.TestCase):
+
+    def _point(self, minutes, gravity=1.050):
+        return TuiPoint(START + timedelta(minutes=minutes), gravity, 68)
+
+    def test_memory_is_bounded(self):
+        history = TuiHistory(points_per_level=10, levels=3)
+        for minute in range(10000):
+            history.append(self._point(minute))
+        self.assertLessEqual(len(history), 30)
+        points = list(history.points())
+        self.assertEqual([p.time for p in points], sorted(p.time for p in points))
+        # Newest is kept at full resolution
+        self.assertEqual(points[-1].time, START + timedelta(minutes=9999))
+        self.assertEqual(points[-1].count, 1)
+        self.assertEqual(points[0].count, 4)
+
+    def test_merge_averages(self):
+        history = TuiHistory(points_per_level=2, levels=2)
+        for minute, gravity in enumerate([1.050, 1.040, 1.030]):
+            history.append(self._point(minute, gravity))
+        oldest = next(history.points())
+        self.assertEqual(oldest.count, 2)
+        self.assertAlmostEqual(oldest.gravity, 1.045)
+        self.assertEqual(oldest.time, START + timedelta(seconds=30))
+        self.assertEqual(oldest.label, "11/09/2020 12:00:30")
+
+    def test_sample(self):
+        history = TuiHistory(points_per_level=4, levels=2)
+        for minute in range(9):
+            history.append(self._point(minute, gravity=minute))
+        # Level 1 holds the merged pairs (0+1, 2+3, 4+5), level 0 minutes 6 to 8
+        self.assertEqual([p.gravity for p in history.points()], [0.5, 2.5, 4.5, 6, 7, 8])
+        self.assertEqual([p.gravity for p in history.sample(4)], [0.5, 2.5, 6, 8])
+        self.assertEqual([p.gravity for p in history.sample(3)], [0.5, 4.5, 8])
+        self.assertEqual([p.gravity for p in history.sample(10)], [0.5, 2.5, 4.5, 6, 7, 8])
+
+    def test_chart_points_fit_width(self):
+        config = PitchConfig({})
+        state = TuiColorState("purple", points_per_level=100, levels=4)
+        for minute in range(1000):
+            state.append(TiltStatus("purple", 68, 1.050, config, timestamp=START + timedelta(minutes=minute)))
+        points = state.chart_points(80)
+        self.assertEqual(len(points), 80)
+        self.assertEqual(points[-1].time, START + timedelta(minutes=999))
+
+
+class TuiProviderTests(unittest.TestCase):
+
+    def test_update_does_not_draw(self):
+        config = PitchConfig({})
+        tui = TuiProvider(config)
+        tui._render = lambda charts: self.fail("update should not draw")
+        for minute in range(10):
+            tui.update(TiltStatus("purple", 68, 1.050, config, timestamp=START + timedelta(minutes=minute)))
+        charts = tui._snapshot(80)
+        self.assertEqual([chart.color for chart in charts], ["purple"])
+        self.assertEqual(len(charts[0].points), 10)
+
+    def test_stats_text(self):
+        config = PitchConfig({})
+        tui = TuiProvider(config)
+        tui.watch(Dispatcher([tui], config, console_log=False), ColorMailbox(3))
+        text = tui._get_stats_text()
+        self.assertIn("Scan queue: 0/3", text)
+        self.assertIn("TUI", text)
+
+
+if __name__ == '__main__':
+    unittest.main()